@@ -0,0 +1,121 @@
+from collections import defaultdict
+from itertools import groupby
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+
+from notifications.models import (
+    Activity,
+    Notification,
+    NotificationCounter,
+)
+
+
+def record_activity(actor_id, recipient_id, verb, post_id=None):
+    """
+    Append a raw event for the aggregation worker,
+    users are never notified about their own actions
+    """
+    if actor_id == recipient_id:
+        return None
+    return Activity.objects.create(
+        actor_id=actor_id,
+        recipient_id=recipient_id,
+        verb=verb,
+        post_id=post_id,
+    )
+
+
+def _group_key(activity):
+    return activity.recipient_id, activity.verb, activity.post_id or 0
+
+
+def _apply_group(recipient_id, verb, post_id, activities):
+    """
+    Fold a burst of activities into the unread notification
+    with the same key, returns 1 if a new one was created.
+    actor_count counts people, an actor who liked, unliked and
+    liked again is counted once.
+    """
+    last_actor_id = activities[-1].actor_id
+    actor_ids = {activity.actor_id for activity in activities}
+    notification = (
+        Notification.objects.filter(
+            recipient_id=recipient_id,
+            verb=verb,
+            post_id=post_id,
+            is_read=False,
+        )
+        .select_for_update()
+        .only("id", "first_activity_id")
+        .first()
+    )
+    if notification is None:
+        Notification.objects.create(
+            recipient_id=recipient_id,
+            verb=verb,
+            post_id=post_id,
+            last_actor_id=last_actor_id,
+            actor_count=len(actor_ids),
+            first_activity_id=activities[0].id,
+        )
+        return 1
+
+    actor_ids -= set(
+        Activity.objects.filter(
+            recipient_id=recipient_id,
+            verb=verb,
+            post_id=post_id,
+            aggregated=True,
+            id__gte=notification.first_activity_id,
+            actor_id__in=actor_ids,
+        ).values_list("actor_id", flat=True)
+    )
+    Notification.objects.filter(id=notification.id).update(
+        actor_count=F("actor_count") + len(actor_ids),
+        last_actor_id=last_actor_id,
+    )
+    return 0
+
+
+def aggregate_pending_activities(batch_size=None):
+    """
+    Aggregate one batch of pending activities into notifications
+    and bump the unread counters, returns the number processed
+    """
+    batch_size = batch_size or settings.NOTIFICATIONS_BATCH_SIZE
+    with transaction.atomic():
+        activities = list(
+            Activity.objects.filter(aggregated=False)
+            .order_by("id")[:batch_size]
+        )
+        if not activities:
+            return 0
+
+        new_unread = defaultdict(int)
+        activities.sort(key=_group_key)
+        for (recipient_id, verb, post_id), group in groupby(
+                activities, key=_group_key
+        ):
+            new_unread[recipient_id] += _apply_group(
+                recipient_id, verb, post_id or None, list(group)
+            )
+
+        NotificationCounter.objects.bulk_create(
+            [
+                NotificationCounter(user_id=user_id)
+                for user_id in new_unread
+            ],
+            ignore_conflicts=True,
+        )
+        for user_id, delta in new_unread.items():
+            if delta:
+                NotificationCounter.objects.filter(
+                    user_id=user_id
+                ).update(unread=F("unread") + delta)
+
+        Activity.objects.filter(
+            id__in=[activity.id for activity in activities]
+        ).update(aggregated=True)
+    return len(activities)
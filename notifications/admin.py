@@ -0,0 +1,8 @@
+from django.contrib import admin
+
+from notifications.models import (
+    Activity, Notification
+)
+
+admin.site.register(Activity)
+admin.site.register(Notification)
@@ -0,0 +1,36 @@
+# Generated by Django 4.2.3 on 2026-10-19 09:01
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("posts", "0007_post_version"),
+        ("notifications", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="activity",
+            name="post",
+            field=models.ForeignKey(
+                db_constraint=False,
+                null=True,
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="+",
+                to="posts.post",
+            ),
+        ),
+        migrations.AlterField(
+            model_name="notification",
+            name="post",
+            field=models.ForeignKey(
+                db_constraint=False,
+                null=True,
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="+",
+                to="posts.post",
+            ),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 4.2.3 on 2026-10-19 09:18
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("notifications", "0002_post_without_db_constraint"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="notification",
+            name="first_activity_id",
+            field=models.BigIntegerField(default=0),
+        ),
+    ]
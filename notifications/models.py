@@ -0,0 +1,106 @@
+from django.conf import settings
+from django.db import models
+
+
+class Verb(models.TextChoices):
+    LIKE = "like", "liked your post"
+    COMMENT = "comment", "commented on your post"
+    FOLLOW = "follow", "followed you"
+
+
+class Activity(models.Model):
+    """
+    Append-only log of raw events. Rows are never updated
+    except for the ``aggregated`` flag set by the worker.
+    """
+
+    recipient = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name="+",
+    )
+    actor = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name="+",
+    )
+    verb = models.CharField(max_length=16, choices=Verb.choices)
+    # No database constraint: posts may live on a shard (posts.sharding)
+    post = models.ForeignKey(
+        "posts.Post",
+        null=True,
+        on_delete=models.CASCADE,
+        related_name="+",
+        db_constraint=False,
+    )
+    created = models.DateTimeField(auto_now_add=True)
+    aggregated = models.BooleanField(default=False)
+
+    class Meta:
+        verbose_name_plural = "Activities"
+        indexes = [
+            models.Index(
+                fields=["aggregated", "id"],
+                name="activity_pending_idx",
+            )
+        ]
+
+
+class Notification(models.Model):
+    """Aggregated activity, e.g. "12 people liked your post"."""
+
+    recipient = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name="notifications",
+    )
+    verb = models.CharField(max_length=16, choices=Verb.choices)
+    # No database constraint: posts may live on a shard (posts.sharding)
+    post = models.ForeignKey(
+        "posts.Post",
+        null=True,
+        on_delete=models.CASCADE,
+        related_name="+",
+        db_constraint=False,
+    )
+    last_actor = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name="+",
+    )
+    actor_count = models.PositiveIntegerField(default=1)
+    # Id of the first activity folded into this notification, the
+    # actors of the later ones with the same key are counted already
+    first_activity_id = models.BigIntegerField(default=0)
+    is_read = models.BooleanField(default=False)
+    updated = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ["-updated"]
+        indexes = [
+            models.Index(
+                fields=["recipient", "is_read", "verb", "post"],
+                name="notification_group_idx",
+            ),
+            models.Index(
+                fields=["recipient", "-updated"],
+                name="notification_feed_idx",
+            ),
+        ]
+
+    def __str__(self):
+        if self.actor_count > 1:
+            return f"{self.actor_count} people {self.get_verb_display()}"
+        return f"Someone {self.get_verb_display()}"
+
+
+class NotificationCounter(models.Model):
+    """Maintained unread count, so reads never need COUNT(*)."""
+
+    user = models.OneToOneField(
+        settings.AUTH_USER_MODEL,
+        primary_key=True,
+        on_delete=models.CASCADE,
+        related_name="notification_counter",
+    )
+    unread = models.PositiveIntegerField(default=0)
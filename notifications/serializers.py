@@ -0,0 +1,21 @@
+from rest_framework import serializers
+
+from notifications.models import Notification
+
+
+class NotificationSerializer(serializers.ModelSerializer):
+    message = serializers.CharField(source="__str__", read_only=True)
+
+    class Meta:
+        model = Notification
+        fields = (
+            "id",
+            "verb",
+            "post",
+            "last_actor",
+            "actor_count",
+            "message",
+            "is_read",
+            "updated",
+        )
+        read_only_fields = fields
@@ -0,0 +1,14 @@
+from celery import shared_task
+
+from notifications.activity import aggregate_pending_activities
+
+
+@shared_task
+def aggregate_activities() -> int:
+    """Drain pending activities batch by batch."""
+    processed = 0
+    while True:
+        batch = aggregate_pending_activities()
+        if not batch:
+            return processed
+        processed += batch
@@ -0,0 +1,73 @@
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from notifications.activity import (
+    aggregate_pending_activities,
+    record_activity,
+)
+from notifications.models import Notification, NotificationCounter, Verb
+from posts.tests import unsharded
+
+
+@unsharded
+class AggregateActivitiesTests(TestCase):
+    def setUp(self):
+        user_model = get_user_model()
+        self.recipient, self.first, self.second = (
+            user_model.objects.create_user(f"user{index}@example.com")
+            for index in range(3)
+        )
+
+    def follow(self, actor):
+        record_activity(actor.id, self.recipient.id, Verb.FOLLOW)
+
+    def test_actor_count_counts_distinct_actors(self):
+        self.follow(self.first)
+        self.follow(self.first)
+        self.follow(self.second)
+        aggregate_pending_activities()
+
+        notification = Notification.objects.get(recipient=self.recipient)
+        self.assertEqual(notification.actor_count, 2)
+
+    def test_actors_already_counted_are_not_counted_again(self):
+        self.follow(self.first)
+        aggregate_pending_activities()
+        self.follow(self.first)
+        self.follow(self.second)
+        aggregate_pending_activities()
+
+        notification = Notification.objects.get(recipient=self.recipient)
+        self.assertEqual(notification.actor_count, 2)
+        self.assertEqual(notification.last_actor, self.second)
+
+    def test_read_notification_starts_a_new_count(self):
+        self.follow(self.first)
+        aggregate_pending_activities()
+        Notification.objects.update(is_read=True)
+        self.follow(self.first)
+        aggregate_pending_activities()
+
+        notification = Notification.objects.get(
+            recipient=self.recipient, is_read=False
+        )
+        self.assertEqual(notification.actor_count, 1)
+
+    def test_mark_all_read_resets_unread_count(self):
+        self.follow(self.first)
+        aggregate_pending_activities()
+        self.assertEqual(
+            NotificationCounter.objects.get(user=self.recipient).unread, 1
+        )
+        client = APIClient()
+        client.force_authenticate(self.recipient)
+
+        response = client.post(reverse("notifications:notification-mark-all-read"))
+
+        self.assertEqual(response.status_code, 204)
+        self.assertEqual(
+            NotificationCounter.objects.get(user=self.recipient).unread, 0
+        )
+        self.assertFalse(Notification.objects.filter(is_read=False).exists())
@@ -0,0 +1,11 @@
+from rest_framework import routers
+
+from notifications.views import NotificationViewSet
+
+router = routers.DefaultRouter()
+router.register("notifications", NotificationViewSet)
+
+
+urlpatterns = router.urls
+
+app_name = "notifications"
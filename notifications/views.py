@@ -0,0 +1,56 @@
+from django.db import transaction
+from rest_framework import mixins, status
+from rest_framework.decorators import action
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+from rest_framework.viewsets import GenericViewSet
+
+from notifications.models import Notification, NotificationCounter
+from notifications.pagination import NotificationPagination
+from notifications.serializers import NotificationSerializer
+
+
+class NotificationViewSet(
+    mixins.ListModelMixin,
+    GenericViewSet,
+):
+    queryset = Notification.objects.all()
+    serializer_class = NotificationSerializer
+    pagination_class = NotificationPagination
+    permission_classes = [IsAuthenticated]
+
+    def get_queryset(self):
+        return self.queryset.filter(recipient=self.request.user)
+
+    def get_unread_count(self):
+        return (
+            NotificationCounter.objects.filter(
+                user=self.request.user
+            ).values_list("unread", flat=True).first()
+            or 0
+        )
+
+    def list(self, request, *args, **kwargs):
+        """
+        Retrieve your notifications (newest first) together with
+        the number of unread ones
+        """
+        response = super().list(request, *args, **kwargs)
+        response.data["unread_count"] = self.get_unread_count()
+        return response
+
+    @action(
+        methods=["POST"],
+        detail=False,
+        url_path="read",
+    )
+    def mark_all_read(self, request):
+        """
+        Mark all your notifications as read
+        """
+        with transaction.atomic():
+            self.get_queryset().filter(is_read=False).update(is_read=True)
+            NotificationCounter.objects.filter(
+                user=self.request.user
+            ).update(unread=0)
+        return Response(status=status.HTTP_204_NO_CONTENT)
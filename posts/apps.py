@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class SocialMediaContentConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "posts"
+
+    def ready(self):
+        from posts import receivers  # noqa: F401
@@ -0,0 +1,92 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.utils import timezone
+
+from posts.models import (
+    ArchivedComment,
+    ArchivedPost,
+    Comment,
+    Post,
+)
+from posts.sharding import post_databases
+
+
+def _copy_relations(post_ids, source, target, field, using):
+    target.objects.using(using).bulk_create(
+        [
+            target(archivedpost_id=post_id, **{field: value})
+            for post_id, value in source.objects.using(using).filter(
+                post_id__in=post_ids
+            ).values_list("post_id", field)
+        ]
+    )
+
+
+def archive_batch(cutoff, batch_size, using=DEFAULT_DB_ALIAS):
+    """
+    Move one batch of published posts created before ``cutoff``
+    with their comments, likes and tags into the archive tables
+    of the same database, returns the number of archived posts.
+    The hot rows are removed with raw deletes: the cascade would
+    also take the notifications and activities of the posts,
+    which keep pointing to the same ids in the archive.
+    """
+    with transaction.atomic(using=using):
+        posts = list(
+            Post.objects.using(using).filter(
+                created__lt=cutoff, is_published=True, is_deleted=False
+            )
+            .order_by("created")
+            .values("id", "title", "text", "created", "user_id")[:batch_size]
+        )
+        if not posts:
+            return 0
+        post_ids = [post["id"] for post in posts]
+
+        ArchivedPost.objects.using(using).bulk_create(
+            [ArchivedPost(**post) for post in posts]
+        )
+        ArchivedComment.objects.using(using).bulk_create(
+            [
+                ArchivedComment(**comment)
+                for comment in Comment.objects.using(using).filter(
+                    post_id__in=post_ids
+                ).order_by("path").values(
+                    "id", "text", "post_id", "user_id",
+                    "parent_id", "path", "depth", "reply_count",
+                )
+            ]
+        )
+        _copy_relations(
+            post_ids, Post.likes.through, ArchivedPost.likes.through,
+            "user_id", using,
+        )
+        _copy_relations(
+            post_ids, Post.tags.through, ArchivedPost.tags.through,
+            "tag_id", using,
+        )
+
+        for model in (Comment, Post.likes.through, Post.tags.through):
+            model.objects.filter(post_id__in=post_ids)._raw_delete(using)
+        Post.objects.filter(id__in=post_ids)._raw_delete(using)
+    return len(post_ids)
+
+
+def archive_old_posts(max_age_days=None, batch_size=None):
+    """
+    Archive every post older than the configured age, batch by
+    batch, on every database holding posts
+    """
+    max_age_days = max_age_days or settings.POST_ARCHIVE_AFTER_DAYS
+    batch_size = batch_size or settings.POST_ARCHIVE_BATCH_SIZE
+    cutoff = timezone.now() - timedelta(days=max_age_days)
+    archived = 0
+    for using in post_databases():
+        while True:
+            batch = archive_batch(cutoff, batch_size, using)
+            if not batch:
+                break
+            archived += batch
+    return archived
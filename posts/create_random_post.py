@@ -1,10 +1,16 @@
+import random
+import time
+
 from django.contrib.auth import get_user_model
+from django.db import transaction
 import friendlywords as fw
-from posts.models import Post
+from posts.models import Post, Tag, Comment
+from posts.sharding import group_by_shard, post_databases, shard_for_user
+from posts.threads import set_root_paths
 
 
 def create_random_post():
-    user = get_user_model().objects.first()
+    user = get_user_model().objects.filter(is_deleted=False).first()
     title = fw.generate(2)
     text = fw.generate(60)
     Post.objects.create(
@@ -12,3 +18,143 @@ def create_random_post():
         text=text,
         user=user
     )
+
+
+def _ensure_tag_pool(size):
+    """{database: tag ids}, the same tag names on every post database"""
+    names = [fw.generate(1) for _ in range(size)]
+    tag_ids = {}
+    for using in post_databases():
+        tags = Tag.objects.using(using)
+        tags.bulk_create(
+            [Tag(name=name) for name in names], ignore_conflicts=True
+        )
+        tag_ids[using] = list(tags.values_list("id", flat=True)[:size])
+    return tag_ids
+
+
+def _create_chunk(
+        rng, chunk_size, user_ids, tag_ids,
+        max_tags, max_likes, max_comments
+):
+    """
+    Insert one chunk of posts with their tags, likes and comments,
+    one transaction per shard of the authors, returns the number
+    of rows written
+    """
+    authors = [rng.choice(user_ids) for _ in range(chunk_size)]
+    return sum(
+        _create_shard_chunk(
+            rng, using, shard_authors, user_ids, tag_ids[using],
+            max_tags, max_likes, max_comments
+        )
+        for using, shard_authors in group_by_shard(
+            authors, shard_for_user
+        ).items()
+    )
+
+
+def _create_shard_chunk(
+        rng, using, authors, user_ids, tag_ids,
+        max_tags, max_likes, max_comments
+):
+    with transaction.atomic(using=using):
+        posts = Post.objects.using(using).bulk_create(
+            [
+                Post(
+                    title=fw.generate(2),
+                    text=fw.generate(60),
+                    user_id=author_id,
+                )
+                for author_id in authors
+            ]
+        )
+        tag_rows = [
+            Post.tags.through(post_id=post.id, tag_id=tag_id)
+            for post in posts
+            for tag_id in rng.sample(
+                tag_ids, rng.randint(0, min(max_tags, len(tag_ids)))
+            )
+        ]
+        like_rows = [
+            Post.likes.through(post_id=post.id, user_id=user_id)
+            for post in posts
+            for user_id in rng.sample(
+                user_ids, rng.randint(0, min(max_likes, len(user_ids)))
+            )
+        ]
+        comments = [
+            Comment(
+                post_id=post.id,
+                user_id=rng.choice(user_ids),
+                text=fw.generate(10),
+            )
+            for post in posts
+            for _ in range(rng.randint(0, max_comments))
+        ]
+        Post.tags.through.objects.using(using).bulk_create(
+            tag_rows, ignore_conflicts=True
+        )
+        Post.likes.through.objects.using(using).bulk_create(
+            like_rows, ignore_conflicts=True
+        )
+        Comment.objects.using(using).bulk_create(comments)
+        set_root_paths(comments, using)
+    return len(posts) + len(tag_rows) + len(like_rows) + len(comments)
+
+
+def create_random_posts(
+        count=None,
+        duration=None,
+        chunk_size=500,
+        seed=None,
+        tag_pool_size=50,
+        max_tags=3,
+        max_likes=10,
+        max_comments=3,
+):
+    """
+    Generate synthetic posts for random authors in bulk_create
+    chunks. Stops after ``count`` posts or, for a sustained
+    background write load, after ``duration`` seconds.
+    Returns throughput statistics.
+    """
+    if count is None and duration is None:
+        raise ValueError("Either count or duration must be set")
+
+    # Word lists are read from disk on every generate() call otherwise
+    fw.preload()
+    rng = random.Random(seed)
+    # Accounts waiting to be purged get no new content
+    user_ids = list(
+        get_user_model().objects.filter(is_deleted=False)
+        .values_list("id", flat=True)
+    )
+    if not user_ids:
+        raise ValueError("At least one user is required to generate posts")
+    tag_ids = _ensure_tag_pool(tag_pool_size)
+
+    started = time.perf_counter()
+    posts = rows = 0
+    while True:
+        if count is not None and posts >= count:
+            break
+        if (
+                duration is not None
+                and time.perf_counter() - started >= duration
+        ):
+            break
+        size = chunk_size if count is None else min(chunk_size, count - posts)
+        rows += _create_chunk(
+            rng, size, user_ids, tag_ids,
+            max_tags, max_likes, max_comments
+        )
+        posts += size
+
+    elapsed = time.perf_counter() - started
+    return {
+        "posts": posts,
+        "rows": rows,
+        "seconds": round(elapsed, 3),
+        "rows_per_second": round(rows / elapsed, 1) if elapsed else 0.0,
+    }
@@ -0,0 +1,168 @@
+from django.conf import settings
+from django.core.cache import caches
+from django.db.models import F
+from rest_framework.renderers import JSONRenderer
+
+from posts import sharding
+from posts.models import Post, without_deleted_users
+from posts.serializers import PostSerializer
+from posts.viewer_state import ViewerState
+
+# The number after "fragment" changes with the serialized post format
+FRAGMENT_KEY = "post:fragment:2:{post_id}:{version}"
+HITS_KEY = "post:fragment:hits"
+MISSES_KEY = "post:fragment:misses"
+# Per-viewer fields, spliced into the shared fragment on every request
+VIEWER_FIELDS = ("liked_by_me", "following_author")
+
+_renderer = JSONRenderer()
+
+
+def fragment_cache():
+    return caches[settings.POST_FRAGMENT_CACHE_ALIAS]
+
+
+def fragment_key(post_id, version):
+    return FRAGMENT_KEY.format(post_id=post_id, version=version)
+
+
+def bump_versions(post_ids):
+    """
+    Invalidate the cached JSON of posts, the old fragments
+    are never read again and expire on their own
+    """
+    for using, ids in sharding.group_by_shard(post_ids).items():
+        Post.objects.using(using).filter(id__in=ids).update(
+            version=F("version") + 1
+        )
+
+
+def _incr(cache, key, delta):
+    if not delta:
+        return
+    if not cache.add(key, delta, timeout=None):
+        try:
+            cache.incr(key, delta)
+        except ValueError:
+            cache.set(key, delta, timeout=None)
+
+
+def hit_counts():
+    """
+    Fragment cache (hits, misses) since the counters were reset,
+    counted only with POST_FRAGMENT_CACHE_STATS
+    """
+    counts = fragment_cache().get_many([HITS_KEY, MISSES_KEY])
+    return counts.get(HITS_KEY, 0), counts.get(MISSES_KEY, 0)
+
+
+def reset_hit_counts():
+    fragment_cache().delete_many([HITS_KEY, MISSES_KEY])
+
+
+def encode_fragment(representation):
+    """
+    Encode a serialized post as the (head, tail) bytes around
+    its viewer fields, which are left out
+    """
+    names = list(representation)
+    start = names.index(VIEWER_FIELDS[0])
+    end = start + len(VIEWER_FIELDS)
+    head = {name: representation[name] for name in names[:start]}
+    tail = {name: representation[name] for name in names[end:]}
+    return _renderer.render(head)[:-1], _renderer.render(tail)[1:]
+
+
+def render_fragments(post_ids):
+    """Serialize and encode posts, returns {post_id: fragment}"""
+    posts = []
+    for using, ids in sharding.group_by_shard(post_ids).items():
+        posts += (
+            Post.objects.using(using).filter(id__in=ids)
+            .select_related("user")
+            .prefetch_related(
+                *without_deleted_users("likes", "comments", "tags")
+            )
+        )
+    # Viewer fields are not part of the fragment, an empty state
+    # keeps the serializer from resolving them
+    serializer = PostSerializer(
+        posts, many=True, context={"viewer_state": ViewerState()}
+    )
+    return {
+        representation["id"]: encode_fragment(representation)
+        for representation in serializer.data
+    }
+
+
+def get_fragments(rows):
+    """
+    Fragments of ``rows`` (with ``id`` and ``version``) by post
+    id: one multi-get for the page, the misses are rendered in one
+    batch and written back with a single set_many
+    """
+    cache = fragment_cache()
+    keys = [fragment_key(row.id, row.version) for row in rows]
+    cached = cache.get_many(keys)
+    missing = [row for row, key in zip(rows, keys) if key not in cached]
+    if missing:
+        rendered = render_fragments([row.id for row in missing])
+        fresh = {
+            fragment_key(row.id, row.version): rendered[row.id]
+            for row in missing
+            if row.id in rendered
+        }
+        cache.set_many(fresh, timeout=settings.POST_FRAGMENT_CACHE_TIMEOUT)
+        cached.update(fresh)
+    if settings.POST_FRAGMENT_CACHE_STATS:
+        _incr(cache, HITS_KEY, len(rows) - len(missing))
+        _incr(cache, MISSES_KEY, len(missing))
+    return {
+        row.id: cached[key]
+        for row, key in zip(rows, keys)
+        if key in cached
+    }
+
+
+def _boolean(value):
+    return b"true" if value else b"false"
+
+
+def assemble_post(fragment, viewer_state, row):
+    head, tail = fragment
+    viewer_fields = (
+        b'"liked_by_me":' + _boolean(viewer_state.liked(row))
+        + b',"following_author":' + _boolean(viewer_state.follows_author(row))
+    )
+    if head != b"{":
+        viewer_fields = b"," + viewer_fields
+    if tail != b"}":
+        viewer_fields += b","
+    return head + viewer_fields + tail
+
+
+def assemble_results(rows, viewer_state):
+    """Comma-separated JSON of the cached posts of ``rows``"""
+    fragments = get_fragments(rows)
+    return b",".join(
+        assemble_post(fragments[row.id], viewer_state, row)
+        for row in rows
+        if row.id in fragments
+    )
+
+
+def render_page(envelope, results):
+    """
+    JSON body of a paginated list: ``envelope`` (count, next,
+    previous) followed by the already encoded ``results``
+    """
+    return (
+        _renderer.render(envelope)[:-1]
+        + b',"results":['
+        + results
+        + b"]}"
+    )
+
+
+def assemble_page(envelope, rows, viewer_state):
+    return render_page(envelope, assemble_results(rows, viewer_state))
@@ -0,0 +1,95 @@
+import re
+
+from django.db.models import F
+
+from posts import sharding
+from posts.models import Post, Tag
+
+# Longer words are not hashtags (tag names are 50 characters at
+# most), rather than hashtags cut to their first 50 characters
+HASHTAG_PATTERN = re.compile(r"(?<![\w#])#(\w{1,50})(?!\w)")
+
+
+def extract_hashtags(*texts):
+    """Unique #hashtag names in order of first appearance."""
+    names = {}
+    for text in texts:
+        for name in HASHTAG_PATTERN.findall(text or ""):
+            names.setdefault(name, None)
+    return list(names)
+
+
+def sync_post_tags(posts, previous=None):
+    """
+    Attach the hashtags found in title and text to ``posts``:
+    one bulk upsert for the tags, one query to read their ids and
+    one batch insert for the through rows (per shard, tags live
+    with their posts). ``previous`` maps post ids to the hashtags
+    of an edited post before the edit, those no longer mentioned
+    are removed; tags given otherwise (e.g. by admins) are kept.
+    """
+    for using, shard_posts in sharding.group_by_shard(
+            posts, shard_for=lambda post: sharding.shard_for_id(post.id)
+    ).items():
+        _sync_post_tags(shard_posts, previous or {}, using)
+
+
+def _sync_post_tags(posts, previous, using):
+    hashtags = {
+        post.id: extract_hashtags(post.title, post.text) for post in posts
+    }
+    names = {name for post_names in hashtags.values() for name in post_names}
+    tags = Tag.objects.using(using)
+    tags.bulk_create(
+        [Tag(name=name) for name in names], ignore_conflicts=True
+    )
+    tag_ids = dict(
+        tags.filter(name__in=names).values_list("name", "id")
+    )
+
+    through = Post.tags.through
+    for post_id, post_names in hashtags.items():
+        stale = set(previous.get(post_id, ())) - set(post_names)
+        if stale:
+            through.objects.using(using).filter(
+                post_id=post_id, tag__name__in=stale
+            ).delete()
+    through.objects.using(using).bulk_create(
+        [
+            through(post_id=post_id, tag_id=tag_ids[name])
+            for post_id, post_names in hashtags.items()
+            for name in post_names
+        ],
+        ignore_conflicts=True,
+    )
+    # Tags are part of the cached post JSON (posts.fragments)
+    changed = [
+        post_id for post_id, post_names in hashtags.items()
+        if post_names or previous.get(post_id)
+    ]
+    if changed:
+        Post.objects.using(using).filter(id__in=changed).update(
+            version=F("version") + 1
+        )
+
+
+def backfill_hashtags(chunk_size):
+    """
+    Extract hashtags of all existing posts in id-ordered chunks,
+    adding to (not replacing) the tags they already have
+    """
+    processed = 0
+    for using in sharding.post_databases():
+        last_id = 0
+        while True:
+            posts = list(
+                Post.objects.using(using).filter(id__gt=last_id)
+                .order_by("id")
+                .only("id", "title", "text")[:chunk_size]
+            )
+            if not posts:
+                break
+            sync_post_tags(posts)
+            last_id = posts[-1].id
+            processed += len(posts)
+    return processed
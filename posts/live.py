@@ -0,0 +1,173 @@
+import asyncio
+import json
+import threading
+from collections import defaultdict
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+
+class ConnectionLimitExceeded(Exception):
+    pass
+
+
+# Offered to a connection replaced by a newer one of the same user
+CLOSED = {"type": "closed"}
+
+
+class Subscription:
+    """
+    One live connection. Events are buffered in a bounded queue,
+    when a slow client lets it fill up the backlog is dropped and
+    replaced by a single ``resync`` event, so memory per
+    connection stays bounded and the client refetches instead.
+
+    The queue belongs to the event loop reading it, which is known
+    at the first get(): behind sync middleware the view subscribes
+    from a loop of its own that is gone once the response streams.
+    Events delivered before are kept until then.
+    """
+
+    def __init__(self, user_id, channels, max_queue_size):
+        self.user_id = user_id
+        self.channels = channels
+        self.loop = None
+        self.queue = asyncio.Queue(maxsize=max_queue_size)
+        self.active = True
+        self._lock = threading.Lock()
+        self._early_events = []
+
+    def deliver(self, event):
+        """Offer an event from any thread"""
+        with self._lock:
+            if self.loop is None:
+                self._early_events.append(event)
+                return
+            loop = self.loop
+        loop.call_soon_threadsafe(self.offer, event)
+
+    def offer(self, event):
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait({"type": "resync"})
+
+    async def get(self, timeout):
+        if self.loop is None:
+            with self._lock:
+                self.loop = asyncio.get_running_loop()
+                early_events, self._early_events = self._early_events, []
+            for event in early_events:
+                self.offer(event)
+        return await asyncio.wait_for(self.queue.get(), timeout)
+
+
+class LiveHub:
+    """
+    In-process pub/sub hub fanning events out to live connections.
+    The server does not tell when a client goes away, a user
+    over the per-user limit takes the slot of their oldest
+    connection, most likely one dropped before a reconnect.
+    """
+
+    def __init__(self, max_connections, max_connections_per_user):
+        self.max_connections = max_connections
+        self.max_connections_per_user = max_connections_per_user
+        self._lock = threading.Lock()
+        self._channels = defaultdict(set)
+        # {user id: subscriptions, oldest first}
+        self._per_user = defaultdict(list)
+        self._connections = 0
+
+    def subscribe(self, user_id, channels):
+        with self._lock:
+            user_subscriptions = self._per_user[user_id]
+            if len(user_subscriptions) >= self.max_connections_per_user:
+                oldest = user_subscriptions[0]
+                self._remove(oldest)
+                oldest.deliver(CLOSED)
+            if self._connections >= self.max_connections:
+                if not self._per_user[user_id]:
+                    del self._per_user[user_id]
+                raise ConnectionLimitExceeded(
+                    "Too many live connections, try again later."
+                )
+            subscription = Subscription(
+                user_id, channels, settings.LIVE_FEED_QUEUE_SIZE
+            )
+            for channel in channels:
+                self._channels[channel].add(subscription)
+            self._per_user[user_id].append(subscription)
+            self._connections += 1
+            return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            if subscription.active:
+                self._remove(subscription)
+
+    def _remove(self, subscription):
+        subscription.active = False
+        for channel in subscription.channels:
+            subscribers = self._channels.get(channel)
+            if subscribers is None:
+                continue
+            subscribers.discard(subscription)
+            if not subscribers:
+                del self._channels[channel]
+        user_subscriptions = self._per_user[subscription.user_id]
+        user_subscriptions.remove(subscription)
+        if not user_subscriptions:
+            del self._per_user[subscription.user_id]
+        self._connections -= 1
+
+    def dispatch(self, channel, event):
+        """
+        Deliver an event to the local subscribers of a channel,
+        safe to call from any thread
+        """
+        with self._lock:
+            subscribers = list(self._channels.get(channel, ()))
+        for subscription in subscribers:
+            subscription.deliver(event)
+
+
+class LocalBroker:
+    """
+    Stand-in for an external broker (e.g. Redis pub/sub) that
+    delivers messages straight to the hub of this process
+    """
+
+    def __init__(self, hub):
+        self.hub = hub
+
+    def publish(self, channel, event):
+        self.hub.dispatch(channel, event)
+
+
+hub = LiveHub(
+    max_connections=settings.LIVE_FEED_MAX_CONNECTIONS,
+    max_connections_per_user=settings.LIVE_FEED_MAX_CONNECTIONS_PER_USER,
+)
+broker = import_string(settings.LIVE_FEED_BROKER)(hub)
+
+
+def author_channel(user_id):
+    return f"author:{user_id}"
+
+
+def post_channel(post_id):
+    return f"post:{post_id}"
+
+
+def publish(channel, event):
+    broker.publish(channel, event)
+
+
+def format_event(event):
+    return (
+        f"event: {event['type']}\n"
+        f"data: {json.dumps(event)}\n\n"
+    )
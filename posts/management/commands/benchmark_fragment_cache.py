@@ -0,0 +1,68 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from rest_framework.renderers import JSONRenderer
+
+from posts import fragments
+from posts.models import Post
+from posts.serializers import PostSerializer
+from posts.viewer_state import ViewerState
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare serializing and encoding a page of posts with "
+        "assembling it from the fragment cache, queries excluded"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--page-size", type=int, default=50)
+        parser.add_argument("--rounds", type=int, default=200)
+
+    def handle(self, *args, **options):
+        posts = list(
+            Post.objects.select_related("user")
+            .prefetch_related("likes", "comments", "tags")
+            [:options["page_size"]]
+        )
+        if not posts:
+            self.stderr.write("No posts, generate some first")
+            return
+        rows = list(
+            Post.objects.filter(id__in=[post.id for post in posts])
+            .values_list("id", "user_id", "version", named=True)
+        )
+        viewer_state = ViewerState()
+        envelope = {"count": len(rows), "next": None, "previous": None}
+        renderer = JSONRenderer()
+        rounds = options["rounds"]
+
+        started = time.perf_counter()
+        for _ in range(rounds):
+            serializer = PostSerializer(
+                posts, many=True, context={"viewer_state": viewer_state}
+            )
+            renderer.render({**envelope, "results": serializer.data})
+        serialized = (time.perf_counter() - started) / rounds
+
+        # Warm the cache, then time the hot path
+        fragments.assemble_page(envelope, rows, viewer_state)
+        hits_before = fragments.hit_counts()
+        started = time.perf_counter()
+        for _ in range(rounds):
+            fragments.assemble_page(envelope, rows, viewer_state)
+        assembled = (time.perf_counter() - started) / rounds
+        hits, misses = (
+            after - before
+            for after, before in zip(fragments.hit_counts(), hits_before)
+        )
+
+        self.stdout.write(
+            f"{len(posts)} posts per page, {rounds} rounds\n"
+            f"serialize + encode  {serialized * 1000:8.3f} ms/page\n"
+            f"fragment assembly   {assembled * 1000:8.3f} ms/page\n"
+            f"speedup             {serialized / assembled:8.1f}x"
+        )
+        if settings.POST_FRAGMENT_CACHE_STATS:
+            self.stdout.write(f"fragment hits {hits}, misses {misses}")
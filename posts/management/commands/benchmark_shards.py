@@ -0,0 +1,172 @@
+import multiprocessing
+import time
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError, connections, transaction
+
+from posts.hashtags import sync_post_tags
+from posts.models import Post, Tag
+from posts.sharding import shard_for_user
+
+BENCHMARK_EMAIL = "shard-benchmark-{index}@example.com"
+BENCHMARK_TAG = "shard_benchmark"
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure post write throughput with concurrent writer "
+        "processes spread over 1..N of the post shards, one "
+        "transaction per post (insert and hashtags, like the API)"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--writers", type=int, default=8)
+        parser.add_argument(
+            "--posts", type=int, default=200,
+            help="Posts written by each writer",
+        )
+        parser.add_argument(
+            "--hold-ms", type=float, default=0,
+            help=(
+                "Keep each transaction open this long after its writes, "
+                "like a request doing more work before it commits"
+            ),
+        )
+        parser.add_argument(
+            "--shard-counts", default=None,
+            help="Comma-separated shard counts to try, default 1..N",
+        )
+
+    def handle(self, *args, **options):
+        shards = settings.POST_SHARDS
+        if not shards:
+            raise CommandError(
+                "Post sharding is off, set POST_SHARD_COUNT and run "
+                "setup_shards first"
+            )
+        if options["shard_counts"]:
+            shard_counts = [
+                int(count) for count in options["shard_counts"].split(",")
+            ]
+        else:
+            shard_counts = range(1, len(shards) + 1)
+        if not all(1 <= count <= len(shards) for count in shard_counts):
+            raise CommandError(f"Shard counts must be 1..{len(shards)}")
+
+        authors = self.authors_by_shard(shards)
+        try:
+            self.stdout.write(
+                f"{options['writers']} writers, {options['posts']} posts "
+                f"each, {options['hold_ms']} ms hold\n"
+                f"{'shards':>6} {'posts':>7} {'seconds':>8} "
+                f"{'posts/s':>8} {'speedup':>8} {'locked':>7}"
+            )
+            baseline = None
+            for count in shard_counts:
+                written, locked, elapsed = self.run(
+                    [authors[using] for using in shards[:count]],
+                    options["writers"],
+                    options["posts"],
+                    options["hold_ms"] / 1000,
+                )
+                throughput = written / elapsed if elapsed else 0
+                baseline = baseline or throughput
+                self.stdout.write(
+                    f"{count:>6} {written:>7} {elapsed:>8.2f} "
+                    f"{throughput:>8.1f} {throughput / baseline:>7.2f}x "
+                    f"{locked:>7}"
+                )
+        finally:
+            self.clean_up(authors)
+
+    def authors_by_shard(self, shards):
+        """One benchmark user per shard, {database: user id}"""
+        user_model = get_user_model()
+        authors = {}
+        index = 0
+        while len(authors) < len(shards):
+            user, _ = user_model.objects.get_or_create(
+                email=BENCHMARK_EMAIL.format(index=index)
+            )
+            authors.setdefault(shard_for_user(user.id), user.id)
+            index += 1
+        return authors
+
+    def run(self, author_ids, writers, posts, hold):
+        """
+        Writer ``n`` posts as author ``n % len(author_ids)``, so
+        the writers are spread evenly over the shards. Writers are
+        forked processes, like application workers, so they are
+        not serialized by the GIL.
+        Returns (posts written, 'database is locked' errors, seconds)
+        """
+        context = multiprocessing.get_context("fork")
+        barrier = context.Barrier(writers + 1)
+        results = context.Queue()
+        # Children must not share the parent's connections
+        connections.close_all()
+        processes = [
+            context.Process(
+                target=write_posts,
+                args=(
+                    author_ids[writer % len(author_ids)],
+                    posts,
+                    hold,
+                    barrier,
+                    results,
+                ),
+            )
+            for writer in range(writers)
+        ]
+        for process in processes:
+            process.start()
+        barrier.wait()
+        started = time.perf_counter()
+        counts = [results.get() for _ in processes]
+        elapsed = time.perf_counter() - started
+        for process in processes:
+            process.join()
+        return (
+            sum(written for written, _ in counts),
+            sum(locked for _, locked in counts),
+            elapsed,
+        )
+
+    def clean_up(self, authors):
+        user_model = get_user_model()
+        author_ids = list(authors.values())
+        for using in settings.POST_SHARDS:
+            Post.tags.through.objects.filter(
+                post__user_id__in=author_ids
+            )._raw_delete(using)
+            Post.objects.filter(user_id__in=author_ids)._raw_delete(using)
+            Tag.objects.using(using).filter(
+                name=BENCHMARK_TAG, posts=None
+            ).delete()
+            user_model.objects.filter(id__in=author_ids)._raw_delete(using)
+        user_model.objects.filter(id__in=author_ids).delete()
+
+
+def write_posts(author_id, posts, hold, barrier, results):
+    written = locked = 0
+    barrier.wait()
+    try:
+        for number in range(posts):
+            try:
+                with transaction.atomic(using=shard_for_user(author_id)):
+                    post = Post.objects.create(
+                        title=f"Shard benchmark {number}",
+                        text=f"Written by the #{BENCHMARK_TAG}",
+                        user_id=author_id,
+                    )
+                    sync_post_tags([post])
+                    if hold:
+                        time.sleep(hold)
+                written += 1
+            except OperationalError:
+                locked += 1
+    finally:
+        results.put((written, locked))
+        connections.close_all()
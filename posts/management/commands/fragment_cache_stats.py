@@ -0,0 +1,29 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from posts.fragments import hit_counts, reset_hit_counts
+
+
+class Command(BaseCommand):
+    help = "Show the hit rate of the post fragment cache"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--reset",
+            action="store_true",
+            help="Reset the counters after printing them",
+        )
+
+    def handle(self, *args, **options):
+        if not settings.POST_FRAGMENT_CACHE_STATS:
+            self.stderr.write(
+                "Counting is off, set POST_FRAGMENT_CACHE_STATS=1"
+            )
+        hits, misses = hit_counts()
+        total = hits + misses
+        rate = hits / total * 100 if total else 0
+        self.stdout.write(f"hits     {hits}")
+        self.stdout.write(f"misses   {misses}")
+        self.stdout.write(f"hit rate {rate:.1f}%")
+        if options["reset"]:
+            reset_hit_counts()
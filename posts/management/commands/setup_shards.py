@@ -0,0 +1,49 @@
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+
+from posts.resharding import move_posts_to_shards
+from posts.sharding import replicate_users
+
+
+class Command(BaseCommand):
+    help = (
+        "Migrate every post shard (POST_SHARDS), which also starts "
+        "its post and comment id range, copy the users into it and "
+        "move the posts written before sharding to their shard"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=1000)
+
+    def handle(self, *args, **options):
+        if not settings.POST_SHARDS:
+            raise CommandError(
+                "Post sharding is off, set POST_SHARD_COUNT to enable it"
+            )
+        for using in settings.POST_SHARDS:
+            call_command(
+                "migrate",
+                database=using,
+                interactive=False,
+                verbosity=options["verbosity"],
+            )
+
+        users = get_user_model().objects.order_by("id")
+        last_id = 0
+        copied = 0
+        while True:
+            batch = list(users.filter(id__gt=last_id)[:options["batch_size"]])
+            if not batch:
+                break
+            replicate_users(batch)
+            last_id = batch[-1].id
+            copied += len(batch)
+        moved = move_posts_to_shards(batch_size=options["batch_size"])
+        self.stdout.write(
+            f"{len(settings.POST_SHARDS)} shards ready, "
+            f"{copied} users copied to each, {moved['posts']} posts, "
+            f"{moved['comments']} comments and {moved['archived']} "
+            "archived posts moved from default"
+        )
@@ -0,0 +1,30 @@
+# Generated by Django 4.2.3 on 2026-10-19 08:34
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("posts", "0003_comment_user_alter_post_likes_post_tags"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="post",
+            name="is_published",
+            field=models.BooleanField(default=True),
+        ),
+        migrations.AddField(
+            model_name="post",
+            name="publish_at",
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name="post",
+            index=models.Index(
+                condition=models.Q(("is_published", False)),
+                fields=["publish_at"],
+                name="post_pending_publish_at_idx",
+            ),
+        ),
+    ]
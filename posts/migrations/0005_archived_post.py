@@ -0,0 +1,78 @@
+# Generated by Django 4.2.3 on 2026-10-19 08:38
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ("posts", "0004_post_publish_at"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ArchivedComment",
+            fields=[
+                ("id", models.BigIntegerField(primary_key=True, serialize=False)),
+                ("text", models.TextField()),
+            ],
+        ),
+        migrations.CreateModel(
+            name="ArchivedPost",
+            fields=[
+                ("id", models.BigIntegerField(primary_key=True, serialize=False)),
+                ("title", models.CharField(max_length=100)),
+                ("text", models.TextField()),
+                ("created", models.DateTimeField()),
+                ("archived", models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                "ordering": ["-created"],
+            },
+        ),
+        migrations.AddIndex(
+            model_name="post",
+            index=models.Index(fields=["created"], name="post_created_idx"),
+        ),
+        migrations.AddField(
+            model_name="archivedpost",
+            name="likes",
+            field=models.ManyToManyField(
+                related_name="archived_liked_posts", to=settings.AUTH_USER_MODEL
+            ),
+        ),
+        migrations.AddField(
+            model_name="archivedpost",
+            name="tags",
+            field=models.ManyToManyField(related_name="archived_posts", to="posts.tag"),
+        ),
+        migrations.AddField(
+            model_name="archivedpost",
+            name="user",
+            field=models.ForeignKey(
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="archived_posts",
+                to=settings.AUTH_USER_MODEL,
+            ),
+        ),
+        migrations.AddField(
+            model_name="archivedcomment",
+            name="post",
+            field=models.ForeignKey(
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="comments",
+                to="posts.archivedpost",
+            ),
+        ),
+        migrations.AddField(
+            model_name="archivedcomment",
+            name="user",
+            field=models.ForeignKey(
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="archived_comments",
+                to=settings.AUTH_USER_MODEL,
+            ),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 4.2.3 on 2026-10-19 08:39
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("posts", "0005_archived_post"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="post",
+            name="is_deleted",
+            field=models.BooleanField(default=False),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 4.2.3 on 2026-10-19 08:46
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("posts", "0006_post_is_deleted"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="post",
+            name="version",
+            field=models.PositiveIntegerField(default=1),
+        ),
+    ]
@@ -0,0 +1,72 @@
+# Generated by Django 4.2.3 on 2026-10-19 09:07
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+BATCH_SIZE = 1000
+
+
+def set_root_paths(apps, schema_editor):
+    """Existing comments are all top-level: their path is their id"""
+    Comment = apps.get_model("posts", "Comment")
+    comments = Comment.objects.using(schema_editor.connection.alias)
+    last_id = 0
+    while True:
+        batch = list(
+            comments.filter(id__gt=last_id).order_by("id").only("id")
+            [:BATCH_SIZE]
+        )
+        if not batch:
+            return
+        for comment in batch:
+            comment.path = format(comment.id, "012x")
+        comments.bulk_update(batch, ["path"])
+        last_id = batch[-1].id
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("posts", "0007_post_version"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="comment",
+            name="depth",
+            field=models.PositiveSmallIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name="comment",
+            name="parent",
+            field=models.ForeignKey(
+                blank=True,
+                null=True,
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="replies",
+                to="posts.comment",
+            ),
+        ),
+        migrations.AddField(
+            model_name="comment",
+            name="path",
+            field=models.CharField(default="", editable=False, max_length=255),
+        ),
+        migrations.AddField(
+            model_name="comment",
+            name="reply_count",
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(set_root_paths, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name="comment",
+            index=models.Index(fields=["post", "path"], name="comment_thread_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="comment",
+            index=models.Index(
+                condition=models.Q(("depth", 0)),
+                fields=["post", "path"],
+                name="comment_top_level_idx",
+            ),
+        ),
+    ]
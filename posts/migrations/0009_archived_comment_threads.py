@@ -0,0 +1,69 @@
+# Generated by Django 4.2.3 on 2026-10-19 10:30
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+BATCH_SIZE = 1000
+
+
+def set_root_paths(apps, schema_editor):
+    """
+    Comments archived before their thread was kept are shown
+    as top-level: their path is their id
+    """
+    ArchivedComment = apps.get_model("posts", "ArchivedComment")
+    comments = ArchivedComment.objects.using(schema_editor.connection.alias)
+    last_id = 0
+    while True:
+        batch = list(
+            comments.filter(id__gt=last_id).order_by("id").only("id")
+            [:BATCH_SIZE]
+        )
+        if not batch:
+            return
+        for comment in batch:
+            comment.path = format(comment.id, "012x")
+        comments.bulk_update(batch, ["path"])
+        last_id = batch[-1].id
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("posts", "0008_comment_threads"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="archivedcomment",
+            name="depth",
+            field=models.PositiveSmallIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name="archivedcomment",
+            name="parent",
+            field=models.ForeignKey(
+                blank=True,
+                null=True,
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="replies",
+                to="posts.archivedcomment",
+            ),
+        ),
+        migrations.AddField(
+            model_name="archivedcomment",
+            name="path",
+            field=models.CharField(default="", editable=False, max_length=255),
+        ),
+        migrations.AddField(
+            model_name="archivedcomment",
+            name="reply_count",
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(set_root_paths, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name="archivedcomment",
+            index=models.Index(
+                fields=["post", "path"], name="archived_comment_thread_idx"
+            ),
+        ),
+    ]
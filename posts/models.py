@@ -1,6 +1,8 @@
 from django.conf import settings
 from django.db import models
 
+from posts.sharding import ShardRoutedQuerySet
+
 
 class Tag(models.Model):
     name = models.CharField(
@@ -33,12 +35,49 @@ class Post(models.Model):
     tags = models.ManyToManyField(
         Tag, related_name="posts"
     )
+    publish_at = models.DateTimeField(
+        null=True, blank=True
+    )
+    is_published = models.BooleanField(default=True)
+    # Soft-deleted posts are hidden at once and purged by a task
+    is_deleted = models.BooleanField(default=False)
+    # Bumped on every change to the serialized post, keys its cached JSON
+    version = models.PositiveIntegerField(default=1)
+
+    objects = ShardRoutedQuerySet.as_manager()
 
     def __str__(self):
         return self.title
 
+    def save(self, *args, **kwargs):
+        """
+        An edit bumps the version in its own UPDATE, the new value
+        is loaded again when it is read
+        """
+        update_fields = kwargs.get("update_fields")
+        if self._state.adding or (
+                update_fields is not None and not update_fields
+        ):
+            return super().save(*args, **kwargs)
+        if update_fields is not None:
+            kwargs["update_fields"] = {*update_fields, "version"}
+        self.version = models.F("version") + 1
+        super().save(*args, **kwargs)
+        del self.version
+        return None
+
     class Meta:
         ordering = ["-created"]
+        indexes = [
+            models.Index(fields=["created"], name="post_created_idx"),
+            # Only pending posts are indexed, so claiming due posts
+            # stays cheap no matter how many posts are published
+            models.Index(
+                fields=["publish_at"],
+                condition=models.Q(is_published=False),
+                name="post_pending_publish_at_idx",
+            )
+        ]
 
 
 class Comment(models.Model):
@@ -53,6 +92,123 @@ class Comment(models.Model):
         related_name="comments",
         on_delete=models.CASCADE,
     )
+    # Replies: see posts.threads for path, depth and reply_count
+    parent = models.ForeignKey(
+        "self",
+        null=True,
+        blank=True,
+        on_delete=models.CASCADE,
+        related_name="replies",
+    )
+    path = models.CharField(max_length=255, default="", editable=False)
+    depth = models.PositiveSmallIntegerField(default=0, editable=False)
+    # Replies below the comment at any depth, maintained on write
+    reply_count = models.PositiveIntegerField(default=0, editable=False)
+
+    objects = ShardRoutedQuerySet.as_manager()
+
+    def __str__(self):
+        return self.text
+
+    class Meta:
+        indexes = [
+            # Subtrees are path ranges within a post
+            models.Index(fields=["post", "path"], name="comment_thread_idx"),
+            # Only top-level comments, for paginating threads
+            models.Index(
+                fields=["post", "path"],
+                condition=models.Q(depth=0),
+                name="comment_top_level_idx",
+            ),
+        ]
+
+
+class ArchivedPost(models.Model):
+    """
+    Cold copy of a post moved out of the hot tables by the
+    archival job, it keeps the id the post had in ``Post``
+    """
+
+    id = models.BigIntegerField(primary_key=True)
+    title = models.CharField(max_length=100)
+    text = models.TextField()
+    created = models.DateTimeField()
+    archived = models.DateTimeField(auto_now_add=True)
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name="archived_posts",
+    )
+    likes = models.ManyToManyField(
+        settings.AUTH_USER_MODEL,
+        related_name="archived_liked_posts",
+    )
+    tags = models.ManyToManyField(
+        Tag, related_name="archived_posts"
+    )
+
+    def __str__(self):
+        return self.title
+
+    class Meta:
+        ordering = ["-created"]
+
+
+class ArchivedComment(models.Model):
+    id = models.BigIntegerField(primary_key=True)
+    text = models.TextField()
+    post = models.ForeignKey(
+        ArchivedPost,
+        on_delete=models.CASCADE,
+        related_name="comments",
+    )
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        related_name="archived_comments",
+        on_delete=models.CASCADE,
+    )
+    # The thread fields of the comment, copied as they were
+    parent = models.ForeignKey(
+        "self",
+        null=True,
+        blank=True,
+        on_delete=models.CASCADE,
+        related_name="replies",
+    )
+    path = models.CharField(max_length=255, default="", editable=False)
+    depth = models.PositiveSmallIntegerField(default=0, editable=False)
+    reply_count = models.PositiveIntegerField(default=0, editable=False)
 
     def __str__(self):
         return self.text
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["post", "path"], name="archived_comment_thread_idx"
+            ),
+        ]
+
+
+def without_deleted_users(*relations, model=Post):
+    """
+    prefetch_related() lookups for the relations of posts (or
+    archived posts) that leave out the likes and comments of
+    soft-deleted users until the purge removes them
+    """
+    lookups = []
+    for name in relations:
+        related_model = model._meta.get_field(name).related_model
+        if name == "likes":
+            queryset = related_model._default_manager.filter(
+                is_deleted=False
+            )
+        elif name == "comments":
+            queryset = related_model._default_manager.filter(
+                user__is_deleted=False
+            )
+        else:
+            lookups.append(name)
+            continue
+        lookups.append(models.Prefetch(name, queryset=queryset))
+    return lookups
@@ -8,7 +8,7 @@ class IsOwnerOrReadOnly(BasePermission):
             request.method in permissions.SAFE_METHODS
             or request.user
             and request.user.is_authenticated
-            and obj.user == request.user
+            and obj.user_id == request.user.id
         )
 
     def has_permission(self, request, view):
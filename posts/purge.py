@@ -0,0 +1,120 @@
+import time
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, models, router, transaction
+
+from posts.models import Comment, Post
+from posts.sharding import SHARDED_APPS, post_databases
+
+
+def posts_touched_by(user_id):
+    """
+    Ids of the posts a user liked or commented on, their cached
+    fragments change when the user's rows are purged
+    """
+    post_ids = set()
+    for using in post_databases():
+        for model in (Post.likes.through, Comment):
+            post_ids.update(
+                model.objects.using(using).filter(user_id=user_id)
+                .values_list("post_id", flat=True).distinct()
+            )
+    return sorted(post_ids)
+
+
+def _dependents(model):
+    """Reverse relations (including M2M through rows) pointing at model."""
+    return [
+        relation
+        for relation in model._meta.get_fields(include_hidden=True)
+        if (relation.one_to_many or relation.one_to_one)
+        and relation.auto_created
+        and not relation.concrete
+    ]
+
+
+class BatchPurger:
+    """
+    Delete rows and everything depending on them without Django's
+    cascade collector: dependents are removed first with raw
+    ``DELETE ... WHERE id IN (batch)`` statements, each batch in its
+    own short transaction, pausing between batches so other writers
+    can take the SQLite lock.
+
+    Rows are purged on the database of the queryset. Dependents of
+    posts and comments without a table on their shard (activities
+    and notifications) are on default, looked up by the purged ids.
+    """
+
+    def __init__(self, batch_size=None, pause=None, on_progress=None):
+        self.batch_size = batch_size or settings.PURGE_BATCH_SIZE
+        self.pause = settings.PURGE_BATCH_PAUSE if pause is None else pause
+        self.on_progress = on_progress
+        self.rows = 0
+
+    def purge(self, queryset, path=()):
+        model = queryset.model
+        using = queryset.db
+        for relation in _dependents(model):
+            if not router.allow_migrate_model(using, relation.related_model):
+                if (
+                        relation.on_delete is models.CASCADE
+                        and model._meta.app_label in SHARDED_APPS
+                ):
+                    self._purge_on_default(queryset, relation, path)
+                continue
+            related_queryset = relation.related_model._base_manager.using(
+                using
+            ).filter(**{f"{relation.field.name}__in": queryset.values("pk")})
+            if relation.on_delete is models.CASCADE:
+                if relation.related_model is model:
+                    # Replies of replies: the tree below is purged
+                    # bottom up, one level deeper per call
+                    if related_queryset.exists():
+                        self.purge(related_queryset, path)
+                    continue
+                if relation.related_model in path + (model,):
+                    raise ValueError(
+                        f"Cannot purge cyclic relation {relation}"
+                    )
+                self.purge(related_queryset, path + (model,))
+            elif relation.on_delete is models.SET_NULL:
+                self._in_batches(
+                    related_queryset,
+                    lambda batch: batch.update(**{relation.field.name: None}),
+                )
+        self._in_batches(
+            queryset, lambda batch: batch._raw_delete(batch.db)
+        )
+        return self.rows
+
+    def _purge_on_default(self, queryset, relation, path):
+        related_manager = relation.related_model._base_manager.using(
+            DEFAULT_DB_ALIAS
+        )
+        pks = list(queryset.values_list("pk", flat=True))
+        for start in range(0, len(pks), self.batch_size):
+            self.purge(
+                related_manager.filter(
+                    **{
+                        f"{relation.field.name}__in": (
+                            pks[start:start + self.batch_size]
+                        )
+                    }
+                ),
+                path + (queryset.model,),
+            )
+
+    def _in_batches(self, queryset, operation):
+        model = queryset.model
+        using = queryset.db
+        while True:
+            pks = list(queryset.values_list("pk", flat=True)[:self.batch_size])
+            if not pks:
+                return
+            with transaction.atomic(using=using):
+                operation(model._base_manager.using(using).filter(pk__in=pks))
+            self.rows += len(pks)
+            if self.on_progress:
+                self.on_progress(model._meta.label, self.rows)
+            time.sleep(self.pause)
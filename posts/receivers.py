@@ -0,0 +1,104 @@
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.db.models.signals import (
+    m2m_changed,
+    post_delete,
+    post_migrate,
+    post_save,
+)
+from django.dispatch import receiver
+
+from posts import live, sharding, threads
+from posts.fragments import bump_versions
+from posts.models import Comment, Post
+from posts.signals import posts_published
+
+
+def _publish_on_commit(channel, event):
+    transaction.on_commit(lambda: live.publish(channel, event))
+
+
+@receiver(post_save, sender=Post)
+def announce_new_post(sender, instance, created, **kwargs):
+    if created and instance.is_published:
+        _publish_on_commit(
+            live.author_channel(instance.user_id),
+            {"type": "post", "post": instance.id},
+        )
+
+
+@receiver(posts_published, sender=Post)
+def announce_published_posts(sender, post_ids, using, **kwargs):
+    for post_id, user_id in Post.objects.using(using).filter(
+            id__in=post_ids
+    ).values_list("id", "user_id"):
+        live.publish(
+            live.author_channel(user_id),
+            {"type": "post", "post": post_id},
+        )
+
+
+@receiver(post_save, sender=Comment)
+def thread_new_comment(sender, instance, created, **kwargs):
+    if created:
+        threads.attach(instance)
+
+
+@receiver(post_save, sender=Comment)
+def announce_new_comment(sender, instance, created, **kwargs):
+    if created:
+        _publish_on_commit(
+            live.post_channel(instance.post_id),
+            {
+                "type": "comment",
+                "post": instance.post_id,
+                "comment": instance.id,
+            },
+        )
+
+
+@receiver(m2m_changed, sender=Post.likes.through)
+def announce_like_change(sender, instance, action, pk_set, reverse, **kwargs):
+    if action not in ("post_add", "post_remove") or not pk_set:
+        return
+    sign = 1 if action == "post_add" else -1
+    if reverse:
+        # Changed from the user side (user.posts), one like per post
+        changes = [(post_id, sign) for post_id in pk_set]
+    else:
+        changes = [(instance.pk, sign * len(pk_set))]
+    for post_id, delta in changes:
+        _publish_on_commit(
+            live.post_channel(post_id),
+            {"type": "likes", "post": post_id, "delta": delta},
+        )
+
+
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+def invalidate_commented_post(sender, instance, **kwargs):
+    bump_versions([instance.post_id])
+
+
+@receiver(m2m_changed, sender=Post.likes.through)
+def invalidate_liked_posts(sender, instance, action, pk_set, reverse, **kwargs):
+    if reverse:
+        # Changed from the user side (user.posts)
+        if action in ("post_add", "post_remove"):
+            bump_versions(pk_set)
+        elif action == "pre_clear":
+            bump_versions(instance.posts.values_list("id", flat=True))
+    elif action in ("post_add", "post_remove", "post_clear"):
+        bump_versions([instance.pk])
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+def replicate_user(sender, instance, using, **kwargs):
+    if sharding.is_sharded() and using == DEFAULT_DB_ALIAS:
+        sharding.replicate_users([instance])
+
+
+@receiver(post_migrate)
+def seed_shard_ids(sender, using, **kwargs):
+    if sender.name == "posts" and using in settings.POST_SHARDS:
+        sharding.seed_shard_ids(using)
@@ -0,0 +1,247 @@
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.db.models import Case, Max, Value, When
+
+from notifications.models import Activity, Notification
+from posts.models import (
+    ArchivedComment,
+    ArchivedPost,
+    Comment,
+    Post,
+    Tag,
+)
+from posts.purge import BatchPurger
+from posts.sharding import (
+    group_by_shard,
+    post_databases,
+    seed_shard_ids,
+    shard_for_id,
+    shard_for_user,
+)
+from posts.threads import path_step
+
+POST_FIELDS = (
+    "title",
+    "text",
+    "user_id",
+    "publish_at",
+    "is_published",
+    "version",
+)
+
+
+def _tag_ids(names, using):
+    """{name: id} of tags on ``using``, created where missing"""
+    tags = Tag.objects.using(using)
+    tags.bulk_create(
+        [Tag(name=name) for name in set(names)], ignore_conflicts=True
+    )
+    return dict(tags.filter(name__in=set(names)).values_list("name", "id"))
+
+
+def _remap(model, post_ids):
+    """Point rows of ``model`` on default at the new post ids"""
+    model.objects.filter(post_id__in=list(post_ids)).update(
+        post_id=Case(
+            *[
+                When(post_id=old_id, then=Value(new_id))
+                for old_id, new_id in post_ids.items()
+            ]
+        )
+    )
+
+
+def _move_comments(post_ids, using):
+    """
+    Copy the comments of the moved posts level by level, parents
+    first, so every reply gets the new id and path of its parent.
+    Returns the number of comments copied.
+    """
+    comments = Comment.objects.using(DEFAULT_DB_ALIAS).filter(
+        post_id__in=list(post_ids)
+    )
+    new_comments = {}
+    depth = 0
+    while True:
+        level = list(comments.filter(depth=depth).order_by("id"))
+        if not level:
+            return len(new_comments)
+        copies = Comment.objects.using(using).bulk_create(
+            [
+                Comment(
+                    text=comment.text,
+                    post_id=post_ids[comment.post_id],
+                    user_id=comment.user_id,
+                    parent_id=(
+                        new_comments[comment.parent_id].id
+                        if comment.parent_id else None
+                    ),
+                    depth=comment.depth,
+                    reply_count=comment.reply_count,
+                )
+                for comment in level
+            ]
+        )
+        for comment, copy in zip(level, copies):
+            parent = new_comments.get(comment.parent_id)
+            copy.path = (parent.path if parent else "") + path_step(copy.id)
+            new_comments[comment.id] = copy
+        Comment.objects.using(using).bulk_update(copies, ["path"])
+        depth += 1
+
+
+def _move_post_batch(posts, using):
+    """
+    Copy posts of default with their tags, likes and comments
+    to ``using``, returns ({old id: new id}, comments copied)
+    """
+    copies = Post.objects.using(using).bulk_create(
+        [
+            Post(**{field: getattr(post, field) for field in POST_FIELDS})
+            for post in posts
+        ]
+    )
+    # created is auto_now_add, original timestamps are restored after insert
+    for post, copy in zip(posts, copies):
+        copy.created = post.created
+    Post.objects.using(using).bulk_update(copies, ["created"])
+    post_ids = {post.id: copy.id for post, copy in zip(posts, copies)}
+
+    tag_rows = list(
+        Post.tags.through.objects.filter(
+            post_id__in=list(post_ids)
+        ).values_list("post_id", "tag__name")
+    )
+    tag_ids = _tag_ids([name for _, name in tag_rows], using)
+    Post.tags.through.objects.using(using).bulk_create(
+        [
+            Post.tags.through(post_id=post_ids[post_id], tag_id=tag_ids[name])
+            for post_id, name in tag_rows
+        ]
+    )
+    Post.likes.through.objects.using(using).bulk_create(
+        [
+            Post.likes.through(post_id=post_ids[post_id], user_id=user_id)
+            for post_id, user_id in Post.likes.through.objects.filter(
+                post_id__in=list(post_ids)
+            ).values_list("post_id", "user_id")
+        ]
+    )
+    return post_ids, _move_comments(post_ids, using)
+
+
+def _move_archived_batch(posts, using):
+    """Copy archived posts of default to ``using``, keeping their ids"""
+    post_ids = [post.id for post in posts]
+    archived = [post.archived for post in posts]
+    ArchivedPost.objects.using(using).bulk_create(posts)
+    # archived is auto_now_add too
+    for post, timestamp in zip(posts, archived):
+        post.archived = timestamp
+    ArchivedPost.objects.using(using).bulk_update(posts, ["archived"])
+    # Parents sort before their replies
+    ArchivedComment.objects.using(using).bulk_create(
+        ArchivedComment.objects.filter(post_id__in=post_ids).order_by("path")
+    )
+    likes = ArchivedPost.likes.through
+    likes.objects.using(using).bulk_create(
+        likes.objects.filter(archivedpost_id__in=post_ids)
+    )
+    tags = ArchivedPost.tags.through
+    tag_rows = list(
+        tags.objects.filter(archivedpost_id__in=post_ids)
+        .values_list("archivedpost_id", "tag__name")
+    )
+    tag_ids = _tag_ids([name for _, name in tag_rows], using)
+    tags.objects.using(using).bulk_create(
+        [
+            tags(archivedpost_id=post_id, tag_id=tag_ids[name])
+            for post_id, name in tag_rows
+        ]
+    )
+
+
+def _reserve_default_ids():
+    """
+    Start the shard ids after the ids used on default, archived
+    posts and comments keep theirs when they move to a shard
+    """
+    reserved = max(
+        model.objects.aggregate(last_id=Max("id"))["last_id"] or 0
+        for model in (Post, Comment, ArchivedPost, ArchivedComment)
+    )
+    for using in post_databases():
+        seed_shard_ids(using, reserved)
+
+
+def move_posts_to_shards(batch_size=1000):
+    """
+    Move the posts written to default before sharding was enabled
+    to the shard of their author, in batches. They get ids in the
+    range of their shard (ids encode it), their notifications are
+    pointed at the new ids. Archived posts go to the shard of their
+    id with their ids unchanged. Soft-deleted posts are purged
+    rather than moved.
+    A batch is removed from default once it is committed on the
+    shards, running the move again continues with what is left.
+    Returns {"posts": moved, "comments": moved, "archived": moved}
+    """
+    counts = {"posts": 0, "comments": 0, "archived": 0}
+    BatchPurger(pause=0).purge(
+        Post.objects.using(DEFAULT_DB_ALIAS).filter(is_deleted=True)
+    )
+    _reserve_default_ids()
+
+    while True:
+        posts = list(
+            Post.objects.using(DEFAULT_DB_ALIAS).order_by("id")[:batch_size]
+        )
+        if not posts:
+            break
+        post_ids = {}
+        with transaction.atomic():
+            for using, shard_posts in group_by_shard(
+                    posts, lambda post: shard_for_user(post.user_id)
+            ).items():
+                with transaction.atomic(using=using):
+                    moved, comments = _move_post_batch(shard_posts, using)
+                post_ids.update(moved)
+                counts["comments"] += comments
+            for model in (Activity, Notification):
+                _remap(model, post_ids)
+            for model in (Comment, Post.likes.through, Post.tags.through):
+                model.objects.filter(
+                    post_id__in=list(post_ids)
+                )._raw_delete(DEFAULT_DB_ALIAS)
+            Post.objects.filter(
+                id__in=list(post_ids)
+            )._raw_delete(DEFAULT_DB_ALIAS)
+        counts["posts"] += len(posts)
+
+    while True:
+        posts = list(
+            ArchivedPost.objects.using(DEFAULT_DB_ALIAS)
+            .order_by("id")[:batch_size]
+        )
+        if not posts:
+            break
+        post_ids = [post.id for post in posts]
+        with transaction.atomic():
+            for using, shard_posts in group_by_shard(
+                    posts, lambda post: shard_for_id(post.id)
+            ).items():
+                with transaction.atomic(using=using):
+                    _move_archived_batch(shard_posts, using)
+            ArchivedComment.objects.filter(
+                post_id__in=post_ids
+            )._raw_delete(DEFAULT_DB_ALIAS)
+            for model in (
+                    ArchivedPost.likes.through, ArchivedPost.tags.through
+            ):
+                model.objects.filter(
+                    archivedpost_id__in=post_ids
+                )._raw_delete(DEFAULT_DB_ALIAS)
+            ArchivedPost.objects.filter(
+                id__in=post_ids
+            )._raw_delete(DEFAULT_DB_ALIAS)
+        counts["archived"] += len(posts)
+    return counts
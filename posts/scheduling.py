@@ -0,0 +1,39 @@
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from posts.models import Post
+from posts.signals import posts_published
+
+
+def is_due(publish_at):
+    return publish_at is None or publish_at <= timezone.now()
+
+
+def publish_due_posts(batch_size=None, using=DEFAULT_DB_ALIAS):
+    """
+    Claim one batch of due scheduled posts of the ``using``
+    database through the pending publish_at index and publish
+    them, returns the published ids
+    """
+    batch_size = batch_size or settings.POST_PUBLISH_BATCH_SIZE
+    with transaction.atomic(using=using):
+        post_ids = list(
+            Post.objects.using(using).select_for_update(skip_locked=True)
+            .filter(is_published=False, publish_at__lte=timezone.now())
+            .order_by("publish_at")
+            .values_list("id", flat=True)[:batch_size]
+        )
+        if not post_ids:
+            return []
+        # Published posts take their place in the feed at publish time
+        Post.objects.using(using).filter(
+            id__in=post_ids, is_published=False
+        ).update(
+            is_published=True,
+            created=F("publish_at"),
+            version=F("version") + 1,
+        )
+    posts_published.send(sender=Post, post_ids=post_ids, using=using)
+    return post_ids
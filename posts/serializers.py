@@ -1,18 +1,62 @@
+from django.conf import settings
 from django.contrib.auth import get_user_model
 from rest_framework import serializers
 
+from posts import sharding
+from posts.hashtags import extract_hashtags, sync_post_tags
+from posts.viewer_state import ViewerState
 from posts.models import (
+    ArchivedComment,
+    ArchivedPost,
     Post,
     Comment,
 )
+from social_media_api.sparse_fields import SparseFieldsetsMixin
 
 
-class CommentSerializer(serializers.ModelSerializer):
+class ParentCommentField(serializers.PrimaryKeyRelatedField):
+    """
+    A comment of the post given in ?post_id=, or of the post of
+    the comment being edited (on its shard)
+    """
+
+    def get_queryset(self):
+        request = self.context.get("request")
+        post_id = request.query_params.get("post_id") if request else None
+        if not post_id and self.parent.instance is not None:
+            post_id = self.parent.instance.post_id
+        try:
+            post_id = int(post_id)
+        except (TypeError, ValueError):
+            return Comment.objects.none()
+        return Comment.objects.using(
+            sharding.shard_for_id(post_id)
+        ).filter(post_id=post_id)
+
+
+class CommentSerializer(
+    SparseFieldsetsMixin, serializers.ModelSerializer
+):
     left_by = serializers.IntegerField(source="user_id", read_only=True)
+    parent = ParentCommentField(required=False, allow_null=True)
 
     class Meta:
         model = Comment
-        fields = ("id", "text", "left_by")
+        fields = ("id", "text", "left_by", "parent", "depth", "reply_count")
+
+    def validate_parent(self, parent):
+        if self.instance is not None:
+            if parent != self.instance.parent:
+                raise serializers.ValidationError(
+                    "A reply cannot be moved."
+                )
+            return parent
+        if parent is not None and parent.depth >= settings.COMMENT_MAX_DEPTH:
+            raise serializers.ValidationError(
+                "Replies can be nested at most "
+                f"{settings.COMMENT_MAX_DEPTH} levels deep."
+            )
+        return parent
 
 
 class UserSerializer(serializers.ModelSerializer):
@@ -21,14 +65,74 @@ class UserSerializer(serializers.ModelSerializer):
         fields = ("id",)
 
 
-class PostSerializer(serializers.ModelSerializer):
+class PostSerializer(SparseFieldsetsMixin, serializers.ModelSerializer):
     likes = UserSerializer(many=True, read_only=True)
     comments = CommentSerializer(read_only=True, many=True)
     user = UserSerializer(read_only=True)
+    tags = serializers.SlugRelatedField(
+        many=True, read_only=True, slug_field="name"
+    )
+    liked_by_me = serializers.SerializerMethodField()
+    following_author = serializers.SerializerMethodField()
 
     class Meta:
         model = Post
-        fields = ("id", "title", "text", "user", "created", "likes", "comments")
+        fields = (
+            "id",
+            "title",
+            "text",
+            "user",
+            "created",
+            "publish_at",
+            "is_published",
+            "tags",
+            "liked_by_me",
+            "following_author",
+            "likes",
+            "comments",
+        )
+        read_only_fields = ("is_published",)
+        expandable_fields = ("likes", "comments", "tags")
+
+    def get_viewer_state(self, post):
+        """
+        Views put the state of the whole page into the context,
+        a single post serialized without it resolves its own once
+        for both flags
+        """
+        viewer_state = self.context.get("viewer_state")
+        if viewer_state is None:
+            resolved = self.__dict__.setdefault("_viewer_states", {})
+            if post.id not in resolved:
+                request = self.context.get("request")
+                resolved[post.id] = ViewerState.resolve(
+                    getattr(request, "user", None), [post]
+                )
+            viewer_state = resolved[post.id]
+        return viewer_state
+
+    def get_liked_by_me(self, post) -> bool:
+        return self.get_viewer_state(post).liked(post)
+
+    def get_following_author(self, post) -> bool:
+        return self.get_viewer_state(post).follows_author(post)
+
+    def create(self, validated_data):
+        """Create a post and tag it with the #hashtags it contains"""
+        post = super().create(validated_data)
+        sync_post_tags([post])
+        return post
+
+    def update(self, instance, validated_data):
+        """
+        Update a post and re-extract its #hashtags when the
+        edit changed them
+        """
+        previous = extract_hashtags(instance.title, instance.text)
+        post = super().update(instance, validated_data)
+        if set(extract_hashtags(post.title, post.text)) != set(previous):
+            sync_post_tags([post], previous={post.id: previous})
+        return post
 
 
 class PostDetailAddCommentSerializer(serializers.ModelSerializer):
@@ -37,3 +141,35 @@ class PostDetailAddCommentSerializer(serializers.ModelSerializer):
     class Meta:
         model = Post
         fields = ("comments",)
+
+
+class ArchivedCommentSerializer(serializers.ModelSerializer):
+    left_by = serializers.IntegerField(source="user_id", read_only=True)
+
+    class Meta:
+        model = ArchivedComment
+        fields = ("id", "text", "left_by", "parent", "depth", "reply_count")
+        read_only_fields = ("parent",)
+
+
+class ArchivedPostSerializer(serializers.ModelSerializer):
+    likes = UserSerializer(many=True, read_only=True)
+    comments = ArchivedCommentSerializer(read_only=True, many=True)
+    user = UserSerializer(read_only=True)
+    is_archived = serializers.SerializerMethodField()
+
+    class Meta:
+        model = ArchivedPost
+        fields = (
+            "id",
+            "title",
+            "text",
+            "user",
+            "created",
+            "is_archived",
+            "likes",
+            "comments",
+        )
+
+    def get_is_archived(self, obj) -> bool:
+        return True
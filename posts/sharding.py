@@ -0,0 +1,264 @@
+import heapq
+from itertools import islice
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import DEFAULT_DB_ALIAS, connections, models, router
+
+# Post and comment ids of shard N start after N << ID_SHARD_SHIFT,
+# the shard of any id is known without a lookup
+ID_SHARD_SHIFT = 40
+# Apps partitioned across the shards
+SHARDED_APPS = {"posts"}
+# Apps with tables on every shard: the partitioned ones plus the
+# user tables their foreign keys point to, replicated from default
+SHARD_APPS = SHARDED_APPS | {"user", "auth", "contenttypes"}
+# Tables whose ids encode their shard
+SHARD_ID_TABLES = ("posts_post", "posts_comment")
+
+
+def is_sharded():
+    return bool(settings.POST_SHARDS)
+
+
+def post_databases():
+    """Databases holding posts: every shard, or default"""
+    return settings.POST_SHARDS or [DEFAULT_DB_ALIAS]
+
+
+def shard_for_user(user_id):
+    """Database of the posts of an author"""
+    shards = settings.POST_SHARDS
+    if not shards:
+        return DEFAULT_DB_ALIAS
+    return shards[int(user_id) % len(shards)]
+
+
+def shard_for_id(object_id):
+    """
+    Database of a post or comment id, ids that belong to no
+    shard map to one where they are simply not found
+    """
+    shards = settings.POST_SHARDS
+    if not shards:
+        return DEFAULT_DB_ALIAS
+    try:
+        index = int(object_id) >> ID_SHARD_SHIFT
+    except (TypeError, ValueError):
+        index = 0
+    return shards[min(max(index, 0), len(shards) - 1)]
+
+
+def group_by_shard(objects, shard_for=shard_for_id):
+    """{database: objects}, of post or comment ids by default"""
+    groups = {}
+    for obj in objects:
+        groups.setdefault(shard_for(obj), []).append(obj)
+    return groups
+
+
+def seed_shard_ids(using, reserved=0):
+    """
+    Start the post and comment ids of a shard at its range, or
+    after ``reserved``, ids handed out already are left alone
+    """
+    index = settings.POST_SHARDS.index(using)
+    first_id = max(index << ID_SHARD_SHIFT, reserved)
+    connection = connections[using]
+    with connection.cursor() as cursor:
+        for table in SHARD_ID_TABLES:
+            if connection.vendor == "sqlite":
+                cursor.execute(
+                    "SELECT seq FROM sqlite_sequence WHERE name = %s", [table]
+                )
+                row = cursor.fetchone()
+                if row is None:
+                    cursor.execute(
+                        "INSERT INTO sqlite_sequence (name, seq) "
+                        "VALUES (%s, %s)",
+                        [table, first_id],
+                    )
+                elif row[0] < first_id:
+                    cursor.execute(
+                        "UPDATE sqlite_sequence SET seq = %s WHERE name = %s",
+                        [first_id, table],
+                    )
+            elif connection.vendor == "postgresql":
+                cursor.execute(
+                    "SELECT setval(pg_get_serial_sequence(%s, 'id'), "
+                    "GREATEST(%s, (SELECT COALESCE(MAX(id), 0) "
+                    f"FROM {connection.ops.quote_name(table)})))",
+                    [table, first_id or 1],
+                )
+            else:
+                raise NotImplementedError(
+                    f"Shard id ranges are not supported on {connection.vendor}"
+                )
+
+
+def replicate_users(users, shards=None):
+    """
+    Upsert user rows into the shards, one statement per shard,
+    so author joins and foreign keys work there. Replicas are
+    kept (soft-deleted) when the user goes away, the posts on
+    the shard still point to them.
+    """
+    user_model = get_user_model()
+    fields = [
+        field for field in user_model._meta.concrete_fields
+        if not field.primary_key
+    ]
+    for using in shards or settings.POST_SHARDS:
+        user_model.objects.using(using).bulk_create(
+            [
+                user_model(
+                    pk=user.pk,
+                    **{
+                        field.attname: getattr(user, field.attname)
+                        for field in fields
+                    },
+                )
+                for user in users
+            ],
+            update_conflicts=True,
+            unique_fields=["id"],
+            update_fields=[field.name for field in fields],
+        )
+
+
+class ShardRoutedQuerySet(models.QuerySet):
+    """
+    create() saves to the database the router picks for the
+    new object (the shard of its author) rather than the one
+    picked for the bare model
+    """
+
+    def create(self, **kwargs):
+        obj = self.model(**kwargs)
+        self._for_write = True
+        obj.save(
+            force_insert=True,
+            using=self._db or router.db_for_write(self.model, instance=obj),
+        )
+        return obj
+
+
+class PostShardRouter:
+    """
+    Sends the posts app to the shard of the author: a post by
+    its user_id, a comment by its post id, anything else by the
+    database of the post or comment it was reached from (likes,
+    tags, related managers). Queries without such an instance
+    go to default unless they pick a shard with .using()
+    (shard_for_user, shard_for_id or ScatterGather).
+    """
+
+    def db_for_instance(self, model, instance):
+        if model._meta.app_label not in SHARDED_APPS or instance is None:
+            return None
+        if instance._meta.app_label not in SHARDED_APPS:
+            if (
+                    model._meta.model_name == "post"
+                    and instance._meta.model_name == "user"
+            ):
+                # A new post being assigned its author
+                return shard_for_user(instance.pk)
+            return None
+        if instance._state.db in settings.POST_SHARDS:
+            return instance._state.db
+        if instance._meta.model_name == "post" and instance.user_id:
+            return shard_for_user(instance.user_id)
+        if getattr(instance, "post_id", None):
+            return shard_for_id(instance.post_id)
+        return None
+
+    def db_for_read(self, model, **hints):
+        return self.db_for_instance(model, hints.get("instance"))
+
+    def db_for_write(self, model, **hints):
+        return self.db_for_instance(model, hints.get("instance"))
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Users are replicated to every shard
+        if {obj1._meta.app_label, obj2._meta.app_label} <= SHARD_APPS:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if db in settings.POST_SHARDS:
+            return app_label in SHARD_APPS
+        return None
+
+
+class ScatterGather:
+    """
+    The same query run on several shards and read as one list
+    in descending ``key`` order. A page is found with a k-way
+    heap merge of the (key, pk) heads of every shard and then
+    only its rows are loaded, from the shards that hold them.
+    Implements the part of QuerySet used by Paginator and the
+    viewsets: count(), slicing, iteration and filter().
+    """
+
+    ordered = True
+
+    def __init__(self, querysets, key="created"):
+        # {database: queryset}
+        self.querysets = querysets
+        self.key = key
+        self._result_cache = None
+
+    def filter(self, *args, **kwargs):
+        return ScatterGather(
+            {
+                using: queryset.filter(*args, **kwargs)
+                for using, queryset in self.querysets.items()
+            },
+            self.key,
+        )
+
+    def count(self):
+        return sum(queryset.count() for queryset in self.querysets.values())
+
+    def __len__(self):
+        if self._result_cache is not None:
+            return len(self._result_cache)
+        return self.count()
+
+    def __iter__(self):
+        if self._result_cache is None:
+            self._result_cache = self[0:None]
+        return iter(self._result_cache)
+
+    def __getitem__(self, index):
+        if not isinstance(index, slice):
+            objects = self[index:index + 1]
+            if not objects:
+                raise IndexError("ScatterGather index out of range")
+            return objects[0]
+        start, stop = index.start or 0, index.stop
+        # Every shard is sorted, so none of them contributes
+        # more than ``stop`` rows to the first ``stop``
+        heads = [
+            [
+                (key, pk, using)
+                for key, pk in queryset.select_related(None)
+                .prefetch_related(None)
+                .order_by(f"-{self.key}", "-pk")
+                .values_list(self.key, "pk")[:stop]
+            ]
+            for using, queryset in self.querysets.items()
+        ]
+        page = list(
+            islice(heapq.merge(*heads, reverse=True), start, stop, index.step)
+        )
+        ids_by_shard = {}
+        for _, pk, using in page:
+            ids_by_shard.setdefault(using, []).append(pk)
+        objects = {}
+        for using, ids in ids_by_shard.items():
+            objects.update(
+                (obj.pk, obj)
+                for obj in self.querysets[using].filter(pk__in=ids)
+            )
+        return [objects[pk] for _, pk, _ in page]
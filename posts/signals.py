@@ -0,0 +1,6 @@
+from django.dispatch import Signal
+
+# Sent once per batch of scheduled posts that became visible,
+# with ``post_ids`` and the ``using`` database holding them.
+# Feed fan-out and cache invalidation hook here.
+posts_published = Signal()
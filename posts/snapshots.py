@@ -0,0 +1,140 @@
+import math
+import re
+import uuid
+
+from django.conf import settings
+from django.db.models import Count, Q
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+from posts import fragments
+from posts.models import Post, Tag
+from posts.pagination import PostPagination
+from posts.viewer_state import ViewerState
+
+MANIFEST_KEY = "public_feed:manifest"
+PAGE_KEY = "public_feed:{generation}:{tag}:{page}"
+# Query parameters a snapshot page can answer
+SNAPSHOT_PARAMS = {"page", "tags"}
+
+
+def page_key(generation, tag, page):
+    return PAGE_KEY.format(generation=generation, tag=tag, page=page)
+
+
+def public_feed(tag=""):
+    """The feed anonymous users get from PostViewSet.list"""
+    queryset = Post.objects.filter(
+        is_published=True, is_deleted=False, user__is_deleted=False
+    )
+    if tag:
+        queryset = queryset.filter(tags__name__in=[tag])
+    return queryset.distinct()
+
+
+def popular_tags(limit):
+    return list(
+        Tag.objects.annotate(
+            published=Count(
+                "posts",
+                filter=Q(
+                    posts__is_published=True, posts__is_deleted=False
+                ),
+            )
+        )
+        .filter(published__gt=0)
+        .order_by("-published", "name")
+        .values_list("name", flat=True)[:limit]
+    )
+
+
+def refresh():
+    """
+    Render the first PUBLIC_FEED_SNAPSHOT_PAGES pages of the public
+    feed and of the most popular tag feeds under a new generation,
+    then swap the manifest to it: readers see either the old or
+    the new snapshot, never a mix. Returns the manifest.
+    """
+    cache = fragments.fragment_cache()
+    page_size = PostPagination.page_size
+    generation = uuid.uuid4().hex
+    timeout = settings.PUBLIC_FEED_SNAPSHOT_TIMEOUT
+    manifest = {"generation": generation, "feeds": {}}
+    pages = {}
+    viewer_state = ViewerState()
+
+    for tag in ["", *popular_tags(settings.PUBLIC_FEED_SNAPSHOT_TAGS)]:
+        queryset = public_feed(tag)
+        rows = list(
+            queryset.values_list("id", "user_id", "version", named=True)
+            [:settings.PUBLIC_FEED_SNAPSHOT_PAGES * page_size]
+        )
+        for start in range(0, len(rows), page_size):
+            pages[page_key(generation, tag, start // page_size + 1)] = (
+                fragments.assemble_results(
+                    rows[start:start + page_size], viewer_state
+                )
+            )
+        manifest["feeds"][tag] = {
+            "count": queryset.count(),
+            "pages": math.ceil(len(rows) / page_size),
+        }
+
+    cache.set_many(pages, timeout=timeout)
+    cache.set(MANIFEST_KEY, manifest, timeout=timeout)
+    return manifest
+
+
+def get_manifest():
+    """
+    The current manifest, None until the beat task has built one.
+    Requests never build it themselves, they are served from the
+    database meanwhile instead of waiting for a rebuild.
+    """
+    return fragments.fragment_cache().get(MANIFEST_KEY)
+
+
+def get_page(request):
+    """
+    Ready-to-send JSON of the requested public feed page, or None
+    when the request is not answered by the snapshot
+    """
+    params = request.query_params
+    if set(params) - SNAPSHOT_PARAMS:
+        return None
+    tag = params.get("tags", "")
+    page = params.get("page", "1")
+    # ASCII only: "²" passes str.isdigit() but not int()
+    if "," in tag or not re.fullmatch(r"\d+", page, re.ASCII):
+        return None
+    page = int(page)
+
+    manifest = get_manifest()
+    if manifest is None:
+        return None
+    feed = manifest["feeds"].get(tag)
+    if feed is None or not 1 <= page <= feed["pages"]:
+        return None
+    results = fragments.fragment_cache().get(
+        page_key(manifest["generation"], tag, page)
+    )
+    if results is None:
+        return None
+
+    # Links are built the way PageNumberPagination does
+    url = request.build_absolute_uri()
+    page_count = math.ceil(feed["count"] / PostPagination.page_size)
+    if page == 1:
+        previous_link = None
+    elif page == 2:
+        previous_link = remove_query_param(url, "page")
+    else:
+        previous_link = replace_query_param(url, "page", page - 1)
+    envelope = {
+        "count": feed["count"],
+        "next": (
+            replace_query_param(url, "page", page + 1)
+            if page < page_count else None
+        ),
+        "previous": previous_link,
+    }
+    return fragments.render_page(envelope, results)
@@ -1,7 +1,132 @@
-from posts.create_random_post import create_random_post
-from celery import shared_task
+from celery import group, shared_task
+from celery.utils.log import get_task_logger
+from django.conf import settings
+
+from posts.archive import archive_old_posts
+from posts.create_random_post import (
+    create_random_post,
+    create_random_posts,
+)
+from posts.hashtags import backfill_hashtags
+from posts.models import Post
+from posts.purge import BatchPurger
+from posts.scheduling import publish_due_posts
+from posts.sharding import post_databases, shard_for_id
+from posts.snapshots import refresh as refresh_snapshot
+
+logger = get_task_logger(__name__)
 
 
 @shared_task
 def create_new_post() -> None:
     return create_random_post()
+
+
+@shared_task
+def generate_content(
+        count: int = None,
+        duration: float = None,
+        chunk_size: int = 500,
+        seed: int = None,
+) -> dict:
+    """
+    Bulk-generate synthetic posts, tags, likes and comments.
+    Pass ``duration`` (seconds) instead of ``count`` to keep
+    a sustained write load running while benchmarking reads.
+    """
+    stats = create_random_posts(
+        count=count,
+        duration=duration,
+        chunk_size=chunk_size,
+        seed=seed,
+    )
+    logger.info(
+        "Generated %(posts)s posts (%(rows)s rows) in %(seconds)ss, "
+        "%(rows_per_second)s rows/s",
+        stats,
+    )
+    return stats
+
+
+@shared_task
+def generate_content_sharded(
+        count: int = None,
+        shards: int = 4,
+        duration: float = None,
+        chunk_size: int = 500,
+        seed: int = 0,
+) -> str:
+    """
+    Split generation across ``shards`` workers, each shard gets
+    its own seed so workers produce different content.
+    Returns the id of the group result, saved when a result
+    backend is configured.
+    """
+    counts = [None] * shards
+    if count is not None:
+        # The last shard also makes the remainder, ``count`` in total
+        counts = [count // shards] * shards
+        counts[-1] += count % shards
+    result = group(
+        generate_content.s(
+            count=counts[shard],
+            duration=duration,
+            chunk_size=chunk_size,
+            seed=seed + shard,
+        )
+        for shard in range(shards)
+    ).apply_async()
+    if settings.CELERY_RESULT_BACKEND:
+        result.save()
+    return result.id
+
+
+@shared_task
+def publish_scheduled_posts() -> int:
+    """Publish every due scheduled post in bounded batches."""
+    published = 0
+    for using in post_databases():
+        while True:
+            post_ids = publish_due_posts(using=using)
+            if not post_ids:
+                break
+            published += len(post_ids)
+    return published
+
+
+@shared_task
+def archive_posts() -> int:
+    """Move posts older than POST_ARCHIVE_AFTER_DAYS to the archive tables."""
+    return archive_old_posts()
+
+
+@shared_task
+def refresh_public_feed_snapshot() -> int:
+    """Re-render the public feed pages served to anonymous users."""
+    manifest = refresh_snapshot()
+    return sum(feed["pages"] for feed in manifest["feeds"].values())
+
+
+@shared_task
+def backfill_post_hashtags(chunk_size: int = 1000) -> int:
+    """Attach #hashtags of already existing posts as tags."""
+    return backfill_hashtags(chunk_size)
+
+
+def report_progress(task):
+    def on_progress(table, rows):
+        task.update_state(
+            state="PROGRESS", meta={"table": table, "rows": rows}
+        )
+    return on_progress
+
+
+@shared_task(bind=True)
+def purge_post(self, post_id: int) -> int:
+    """Remove a soft-deleted post and its dependents in batches."""
+    purger = BatchPurger(on_progress=report_progress(self))
+    return purger.purge(
+        Post.objects.using(shard_for_id(post_id)).filter(
+            id=post_id, is_deleted=True
+        )
+    )
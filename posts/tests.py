@@ -1,3 +1,1259 @@
-from django.test import TestCase
+import asyncio
+import json
+import tempfile
+import threading
+from datetime import timedelta
+from unittest import mock
 
-# Create your tests here.
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, connection
+from django.test import (
+    RequestFactory,
+    TestCase,
+    TransactionTestCase,
+    override_settings,
+)
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+
+from notifications.activity import (
+    aggregate_pending_activities,
+    record_activity,
+)
+from notifications.models import Activity, Notification, Verb
+from posts import fragments, live, sharding, snapshots, tasks, threads
+from posts.archive import archive_old_posts
+from posts.create_random_post import create_random_posts
+from posts.purge import posts_touched_by
+from posts.hashtags import extract_hashtags
+from posts.models import ArchivedComment, ArchivedPost, Comment, Post, Tag
+from posts.resharding import move_posts_to_shards
+from posts.views import _live_feed_subscriber
+from social_media_api.celery import app
+from social_media_api.loadtest import delete_users, prepare_users
+from social_media_api.relations import link, unlink
+from user.importer import NDJSONImporter
+from user.tasks import purge_user
+
+POSTS_URL = "/api/content/posts/"
+POST_URL = "/api/content/posts/{}/"
+POST_COMMENTS_URL = "/api/content/comments/?post_id={}"
+COMMENT_URL = "/api/content/comments/{}/"
+THREADS_URL = "/api/content/comments/threads/?post_id={}"
+THREAD_URL = "/api/content/comments/{}/thread/"
+COMMENTS_URL = "/api/content/posts/{}/comments/"
+LIKE_URL = "/api/content/posts/{}/like/"
+LIVE_URL = "/api/content/posts/live/"
+ME_URL = "/api/users/me/"
+# Declared by the settings whether sharding is enabled or not
+TEST_POST_SHARDS = ["posts_0", "posts_1"]
+
+# Suites written for posts on default, whatever POST_SHARD_COUNT the
+# tests run with, ShardedPostTests turns sharding on for itself
+unsharded = override_settings(POST_SHARDS=[], DATABASE_ROUTERS=[])
+
+
+def hammer(method, url, user, times=8):
+    """
+    Send the same request from ``times`` threads released
+    together, returns the response status codes
+    """
+    barrier = threading.Barrier(times)
+    statuses = []
+
+    def send():
+        client = APIClient()
+        client.force_authenticate(user)
+        barrier.wait()
+        try:
+            statuses.append(getattr(client, method)(url).status_code)
+        finally:
+            connection.close()
+
+    threads = [threading.Thread(target=send) for _ in range(times)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return statuses
+
+
+class LikeFollowFixtureMixin:
+    def setUp(self):
+        cache.clear()
+        user_model = get_user_model()
+        self.author = user_model.objects.create_user(
+            "author@example.com", "pass12345"
+        )
+        self.reader = user_model.objects.create_user(
+            "reader@example.com", "pass12345"
+        )
+        self.reader.following.add(self.author)
+        self.post = Post.objects.create(
+            title="Title", text="Text", user=self.author
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.reader)
+
+
+@unsharded
+class IdempotentLikeTests(LikeFollowFixtureMixin, TestCase):
+    def test_put_like_is_idempotent(self):
+        first = self.client.put(LIKE_URL.format(self.post.id))
+        second = self.client.put(LIKE_URL.format(self.post.id))
+
+        self.assertEqual(first.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(second.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertEqual(list(self.post.likes.all()), [self.reader])
+
+    def test_delete_like_is_idempotent(self):
+        self.post.likes.add(self.reader)
+
+        for _ in range(2):
+            response = self.client.delete(LIKE_URL.format(self.post.id))
+            self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertFalse(self.post.likes.exists())
+
+    def test_put_like_on_invisible_post_returns_404(self):
+        stranger = get_user_model().objects.create_user(
+            "stranger@example.com", "pass12345"
+        )
+        post = Post.objects.create(title="Title", text="Text", user=stranger)
+
+        response = self.client.put(LIKE_URL.format(post.id))
+
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        self.assertFalse(post.likes.exists())
+
+    def test_toggle_losing_to_a_concurrent_like_changes_nothing(self):
+        # The concurrent like lands between the toggle's unlink and link
+        with mock.patch("posts.views.link", return_value=0):
+            with mock.patch.object(live, "publish") as publish:
+                with self.captureOnCommitCallbacks(execute=True):
+                    response = self.client.patch(
+                        LIKE_URL.format(self.post.id)
+                    )
+
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        publish.assert_not_called()
+        self.assertFalse(Activity.objects.exists())
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.version, 1)
+
+    def test_non_numeric_post_ids_are_not_found(self):
+        for method in ("put", "delete", "patch"):
+            with self.subTest(method=method):
+                response = getattr(self.client, method)(LIKE_URL.format("abc"))
+
+                self.assertEqual(
+                    response.status_code, status.HTTP_404_NOT_FOUND
+                )
+
+    def test_like_events_carry_the_post_id_as_a_number(self):
+        with mock.patch.object(live, "publish") as publish:
+            with self.captureOnCommitCallbacks(execute=True):
+                self.client.put(LIKE_URL.format(self.post.id))
+
+        publish.assert_any_call(
+            live.post_channel(self.post.id),
+            {"type": "likes", "post": self.post.id, "delta": 1},
+        )
+
+    def test_link_and_unlink_are_single_statements(self):
+        through = Post.likes.through
+        posts = Post.objects.filter(pk=self.post.id)
+
+        with self.assertNumQueries(1):
+            self.assertEqual(
+                link(through, "user", self.reader.id, "post", posts), 1
+            )
+        with self.assertNumQueries(1):
+            self.assertEqual(
+                link(through, "user", self.reader.id, "post", posts), 0
+            )
+        with self.assertNumQueries(1):
+            self.assertTrue(
+                unlink(through, "user", self.reader.id, "post", self.post.id)
+            )
+
+
+@unsharded
+class ConcurrentLikeTests(LikeFollowFixtureMixin, TransactionTestCase):
+    def test_concurrent_put_like_creates_one_like(self):
+        statuses = hammer("put", LIKE_URL.format(self.post.id), self.reader)
+
+        self.assertEqual(statuses.count(status.HTTP_201_CREATED), 1)
+        self.assertEqual(
+            statuses.count(status.HTTP_204_NO_CONTENT), len(statuses) - 1
+        )
+        self.assertEqual(self.post.likes.count(), 1)
+
+    def test_concurrent_delete_like_removes_it(self):
+        self.post.likes.add(self.reader)
+
+        statuses = hammer("delete", LIKE_URL.format(self.post.id), self.reader)
+
+        self.assertEqual(set(statuses), {status.HTTP_204_NO_CONTENT})
+        self.assertFalse(self.post.likes.exists())
+
+
+@unsharded
+class PostActionQueryCountTests(LikeFollowFixtureMixin, TestCase):
+    """
+    Write and redirect actions fetch only the columns they need,
+    whatever the number of likes and comments on the post
+    """
+
+    def setUp(self):
+        super().setUp()
+        fans = [
+            get_user_model().objects.create_user(
+                f"fan{index}@example.com", "pass12345"
+            )
+            for index in range(5)
+        ]
+        self.post.likes.add(*fans)
+        for fan in fans:
+            Comment.objects.create(post=self.post, user=fan, text="Comment")
+        self.author_client = APIClient()
+        self.author_client.force_authenticate(self.author)
+
+    def test_like_toggle(self):
+        # post, unlike finding nothing, insert, fragment version
+        # bump, activity
+        with self.assertNumQueries(5):
+            response = self.client.patch(LIKE_URL.format(self.post.id))
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        # post, unlike, fragment version bump
+        with self.assertNumQueries(3):
+            response = self.client.patch(LIKE_URL.format(self.post.id))
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertFalse(self.post.likes.filter(id=self.reader.id).exists())
+
+    def test_comments_redirect(self):
+        with self.assertNumQueries(1):
+            response = self.client.get(COMMENTS_URL.format(self.post.id))
+        self.assertEqual(response.status_code, status.HTTP_302_FOUND)
+
+    def test_partial_update(self):
+        # post with author, viewer state, update bumping the
+        # version, then tags, likes and comments of the response;
+        # hashtags are left alone, the edit did not change them
+        with self.assertNumQueries(6):
+            response = self.author_client.patch(
+                POST_URL.format(self.post.id), {"title": "New title"}
+            )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data["likes"]), 5)
+
+    def test_create(self):
+        # insert, then tags, likes and comments of the response;
+        # no viewer state queries and nothing cached to invalidate
+        with self.assertNumQueries(4):
+            response = self.author_client.post(
+                POSTS_URL, {"title": "New post", "text": "Text"}
+            )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertFalse(response.data["liked_by_me"])
+        self.assertFalse(response.data["following_author"])
+
+    def test_destroy(self):
+        # post, soft delete bumping the fragment version
+        with self.assertNumQueries(2):
+            response = self.author_client.delete(
+                POST_URL.format(self.post.id)
+            )
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+
+    def test_destroy_by_other_user_is_forbidden(self):
+        response = self.client.delete(POST_URL.format(self.post.id))
+
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+        self.post.refresh_from_db()
+        self.assertFalse(self.post.is_deleted)
+
+
+@unsharded
+class SparseFieldsetsTests(LikeFollowFixtureMixin, TestCase):
+    """
+    ?fields= and ?expand= trim the queries of a page as well as
+    its payload
+    """
+
+    def setUp(self):
+        super().setUp()
+        fans = [
+            get_user_model().objects.create_user(
+                f"fan{index}@example.com", "pass12345"
+            )
+            for index in range(5)
+        ]
+        for number in range(10):
+            post = Post.objects.create(
+                title=f"Post {number}", text="#news", user=self.author
+            )
+            post.likes.add(*fans)
+            for fan in fans:
+                Comment.objects.create(post=post, user=fan, text="Comment")
+
+    def test_selected_fields_skip_relations_and_viewer_state(self):
+        # count, page ids, viewer state (likes, follows), fragment
+        # versions, then the likes, comments and tags prefetches
+        with self.assertNumQueries(8):
+            full = self.client.get(POSTS_URL)
+        # count and page only, the page is not served from fragments
+        with self.assertNumQueries(2):
+            sparse = self.client.get(POSTS_URL + "?fields=id,title,created")
+
+        self.assertEqual(
+            set(sparse.data["results"][0]), {"id", "title", "created"}
+        )
+        self.assertEqual(
+            [post["id"] for post in sparse.data["results"]],
+            [post["id"] for post in full.json()["results"]],
+        )
+        self.assertLess(len(sparse.content) * 4, len(full.content))
+
+    def test_expand_prefetches_only_the_named_relations(self):
+        # count, page ids, viewer state (likes, follows), likes
+        with self.assertNumQueries(5):
+            response = self.client.get(POSTS_URL + "?expand=likes")
+
+        post = response.data["results"][0]
+        self.assertEqual(len(post["likes"]), 5)
+        self.assertNotIn("comments", post)
+        self.assertNotIn("tags", post)
+        self.assertIn("liked_by_me", post)
+
+
+@unsharded
+class FragmentCacheTests(LikeFollowFixtureMixin, TestCase):
+    def test_edit_bumps_the_version_in_its_own_update(self):
+        self.post.title = "New title"
+        with self.assertNumQueries(1):
+            self.post.save(update_fields=["title"])
+
+        self.assertEqual(self.post.version, 2)
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.title, "New title")
+
+    def test_edit_invalidates_the_cached_post(self):
+        self.client.get(POSTS_URL)
+        self.post.title = "New title"
+        self.post.save()
+
+        response = self.client.get(POSTS_URL)
+
+        self.assertEqual(response.json()["results"][0]["title"], "New title")
+
+    def test_hit_counters_are_off_by_default(self):
+        self.client.get(POSTS_URL)
+        self.client.get(POSTS_URL)
+
+        self.assertEqual(fragments.hit_counts(), (0, 0))
+
+    @override_settings(POST_FRAGMENT_CACHE_STATS=True)
+    def test_hit_counters(self):
+        self.client.get(POSTS_URL)
+        self.client.get(POSTS_URL)
+
+        self.assertEqual(fragments.hit_counts(), (1, 1))
+
+
+@unsharded
+class BatchRetrieveTests(LikeFollowFixtureMixin, TestCase):
+    def test_posts_keep_the_requested_order(self):
+        other = Post.objects.create(
+            title="Other", text="Text", user=self.author
+        )
+
+        response = self.client.get(
+            f"{POSTS_URL}?ids={self.post.id},0,{other.id},{self.post.id}"
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [post["id"] for post in response.data["results"]],
+            [self.post.id, other.id],
+        )
+        self.assertEqual(response.data["missing"], [0])
+
+    def test_non_ascii_digits_are_rejected(self):
+        for ids in ("\u00b2", "1,\u0661", "\uff11"):
+            with self.subTest(ids=ids):
+                response = self.client.get(POSTS_URL, {"ids": ids})
+
+                self.assertEqual(
+                    response.status_code, status.HTTP_400_BAD_REQUEST
+                )
+
+
+@unsharded
+class PublicFeedSnapshotTests(LikeFollowFixtureMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.client = APIClient()
+
+    def test_missing_snapshot_is_not_built_by_requests(self):
+        response = self.client.get(POSTS_URL)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json()["count"], 1)
+        self.assertIsNone(snapshots.get_manifest())
+
+    def test_pages_are_served_from_the_snapshot(self):
+        snapshots.refresh()
+        Post.objects.create(title="Newer", text="Text", user=self.author)
+
+        with self.assertNumQueries(0):
+            response = self.client.get(POSTS_URL)
+
+        self.assertEqual(
+            [post["id"] for post in response.json()["results"]],
+            [self.post.id],
+        )
+
+    def test_non_ascii_page_numbers_are_not_found(self):
+        snapshots.refresh()
+
+        response = self.client.get(POSTS_URL, {"page": "\u00b2"})
+
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+@unsharded
+class ThreadedCommentTests(LikeFollowFixtureMixin, TestCase):
+    def reply(self, parent=None, text="Reply"):
+        response = self.client.post(
+            POST_COMMENTS_URL.format(self.post.id),
+            {"text": text, "parent": parent.id if parent else ""},
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        return Comment.objects.get(id=response.data["id"])
+
+    def test_replies_get_a_path_and_are_counted_above(self):
+        root = self.reply()
+        child = self.reply(root)
+        grandchild = self.reply(child)
+
+        self.assertEqual(root.path, threads.path_step(root.id))
+        self.assertEqual(grandchild.depth, 2)
+        self.assertEqual(
+            grandchild.path,
+            root.path + threads.path_step(child.id)
+            + threads.path_step(grandchild.id),
+        )
+        self.assertEqual(threads.ancestor_ids(grandchild.path),
+                         [root.id, child.id])
+        root.refresh_from_db()
+        child.refresh_from_db()
+        self.assertEqual((root.reply_count, child.reply_count), (2, 1))
+
+    def test_deleting_a_reply_uncounts_its_subtree(self):
+        root = self.reply()
+        child = self.reply(root)
+        self.reply(child)
+
+        response = self.client.delete(COMMENT_URL.format(child.id))
+
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        root.refresh_from_db()
+        self.assertEqual(root.reply_count, 0)
+        self.assertEqual(Comment.objects.filter(post=self.post).count(), 1)
+
+    def test_detach_counts_replies_added_after_loading(self):
+        root = self.reply()
+        child = self.reply(root)
+        stale = Comment.objects.get(id=child.id)
+        self.reply(child)
+
+        threads.detach(stale)
+
+        root.refresh_from_db()
+        self.assertEqual(root.reply_count, 0)
+
+    def test_edited_reply_keeps_its_parent_without_post_id(self):
+        root = self.reply()
+        child = self.reply(root)
+
+        response = self.client.patch(
+            COMMENT_URL.format(child.id),
+            {"text": "Edited", "parent": root.id},
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["parent"], root.id)
+
+    def test_non_numeric_post_id_of_a_reply_is_rejected(self):
+        root = self.reply()
+
+        response = self.client.post(
+            "/api/content/comments/?post_id=abc",
+            {"text": "Reply", "parent": root.id},
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_reply_to_a_comment_of_another_post_is_rejected(self):
+        other_post = Post.objects.create(
+            title="Other", text="Text", user=self.author
+        )
+        other = Comment.objects.create(
+            post=other_post, user=self.author, text="Comment"
+        )
+
+        response = self.client.post(
+            POST_COMMENTS_URL.format(self.post.id),
+            {"text": "Reply", "parent": other.id},
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_replies_deeper_than_the_limit_are_rejected(self):
+        parent = None
+        with self.settings(COMMENT_MAX_DEPTH=2):
+            for _ in range(3):
+                parent = self.reply(parent)
+            response = self.client.post(
+                POST_COMMENTS_URL.format(self.post.id),
+                {"text": "Reply", "parent": parent.id},
+            )
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_thread_is_one_range_query_in_display_order(self):
+        root = self.reply(text="root")
+        first = self.reply(root, text="first")
+        self.reply(first, text="first.1")
+        self.reply(root, text="second")
+        self.reply(text="other root")
+
+        with self.assertNumQueries(2):
+            response = self.client.get(THREAD_URL.format(root.id))
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["reply_count"], 3)
+        self.assertEqual(
+            [
+                (reply["text"], [child["text"] for child in reply["replies"]])
+                for reply in response.data["replies"]
+            ],
+            [("first", ["first.1"]), ("second", [])],
+        )
+
+        shallow = self.client.get(THREAD_URL.format(root.id) + "?depth=1")
+        self.assertEqual(
+            [reply["replies"] for reply in shallow.data["replies"]], [[], []]
+        )
+        invalid = self.client.get(
+            THREAD_URL.format(root.id), {"depth": "\u00b2"}
+        )
+        self.assertEqual(invalid.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_thread_pages_have_a_constant_query_count(self):
+        for index in range(25):
+            parent = self.reply(text=f"root {index}")
+            for _ in range(index % 4):
+                parent = self.reply(parent)
+
+        with self.settings(
+                COMMENT_THREAD_PREVIEW_DEPTH=2,
+                COMMENT_THREAD_PREVIEW_REPLIES=5,
+        ), self.assertNumQueries(3):
+            response = self.client.get(THREADS_URL.format(self.post.id))
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["count"], 25)
+        roots = response.data["results"]
+        self.assertEqual(len(roots), 20)
+        self.assertEqual(roots[0]["text"], "root 0")
+        deep = roots[3]
+        self.assertEqual(deep["reply_count"], 3)
+        # Depth 3 is left for the thread endpoint
+        self.assertEqual(len(deep["replies"][0]["replies"]), 1)
+        self.assertEqual(deep["replies"][0]["replies"][0]["replies"], [])
+
+    def test_previews_are_bounded_per_root(self):
+        for index in range(3):
+            root = self.reply(text=f"root {index}")
+            for _ in range(3):
+                self.reply(root)
+
+        with self.settings(COMMENT_THREAD_PREVIEW_REPLIES=2):
+            response = self.client.get(THREADS_URL.format(self.post.id))
+
+        self.assertEqual(
+            [
+                (root["reply_count"], len(root["replies"]))
+                for root in response.data["results"]
+            ],
+            [(3, 2)] * 3,
+        )
+
+
+@unsharded
+class ScheduledPostCommentTests(LikeFollowFixtureMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        Post.objects.filter(id=self.post.id).update(
+            is_published=False,
+            publish_at=timezone.now() + timedelta(days=1),
+        )
+
+    def test_comments_on_a_scheduled_post_are_rejected(self):
+        response = self.client.post(
+            POST_COMMENTS_URL.format(self.post.id), {"text": "Early"}
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(Comment.objects.exists())
+
+    def test_comments_of_a_scheduled_post_are_hidden(self):
+        Comment.objects.create(post=self.post, user=self.author, text="Note")
+
+        response = self.client.get(POST_COMMENTS_URL.format(self.post.id))
+
+        self.assertEqual(response.data, [])
+
+    def test_author_can_comment_on_own_scheduled_post(self):
+        self.client.force_authenticate(self.author)
+
+        response = self.client.post(
+            POST_COMMENTS_URL.format(self.post.id), {"text": "Note"}
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+
+@unsharded
+class LiveFeedTests(LikeFollowFixtureMixin, TestCase):
+    def test_watch_ignores_posts_the_reader_cannot_see(self):
+        stranger = get_user_model().objects.create_user(
+            "stranger@example.com"
+        )
+        hidden = Post.objects.create(
+            title="Hidden", text="Text", user=stranger
+        )
+        request = RequestFactory().get(
+            LIVE_URL,
+            {
+                "token": str(AccessToken.for_user(self.reader)),
+                "watch": f"{self.post.id},{hidden.id},\u00b2,abc",
+            },
+        )
+
+        user, channels = _live_feed_subscriber(request)
+
+        self.assertEqual(user, self.reader)
+        self.assertIn(live.post_channel(self.post.id), channels)
+        self.assertNotIn(live.post_channel(hidden.id), channels)
+
+    async def test_reconnect_takes_the_slot_of_the_oldest_connection(self):
+        hub = live.LiveHub(max_connections=10, max_connections_per_user=2)
+        first, second, third = (
+            hub.subscribe(self.reader.id, ["author:1"]) for _ in range(3)
+        )
+
+        self.assertIs(await first.get(timeout=1), live.CLOSED)
+        hub.dispatch("author:1", {"type": "post"})
+        self.assertEqual(await second.get(timeout=1), {"type": "post"})
+        self.assertEqual(await third.get(timeout=1), {"type": "post"})
+        self.assertTrue(first.queue.empty())
+        # The stream of the replaced connection still unsubscribes
+        hub.unsubscribe(first)
+        hub.unsubscribe(second)
+        hub.unsubscribe(third)
+        self.assertEqual(hub._connections, 0)
+
+    async def test_events_reach_the_loop_reading_the_stream(self):
+        hub = live.LiveHub(max_connections=10, max_connections_per_user=2)
+        # Behind sync middleware the view runs outside the loop
+        # that streams the response
+        subscription = await asyncio.to_thread(
+            hub.subscribe, self.reader.id, ["author:1"]
+        )
+        hub.dispatch("author:1", {"type": "post"})
+
+        self.assertEqual(await subscription.get(timeout=1), {"type": "post"})
+        await asyncio.to_thread(hub.dispatch, "author:1", {"type": "like"})
+        self.assertEqual(await subscription.get(timeout=1), {"type": "like"})
+        hub.unsubscribe(subscription)
+
+
+@unsharded
+class ArchiveTests(LikeFollowFixtureMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.comment = Comment.objects.create(
+            post=self.post, user=self.reader, text="Old comment"
+        )
+        self.reply = Comment.objects.create(
+            post=self.post, user=self.author, text="Old reply",
+            parent=self.comment,
+        )
+        self.post.likes.add(self.reader)
+        record_activity(
+            self.reader.id, self.author.id, Verb.LIKE, self.post.id
+        )
+        aggregate_pending_activities()
+        Post.objects.filter(id=self.post.id).update(
+            created=timezone.now() - timedelta(days=400)
+        )
+        self.assertEqual(archive_old_posts(max_age_days=365), 1)
+
+    def test_archiving_keeps_notifications_and_activities(self):
+        self.assertFalse(Post.objects.filter(id=self.post.id).exists())
+        self.assertTrue(
+            Notification.objects.filter(post_id=self.post.id).exists()
+        )
+        self.assertTrue(Activity.objects.filter(post_id=self.post.id).exists())
+
+    def test_comments_of_archived_posts_are_served(self):
+        response = self.client.get(POST_COMMENTS_URL.format(self.post.id))
+        self.assertEqual(
+            [comment["text"] for comment in response.data],
+            ["Old comment", "Old reply"],
+        )
+
+        response = self.client.get(COMMENT_URL.format(self.comment.id))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["left_by"], self.reader.id)
+
+        response = self.client.get(COMMENTS_URL.format(self.post.id))
+        self.assertEqual(response.status_code, status.HTTP_302_FOUND)
+
+    def test_threads_of_archived_posts_are_served(self):
+        response = self.client.get(THREADS_URL.format(self.post.id))
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["count"], 1)
+        [root] = response.data["results"]
+        self.assertEqual((root["id"], root["reply_count"]),
+                         (self.comment.id, 1))
+        self.assertEqual(
+            [(reply["text"], reply["parent"]) for reply in root["replies"]],
+            [("Old reply", self.comment.id)],
+        )
+
+        response = self.client.get(THREAD_URL.format(self.comment.id))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [reply["id"] for reply in response.data["replies"]],
+            [self.reply.id],
+        )
+
+
+@unsharded
+class SoftDeletedUserContentTests(LikeFollowFixtureMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.gone = get_user_model().objects.create_user("gone@example.com")
+        self.post.likes.add(self.reader, self.gone)
+        Comment.objects.create(post=self.post, user=self.reader, text="Hi")
+        Comment.objects.create(post=self.post, user=self.gone, text="Bye")
+        self.gone.is_deleted = True
+        self.gone.is_active = False
+        self.gone.save(update_fields=["is_deleted", "is_active"])
+
+    def test_likes_and_comments_of_deleted_users_are_hidden(self):
+        response = self.client.get(POST_URL.format(self.post.id))
+
+        self.assertEqual(
+            [user["id"] for user in response.data["likes"]], [self.reader.id]
+        )
+        self.assertEqual(
+            [comment["text"] for comment in response.data["comments"]],
+            ["Hi"],
+        )
+        response = self.client.get(POST_COMMENTS_URL.format(self.post.id))
+        self.assertEqual(
+            [comment["text"] for comment in response.data], ["Hi"]
+        )
+
+    def test_deleted_account_leaves_the_cached_feed_at_once(self):
+        leaving = get_user_model().objects.create_user("leaving@example.com")
+        self.post.likes.add(leaving)
+        Comment.objects.create(post=self.post, user=leaving, text="Later")
+        self.client.get(POSTS_URL)
+        client = APIClient()
+        client.force_authenticate(leaving)
+
+        with mock.patch("user.views.purge_user.delay"):
+            with self.captureOnCommitCallbacks(execute=True):
+                response = client.delete(ME_URL)
+        results = self.client.get(POSTS_URL).json()["results"]
+
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertEqual(
+            [user["id"] for user in results[0]["likes"]], [self.reader.id]
+        )
+        self.assertEqual(
+            [comment["text"] for comment in results[0]["comments"]], ["Hi"]
+        )
+
+    def test_posts_touched_by_a_user_are_found_for_invalidation(self):
+        other = Post.objects.create(
+            title="Other", text="Text", user=self.author
+        )
+        other.likes.add(self.gone)
+
+        self.assertEqual(
+            posts_touched_by(self.gone.id), sorted([self.post.id, other.id])
+        )
+
+
+@unsharded
+@override_settings(PURGE_BATCH_PAUSE=0)
+class PurgeTests(LikeFollowFixtureMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.gone = get_user_model().objects.create_user("gone@example.com")
+
+    def reply(self, user, parent=None):
+        self.client.force_authenticate(user)
+        response = self.client.post(
+            POST_COMMENTS_URL.format(self.post.id),
+            {"text": "Reply", "parent": parent.id if parent else ""},
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        return Comment.objects.get(id=response.data["id"])
+
+    def test_purge_post_removes_its_threads(self):
+        root = self.reply(self.reader)
+        self.reply(self.gone, self.reply(self.reader, root))
+        self.post.likes.add(self.reader)
+        Post.objects.filter(id=self.post.id).update(is_deleted=True)
+
+        tasks.purge_post(self.post.id)
+
+        self.assertFalse(Post.objects.filter(id=self.post.id).exists())
+        self.assertFalse(Comment.objects.exists())
+
+    def test_purge_user_removes_replies_and_bumps_touched_posts(self):
+        root = self.reply(self.reader)
+        mine = self.reply(self.gone, root)
+        self.reply(self.reader, mine)
+        liked = Post.objects.create(
+            title="Liked", text="Text", user=self.author
+        )
+        liked.likes.add(self.gone)
+        versions = dict(Post.objects.values_list("id", "version"))
+        get_user_model().objects.filter(id=self.gone.id).update(
+            is_deleted=True
+        )
+
+        purge_user(self.gone.id)
+
+        self.assertFalse(
+            get_user_model().objects.filter(id=self.gone.id).exists()
+        )
+        # The reply of the gone user goes with the one below it
+        self.assertEqual(list(Comment.objects.all()), [root])
+        self.assertFalse(liked.likes.exists())
+        for post_id, version in Post.objects.values_list("id", "version"):
+            self.assertEqual(version, versions[post_id] + 1)
+
+
+@unsharded
+class HashtagTests(LikeFollowFixtureMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.client.force_authenticate(self.author)
+        response = self.client.post(
+            POSTS_URL, {"title": "Trip", "text": "Off to #rome and #paris"}
+        )
+        self.post = Post.objects.get(id=response.data["id"])
+        self.post.tags.add(Tag.objects.create(name="featured"))
+
+    def tag_names(self):
+        return set(self.post.tags.values_list("name", flat=True))
+
+    def test_words_longer_than_a_tag_are_not_hashtags(self):
+        self.assertEqual(
+            extract_hashtags(f"#{'a' * 50} #{'b' * 60} #ok#no"),
+            ["a" * 50, "ok"],
+        )
+
+    def test_edit_without_text_changes_keeps_tags(self):
+        response = self.client.patch(
+            POST_URL.format(self.post.id), {"publish_at": ""}
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(self.tag_names(), {"rome", "paris", "featured"})
+
+    def test_edit_replaces_only_hashtags_of_the_old_text(self):
+        response = self.client.patch(
+            POST_URL.format(self.post.id), {"text": "Off to #rome and #oslo"}
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(self.tag_names(), {"rome", "oslo", "featured"})
+
+
+@unsharded
+class GenerateContentTests(TestCase):
+    def setUp(self):
+        get_user_model().objects.create_user("author@example.com")
+        app.conf.task_always_eager = True
+        self.addCleanup(setattr, app.conf, "task_always_eager", False)
+
+    @override_settings(CELERY_RESULT_BACKEND=None)
+    def test_sharded_generation_makes_exactly_count_posts(self):
+        tasks.generate_content_sharded(
+            count=10, shards=3, chunk_size=4, seed=1
+        )
+
+        self.assertEqual(Post.objects.count(), 10)
+
+    def test_soft_deleted_users_get_no_generated_content(self):
+        get_user_model().objects.create_user(
+            "gone@example.com", is_deleted=True
+        )
+
+        create_random_posts(count=20, seed=1, max_likes=2, max_comments=2)
+
+        author = get_user_model().objects.get(email="author@example.com")
+        self.assertEqual(
+            set(Post.objects.values_list("user_id", flat=True)), {author.id}
+        )
+        self.assertEqual(
+            set(Comment.objects.values_list("user_id", flat=True)),
+            {author.id},
+        )
+        self.assertEqual(
+            set(Post.likes.through.objects.values_list("user_id", flat=True)),
+            {author.id},
+        )
+
+
+@override_settings(
+    POST_SHARDS=TEST_POST_SHARDS,
+    DATABASE_ROUTERS=["posts.sharding.PostShardRouter"],
+)
+class ShardedPostTests(TestCase):
+    databases = {DEFAULT_DB_ALIAS, *TEST_POST_SHARDS}
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        # Migrated before the settings were overridden
+        for using in TEST_POST_SHARDS:
+            sharding.seed_shard_ids(using)
+
+    def setUp(self):
+        cache.clear()
+        user_model = get_user_model()
+        self.reader = user_model.objects.create_user(
+            "reader@example.com", "pass12345"
+        )
+        # One followed author on every shard
+        self.authors = {}
+        index = 0
+        while len(self.authors) < len(settings.POST_SHARDS):
+            author = user_model.objects.create_user(
+                f"author{index}@example.com", "pass12345"
+            )
+            self.authors.setdefault(sharding.shard_for_user(author.id), author)
+            index += 1
+        self.reader.following.add(*self.authors.values())
+        self.client = APIClient()
+        self.client.force_authenticate(self.reader)
+
+    def create_post(self, author, minutes_ago=0):
+        post = Post.objects.create(title="Title", text="Text", user=author)
+        Post.objects.using(post._state.db).filter(id=post.id).update(
+            created=timezone.now() - timedelta(minutes=minutes_ago)
+        )
+        return post
+
+    def test_posts_are_written_to_the_author_shard(self):
+        author = self.authors[settings.POST_SHARDS[1]]
+        client = APIClient()
+        client.force_authenticate(author)
+
+        response = client.post(
+            POSTS_URL, {"title": "Title", "text": "Hello #sharded"}
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        post_id = response.data["id"]
+        self.assertEqual(
+            sharding.shard_for_id(post_id), settings.POST_SHARDS[1]
+        )
+        post = Post.objects.using(settings.POST_SHARDS[1]).get(id=post_id)
+        self.assertEqual(list(post.tags.values_list("name", flat=True)),
+                         ["sharded"])
+        self.assertFalse(Post.objects.filter(id=post_id).exists())
+
+    def test_feed_merges_the_shards_by_created(self):
+        posts = [
+            self.create_post(author, minutes_ago=minutes)
+            for minutes, author in enumerate(
+                [*self.authors.values(), *self.authors.values()]
+            )
+        ]
+        stranger = get_user_model().objects.create_user(
+            "stranger@example.com", "pass12345"
+        )
+        self.create_post(stranger)
+
+        ids = []
+        url = POSTS_URL
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertEqual(response.data["count"], len(posts))
+            ids += [post["id"] for post in response.data["results"]]
+            url = response.data["next"]
+        self.assertEqual(ids, [post.id for post in posts])
+
+    def test_like_comment_and_retrieve_on_the_post_shard(self):
+        post = self.create_post(self.authors[settings.POST_SHARDS[-1]])
+
+        like = self.client.put(LIKE_URL.format(post.id))
+        comment = self.client.post(
+            POST_COMMENTS_URL.format(post.id), {"text": "Nice"}
+        )
+        response = self.client.get(POST_URL.format(post.id))
+
+        self.assertEqual(like.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(comment.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(
+            sharding.shard_for_id(comment.data["id"]),
+            settings.POST_SHARDS[-1],
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["likes"], [{"id": self.reader.id}])
+        self.assertEqual(
+            [comment["text"] for comment in response.data["comments"]],
+            ["Nice"],
+        )
+        self.assertTrue(response.data["liked_by_me"])
+
+        unlike = self.client.delete(LIKE_URL.format(post.id))
+        self.assertEqual(unlike.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertFalse(post.likes.exists())
+
+    def test_scatter_gather_slices_match_a_sorted_list(self):
+        posts = [
+            self.create_post(author, minutes_ago=minutes)
+            for minutes, author in enumerate(
+                list(self.authors.values()) * 3
+            )
+        ]
+        feed = sharding.ScatterGather(
+            {
+                using: Post.objects.using(using)
+                for using in settings.POST_SHARDS
+            }
+        )
+
+        self.assertEqual(feed.count(), len(posts))
+        for start in range(len(posts)):
+            self.assertEqual(
+                [post.id for post in feed[start:start + 2]],
+                [post.id for post in posts[start:start + 2]],
+            )
+
+    def test_posts_on_default_are_moved_to_the_author_shard(self):
+        using = settings.POST_SHARDS[1]
+        author = self.authors[using]
+        created = timezone.now() - timedelta(days=3)
+        post = Post.objects.using(DEFAULT_DB_ALIAS).create(
+            title="Old", text="Before #sharding", user=author
+        )
+        Post.objects.using(DEFAULT_DB_ALIAS).filter(id=post.id).update(
+            created=created
+        )
+        Post.tags.through.objects.using(DEFAULT_DB_ALIAS).create(
+            post_id=post.id,
+            tag=Tag.objects.using(DEFAULT_DB_ALIAS).create(name="sharding"),
+        )
+        Post.likes.through.objects.using(DEFAULT_DB_ALIAS).create(
+            post_id=post.id, user=self.reader
+        )
+        root = Comment.objects.using(DEFAULT_DB_ALIAS).create(
+            post_id=post.id, user=self.reader, text="Root"
+        )
+        reply = Comment.objects.using(DEFAULT_DB_ALIAS).create(
+            post_id=post.id, user=author, text="Reply", parent=root
+        )
+        notification = Notification.objects.create(
+            recipient=author, verb=Verb.COMMENT, post_id=post.id,
+            last_actor=self.reader,
+        )
+        ArchivedPost.objects.using(DEFAULT_DB_ALIAS).create(
+            id=post.id + 1, title="Archived", text="Text",
+            created=created, user=author,
+        )
+        archived_root = ArchivedComment.objects.using(DEFAULT_DB_ALIAS).create(
+            id=reply.id + 1, post_id=post.id + 1, user=self.reader,
+            text="Archived root", path=threads.path_step(reply.id + 1),
+            reply_count=1,
+        )
+        ArchivedComment.objects.using(DEFAULT_DB_ALIAS).create(
+            id=reply.id + 2, post_id=post.id + 1, user=author,
+            text="Archived reply", parent=archived_root, depth=1,
+            path=archived_root.path + threads.path_step(reply.id + 2),
+        )
+
+        counts = move_posts_to_shards()
+
+        self.assertEqual(counts, {"posts": 1, "comments": 2, "archived": 1})
+        for model in (Post, Comment, ArchivedPost):
+            self.assertFalse(
+                model.objects.using(DEFAULT_DB_ALIAS).exists()
+            )
+        moved = Post.objects.using(using).get(title="Old")
+        self.assertEqual(sharding.shard_for_id(moved.id), using)
+        self.assertEqual(moved.created, created)
+        self.assertEqual(
+            list(moved.tags.values_list("name", flat=True)), ["sharding"]
+        )
+        self.assertEqual(list(moved.likes.all()), [self.reader])
+        root, reply = Comment.objects.using(using).order_by("path")
+        self.assertEqual(reply.parent_id, root.id)
+        self.assertEqual(reply.path, root.path + threads.path_step(reply.id))
+        self.assertEqual(root.reply_count, 1)
+        notification.refresh_from_db()
+        self.assertEqual(notification.post_id, moved.id)
+        self.assertTrue(
+            ArchivedPost.objects.using(settings.POST_SHARDS[0])
+            .filter(id=post.id + 1).exists()
+        )
+        response = self.client.get(THREADS_URL.format(post.id + 1))
+        [archived_thread] = response.data["results"]
+        self.assertEqual(
+            [reply["text"] for reply in archived_thread["replies"]],
+            ["Archived reply"],
+        )
+
+        response = self.client.get(POST_URL.format(moved.id))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [comment["text"] for comment in response.data["comments"]],
+            ["Root", "Reply"],
+        )
+
+    @override_settings(PURGE_BATCH_PAUSE=0)
+    def test_posts_and_users_are_purged_on_the_shards(self):
+        using = settings.POST_SHARDS[1]
+        author = self.authors[using]
+        deleted, kept = self.create_post(author), self.create_post(author)
+        for post in (deleted, kept):
+            root = self.client.post(
+                POST_COMMENTS_URL.format(post.id), {"text": "Root"}
+            )
+            self.client.post(
+                POST_COMMENTS_URL.format(post.id),
+                {"text": "Reply", "parent": root.data["id"]},
+            )
+            Notification.objects.create(
+                recipient=author, verb=Verb.COMMENT, post_id=post.id,
+                last_actor=self.reader,
+            )
+        Post.objects.using(using).filter(id=deleted.id).update(
+            is_deleted=True
+        )
+
+        tasks.purge_post(deleted.id)
+
+        self.assertEqual(
+            list(Post.objects.using(using).values_list("id", flat=True)),
+            [kept.id],
+        )
+        self.assertEqual(
+            set(
+                Comment.objects.using(using)
+                .values_list("post_id", flat=True)
+            ),
+            {kept.id},
+        )
+        self.assertEqual(
+            list(Notification.objects.values_list("post_id", flat=True)),
+            [kept.id],
+        )
+
+        author.is_deleted = True
+        author.save(update_fields=["is_deleted"])
+        purge_user(author.id)
+
+        for database in (DEFAULT_DB_ALIAS, *settings.POST_SHARDS):
+            self.assertFalse(
+                get_user_model().objects.using(database)
+                .filter(id=author.id).exists()
+            )
+        self.assertFalse(Post.objects.using(using).exists())
+        self.assertFalse(Comment.objects.using(using).exists())
+        self.assertFalse(Notification.objects.exists())
+
+    def test_imported_and_generated_posts_go_to_the_author_shard(self):
+        emails = [f"imported{index}@example.com" for index in range(4)]
+        with tempfile.NamedTemporaryFile("w", suffix=".ndjson") as source:
+            for email in emails:
+                source.write(json.dumps({"type": "user", "email": email}))
+                source.write("\n")
+            for email in emails:
+                source.write(json.dumps({
+                    "type": "post", "author": email, "title": "Imported",
+                    "text": "Text", "tags": ["imported"], "likes": emails,
+                }))
+                source.write("\n")
+            source.flush()
+            NDJSONImporter(source.name).run()
+
+        for user in get_user_model().objects.filter(email__in=emails):
+            for using in settings.POST_SHARDS:
+                self.assertTrue(
+                    get_user_model().objects.using(using)
+                    .filter(id=user.id).exists()
+                )
+            post = Post.objects.using(sharding.shard_for_user(user.id)).get(
+                user=user
+            )
+            self.assertEqual(
+                list(post.tags.values_list("name", flat=True)), ["imported"]
+            )
+            self.assertEqual(post.likes.count(), len(emails))
+
+        create_random_posts(count=8, seed=1, max_comments=2)
+
+        self.assertFalse(Post.objects.using(DEFAULT_DB_ALIAS).exists())
+        posts = comments = 0
+        for using in settings.POST_SHARDS:
+            for post in Post.objects.using(using):
+                self.assertEqual(sharding.shard_for_user(post.user_id), using)
+                posts += 1
+            for comment in Comment.objects.using(using):
+                self.assertEqual(comment.path, threads.path_step(comment.id))
+                comments += 1
+        self.assertEqual(posts, len(emails) + 8)
+        self.assertGreater(comments, 0)
+
+    def test_load_test_users_are_set_up_and_removed_on_the_shards(self):
+        users = prepare_users(4, follows=1, posts_per_user=1, seed=0)
+
+        for user in users:
+            self.assertTrue(
+                Post.objects.using(sharding.shard_for_user(user.id))
+                .filter(user_id=user.id, id__in=user.visible_post_ids)
+                .exists()
+            )
+
+        delete_users()
+
+        for using in (DEFAULT_DB_ALIAS, *settings.POST_SHARDS):
+            self.assertFalse(
+                get_user_model().objects.using(using)
+                .filter(id__in=[user.id for user in users]).exists()
+            )
+        for using in settings.POST_SHARDS:
+            self.assertFalse(
+                Post.objects.using(using)
+                .filter(user_id__in=[user.id for user in users]).exists()
+            )
@@ -0,0 +1,132 @@
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+from django.db.models import F, Subquery
+
+from posts.models import Comment
+
+# A comment's path is the path of its parent followed by its own
+# id as fixed-width hex: sorting by path lists a thread depth-first
+# with the replies of every comment oldest first, and a subtree
+# is one contiguous path range
+PATH_STEP_WIDTH = 12
+# Sorts after every hex digit, closes the range of a subtree
+PATH_END = "~"
+
+
+def path_step(comment_id):
+    return format(comment_id, f"0{PATH_STEP_WIDTH}x")
+
+
+def ancestor_ids(path):
+    """Ids of the comments above the one at ``path``, root first"""
+    return [
+        int(path[start:start + PATH_STEP_WIDTH], 16)
+        for start in range(0, len(path) - PATH_STEP_WIDTH, PATH_STEP_WIDTH)
+    ]
+
+
+def attach(comment):
+    """
+    Give a new comment its path and depth and count it in the
+    reply_count of every comment above it, two statements
+    whatever the depth
+    """
+    parent = comment.parent if comment.parent_id else None
+    comment.path = (parent.path if parent else "") + path_step(comment.id)
+    comment.depth = parent.depth + 1 if parent else 0
+    comments = Comment.objects.using(comment._state.db)
+    comments.filter(id=comment.id).update(
+        path=comment.path, depth=comment.depth
+    )
+    if parent:
+        comments.filter(id__in=ancestor_ids(comment.path)).update(
+            reply_count=F("reply_count") + 1
+        )
+
+
+def detach(comment):
+    """
+    Take a comment and its replies, about to be deleted with it,
+    out of the reply_count of the comments above it. Its own
+    reply_count is read by the same statement, replies added
+    since the comment was loaded are taken out too.
+    """
+    ancestors = ancestor_ids(comment.path)
+    if ancestors:
+        comments = Comment.objects.using(comment._state.db)
+        replies = comments.filter(id=comment.id).values("reply_count")
+        comments.filter(id__in=ancestors).update(
+            reply_count=F("reply_count") - 1 - Subquery(replies)
+        )
+
+
+def set_root_paths(comments, using=DEFAULT_DB_ALIAS):
+    """Paths of top-level comments inserted with bulk_create"""
+    for comment in comments:
+        comment.path = path_step(comment.id)
+    Comment.objects.using(using).bulk_update(comments, ["path"])
+
+
+def subtree(comment, depth=None, limit=None):
+    """
+    Replies below ``comment`` (hot or archived) in display order
+    with one range query on (post, path), ``depth`` levels deep
+    at most. Replies of soft-deleted users are left out, and so
+    are the replies below them.
+    """
+    queryset = type(comment)._default_manager.using(
+        comment._state.db
+    ).filter(
+        post_id=comment.post_id,
+        path__gt=comment.path,
+        path__lt=comment.path + PATH_END,
+        user__is_deleted=False,
+    )
+    if depth is not None:
+        queryset = queryset.filter(depth__lte=comment.depth + depth)
+    return queryset.order_by("path")[:limit]
+
+
+def previews(roots):
+    """
+    The first COMMENT_THREAD_PREVIEW_REPLIES replies of every
+    root, at most COMMENT_THREAD_PREVIEW_DEPTH levels deep, in
+    one UNION ALL of a bounded range query per root: the cost
+    follows the page size, not the replies of the page.
+    """
+    if not roots:
+        return []
+    # SQLite takes no LIMIT in the members of a compound query,
+    # each one selects the ids of its slice in a subquery instead
+    model = type(roots[0])
+    comments = model._default_manager.using(roots[0]._state.db)
+    first, *others = [
+        comments.filter(
+            id__in=subtree(
+                root,
+                depth=settings.COMMENT_THREAD_PREVIEW_DEPTH,
+                limit=settings.COMMENT_THREAD_PREVIEW_REPLIES,
+            ).values("id")
+        ).order_by()
+        for root in roots
+    ]
+    return list(first.union(*others, all=True).order_by("path"))
+
+
+def build_tree(roots, replies, represent):
+    """
+    Nest path-ordered ``replies`` under their ``roots``: every
+    node is ``represent(comment)`` with a ``replies`` list
+    """
+    nodes = {}
+    tree = []
+    for comment in roots:
+        nodes[comment.id] = {**represent(comment), "replies": []}
+        tree.append(nodes[comment.id])
+    for comment in replies:
+        # Parents sort before their replies, and are loaded first
+        parent = nodes.get(comment.parent_id)
+        if parent is not None:
+            nodes[comment.id] = {**represent(comment), "replies": []}
+            parent["replies"].append(nodes[comment.id])
+    return tree
@@ -1,12 +1,15 @@
+from django.urls import path
 from rest_framework import routers
 
-from posts.views import PostViewSet, CommentViewSet
+from posts.views import PostViewSet, CommentViewSet, live_feed
 
 router = routers.DefaultRouter()
 router.register("posts", PostViewSet)
 router.register("comments", CommentViewSet)
 
 
-urlpatterns = router.urls
+urlpatterns = [
+    path("posts/live/", live_feed, name="live-feed"),
+] + router.urls
 
 app_name = "posts"
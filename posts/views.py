@@ -1,27 +1,65 @@
+import asyncio
+import re
 from typing import Type
 from urllib.parse import urlencode
 
-from django.shortcuts import redirect
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.db.models import Q
+from django.db.models.signals import m2m_changed
+from django.http import (
+    Http404,
+    HttpResponse,
+    JsonResponse,
+    StreamingHttpResponse,
+)
+from django.shortcuts import get_object_or_404, redirect
 from drf_spectacular.utils import (
     extend_schema,
     OpenApiParameter
 )
 from rest_framework import viewsets, status
 from rest_framework.decorators import action
-from rest_framework.exceptions import PermissionDenied
+from rest_framework.exceptions import (
+    AuthenticationFailed,
+    NotFound,
+    PermissionDenied,
+    ValidationError,
+)
 from rest_framework.permissions import (
     IsAuthenticated, IsAuthenticatedOrReadOnly
 )
+from rest_framework.renderers import JSONRenderer
 from rest_framework.response import Response
 from rest_framework.reverse import reverse
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken
 
-from posts.models import Post, Comment
-from posts.pagination import PostPagination
+from notifications.activity import record_activity
+from notifications.models import Verb
+from posts import fragments, live, sharding, snapshots, threads
+from posts.models import (
+    ArchivedComment,
+    ArchivedPost,
+    Comment,
+    Post,
+    without_deleted_users,
+)
+from posts.pagination import CommentThreadPagination, PostPagination
 from posts.permissions import IsOwnerOrReadOnly
+from posts.scheduling import is_due
+from posts.tasks import purge_post
+from posts.viewer_state import ViewerState
 from posts.serializers import (
+    ArchivedCommentSerializer,
+    ArchivedPostSerializer,
     PostSerializer,
     CommentSerializer
 )
+from social_media_api.batch import IDS_PARAMETER, BatchRetrieveMixin
+from social_media_api.relations import link, unlink
 
 
 class CommentViewSet(viewsets.ModelViewSet):
@@ -31,20 +69,181 @@ class CommentViewSet(viewsets.ModelViewSet):
     )
     serializer_class = CommentSerializer
     permission_classes = [IsOwnerOrReadOnly]
+    # Ids only, anything else is a 404 from the URL resolver
+    lookup_value_regex = "[0-9]+"
 
-    def get_queryset(self):
-        queryset = self.queryset
+    def visible_posts(self, prefix=""):
+        """
+        Published posts, and the scheduled ones of the current
+        user, the posts that can be read and commented on
+        """
+        return Q(**{f"{prefix}is_deleted": False}) & (
+            Q(**{f"{prefix}is_published": True})
+            | Q(**{f"{prefix}user_id": self.request.user.id})
+        )
+
+    def requested_post_id(self):
+        """?post_id= as an int, None when not given"""
         post_id = self.request.query_params.get("post_id")
+        if not post_id:
+            return None
+        try:
+            return int(post_id)
+        except ValueError:
+            raise ValidationError({"post_id": "A valid post id is required."})
+
+    def get_queryset(self):
+        # Comments of soft-deleted users are hidden until purged
+        queryset = self.queryset.filter(
+            self.visible_posts("post__"), user__is_deleted=False
+        )
+        post_id = self.requested_post_id()
         if post_id:
             queryset = queryset.filter(post_id=post_id)
-        return queryset.distinct()
+        queryset = queryset.distinct()
+        if sharding.is_sharded():
+            return self.scatter(queryset, post_id)
+        return queryset
+
+    def scatter(self, queryset, post_id):
+        """
+        Comments of one post are read from its shard, a comment
+        from the shard of its id, the others from every shard
+        (merged by id, comments have no timestamp)
+        """
+        if post_id:
+            return queryset.using(sharding.shard_for_id(post_id))
+        if "pk" in self.kwargs:
+            return queryset.using(sharding.shard_for_id(self.kwargs["pk"]))
+        return sharding.ScatterGather(
+            {using: queryset.using(using) for using in settings.POST_SHARDS},
+            key="id",
+        )
+
+    def commented_post_id(self):
+        post_id = self.requested_post_id()
+        if post_id is None:
+            raise ValidationError({"post_id": "A valid post id is required."})
+        visible = Post.objects.using(sharding.shard_for_id(post_id)).filter(
+            self.visible_posts(), id=post_id
+        )
+        if not visible.exists():
+            raise ValidationError({"post_id": "Post not found."})
+        return post_id
 
     def perform_create(self, serializer):
-        serializer.save(
-            post_id=self.request.query_params.get("post_id"),
-            user_id=self.request.user.id,
+        post_id = self.commented_post_id()
+        # The comment and its thread path are saved together
+        with transaction.atomic(using=sharding.shard_for_id(post_id)):
+            comment = serializer.save(
+                post_id=post_id,
+                user_id=self.request.user.id,
+            )
+        record_activity(
+            actor_id=comment.user_id,
+            recipient_id=comment.post.user_id,
+            verb=Verb.COMMENT,
+            post_id=comment.post_id,
         )
 
+    def perform_destroy(self, instance):
+        # Replies are deleted with the comment
+        with transaction.atomic(using=instance._state.db):
+            threads.detach(instance)
+            instance.delete()
+
+    def represent(self):
+        serializer = self.get_serializer()
+        return serializer.to_representation
+
+    def archived_comments(self, post_id):
+        """Comments of an archived post, read on its shard"""
+        return ArchivedComment.objects.using(
+            sharding.shard_for_id(post_id)
+        ).filter(post_id=post_id, user__is_deleted=False)
+
+    @extend_schema(
+        parameters=[
+            OpenApiParameter(
+                name="post_id",
+                description="Post whose threads to list",
+                required=True,
+                type=int,
+            ),
+        ]
+    )
+    @action(methods=["GET"], detail=False, url_path="threads")
+    def list_threads(self, request):
+        """
+        Top-level comments of a post, paginated, each with a
+        preview of its replies (the first few, a few levels
+        deep). Expand the rest with the thread endpoint,
+        reply_count tells how many replies a comment has.
+        Threads of archived posts are read from the archive.
+        """
+        post_id = self.requested_post_id()
+        if not post_id:
+            raise ValidationError({"post_id": "This parameter is required."})
+        paginator = CommentThreadPagination()
+        represent = self.represent()
+        try:
+            roots = paginator.paginate_queryset(
+                self.get_queryset().select_related(None)
+                .filter(depth=0).order_by("path"),
+                request,
+                view=self,
+            )
+        except NotFound:
+            roots = []
+        if not roots:
+            paginator = CommentThreadPagination()
+            represent = ArchivedCommentSerializer().to_representation
+            roots = paginator.paginate_queryset(
+                self.archived_comments(post_id)
+                .filter(depth=0).order_by("path"),
+                request,
+                view=self,
+            )
+        tree = threads.build_tree(roots, threads.previews(roots), represent)
+        return paginator.get_paginated_response(tree)
+
+    @extend_schema(
+        parameters=[
+            OpenApiParameter(
+                name="depth",
+                description="Levels of replies to include, all by default",
+                required=False,
+                type=int,
+            ),
+        ]
+    )
+    @action(methods=["GET"], detail=True, url_path="thread")
+    def thread(self, request, pk=None):
+        """
+        A comment with its replies nested, in display order,
+        read with one range query however deep the thread is,
+        from the archive for the comments of archived posts
+        """
+        try:
+            comment = self.get_object()
+            represent = self.represent()
+        except Http404:
+            comment = get_object_or_404(
+                ArchivedComment.objects.using(sharding.shard_for_id(pk)),
+                pk=pk,
+            )
+            represent = ArchivedCommentSerializer().to_representation
+        depth = request.query_params.get("depth")
+        # ASCII only: "²" passes str.isdigit() but not int()
+        if depth is not None and not re.fullmatch(r"\d+", depth, re.ASCII):
+            raise ValidationError({"depth": "Must be a positive integer."})
+        replies = threads.subtree(
+            comment,
+            depth=int(depth) if depth is not None else None,
+            limit=settings.COMMENT_THREAD_MAX_REPLIES,
+        )
+        return Response(threads.build_tree([comment], replies, represent)[0])
+
     @extend_schema(
         parameters=[
             OpenApiParameter(
@@ -66,19 +265,42 @@ class CommentViewSet(viewsets.ModelViewSet):
         Retrieve a list of comments with the ability
         to filter them by post id (mostly required
         for comments custom action in PostViewSet.
+        Comments of archived posts are read from the archive.
         """
-        return super().list(request, *args, **kwargs)
+        response = super().list(request, *args, **kwargs)
+        post_id = self.requested_post_id()
+        if not response.data and post_id:
+            response.data = ArchivedCommentSerializer(
+                self.archived_comments(post_id).order_by("id"), many=True
+            ).data
+        return response
+
+    def retrieve(self, request, *args, **kwargs):
+        try:
+            return super().retrieve(request, *args, **kwargs)
+        except Http404:
+            archived_comment = get_object_or_404(
+                ArchivedComment.objects.using(
+                    sharding.shard_for_id(kwargs["pk"])
+                ),
+                pk=kwargs["pk"],
+            )
+            return Response(ArchivedCommentSerializer(archived_comment).data)
 
 
-class PostViewSet(viewsets.ModelViewSet):
-    queryset = (
-        Post.objects.all()
-        .prefetch_related(
-            "likes", "comments"
-        ).select_related("user")
-    )
+class PostViewSet(BatchRetrieveMixin, viewsets.ModelViewSet):
+    queryset = Post.objects.all()
     serializer_class = PostSerializer
     pagination_class = PostPagination
+    lookup_value_regex = "[0-9]+"
+    throttle_scope = None
+    # Columns fetched by actions that never serialize the post,
+    # they only check existence and ownership
+    lean_action_fields = {
+        "like_this_post": ("id", "user"),
+        "comments": ("id",),
+        "destroy": ("id", "user", "is_deleted"),
+    }
 
     def get_permissions(self):
         if self.action in [
@@ -86,7 +308,7 @@ class PostViewSet(viewsets.ModelViewSet):
         ]:
             permission_classes = [IsOwnerOrReadOnly]
         elif self.action in [
-            "like_this_post", "liked_posts"
+            "like_this_post", "like", "unlike", "liked_posts"
         ]:
             permission_classes = [IsAuthenticated]
         else:
@@ -97,47 +319,243 @@ class PostViewSet(viewsets.ModelViewSet):
         ]
 
     def get_queryset(self):
-        queryset = self.queryset
+        queryset = self.queryset.filter(
+            is_deleted=False, user__is_deleted=False
+        )
+        followed_ids = None
         if self.request.user.is_authenticated:
-            ids_of_who_i_follow = list(
-                self.request.user.following.values_list(
-                    "id", flat=True
-                )
+            followed_ids = self.followed_ids()
+            queryset = queryset.filter(
+                Q(user_id__in=followed_ids)
+                | Q(user_id=self.request.user.id)
             )
-            my_id = self.request.user.id
-            ids_of_who_i_follow.append(my_id)
+        if (
+                self.action == "list"
+                or not self.request.user.is_authenticated
+        ):
+            queryset = queryset.filter(is_published=True)
+        else:
+            # Authors can still manage their own scheduled posts
             queryset = queryset.filter(
-                user_id__in=ids_of_who_i_follow
-            ).distinct()
+                Q(is_published=True) | Q(user=self.request.user)
+            )
         tags = self.request.query_params.get("tags")
         if tags:
             queryset = queryset.filter(
                 tags__name__in=tags.split(",")
             )
+        queryset = self.with_action_relations(queryset.distinct())
+        if sharding.is_sharded():
+            return self.scatter(queryset, followed_ids)
+        return queryset
+
+    def followed_ids(self):
+        """
+        Authors the user follows: a subquery rather than a separate
+        query, unless the posts are on other databases (shards)
+        """
+        following = self.request.user.following.values_list("id", flat=True)
+        if sharding.is_sharded():
+            return list(following)
+        return following
+
+    def scatter(self, queryset, followed_ids):
+        """
+        The post of a detail action is read from the shard of its
+        id. Lists go to the shards of the followed authors (all
+        shards for anonymous users) and are gathered merged by
+        creation time.
+        """
+        if "pk" in self.kwargs:
+            return queryset.using(sharding.shard_for_id(self.kwargs["pk"]))
+        if followed_ids is None:
+            shards = settings.POST_SHARDS
+        else:
+            shards = sharding.group_by_shard(
+                [*followed_ids, self.request.user.id],
+                shard_for=sharding.shard_for_user,
+            )
+        return sharding.ScatterGather(
+            {using: queryset.using(using) for using in shards}
+        )
+
+    def with_action_relations(self, queryset):
+        """
+        Load only what the current action uses: a few columns for
+        write and redirect actions, the post and its author for
+        updates (UpdateModelMixin drops prefetched relations before
+        serializing the result anyway) and the requested fields
+        for everything else
+        """
+        if self.action in self.lean_action_fields:
+            return queryset.only(*self.lean_action_fields[self.action])
+        if self.action in ("update", "partial_update"):
+            return queryset.select_related("user")
+        return self.with_requested_relations(queryset)
+
+    def with_requested_relations(self, queryset):
+        """
+        Join and prefetch only the relations of the fields
+        requested with ?fields= and ?expand=
+        """
+        selected = PostSerializer.selected_fields(self.request)
+        if "user" in selected:
+            queryset = queryset.select_related("user")
+        return queryset.prefetch_related(
+            *without_deleted_users(
+                *(
+                    name for name in PostSerializer.Meta.expandable_fields
+                    if name in selected
+                )
+            )
+        )
+
+    def get_archived_queryset(self, using=DEFAULT_DB_ALIAS):
+        """
+        Fallback read path for posts moved to the archive
+        tables (kept on the database of the post), with the same
+        author visibility as the feed
+        """
+        queryset = (
+            ArchivedPost.objects.using(using)
+            .prefetch_related(
+                *without_deleted_users("likes", "comments", model=ArchivedPost)
+            )
+            .select_related("user")
+        )
+        if self.request.user.is_authenticated:
+            queryset = queryset.filter(
+                Q(user_id__in=self.followed_ids())
+                | Q(user=self.request.user)
+            )
         return queryset.distinct()
 
+    def get_archived_post(self, pk):
+        return get_object_or_404(
+            self.get_archived_queryset(sharding.shard_for_id(pk)), pk=pk
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        try:
+            return super().retrieve(request, *args, **kwargs)
+        except Http404:
+            archived_post = self.get_archived_post(kwargs["pk"])
+            serializer = ArchivedPostSerializer(
+                archived_post, context=self.get_serializer_context()
+            )
+            return Response(serializer.data)
+
     @action(
         methods=["PATCH"],
         detail=True,
         url_path="like",
         permission_classes=[IsAuthenticated],
+        throttle_scope="likes",
     )
     def like_this_post(self, request, pk=None):
         """
         Endpoint to like posts,
-        like is user instance (particularly user ID)
+        like is user instance (particularly user ID).
+        PATCH toggles the like, prefer PUT to like
+        and DELETE to unlike, which can be retried
         """
         post = self.get_object()
         user = request.user
+        using = post._state.db
 
-        has_liked = post.likes.filter(id=user.id).exists()
+        # Unlike if there was a like, like otherwise: one statement
+        # each instead of reading the like first
+        if unlink(
+                Post.likes.through, "user", user.id, "post", post.id,
+                using=using,
+        ):
+            self.send_likes_changed(post.id, "post_remove")
+            return Response(status=status.HTTP_204_NO_CONTENT)
+        if not link(
+                Post.likes.through, "user", user.id, "post",
+                Post.objects.using(using).filter(pk=post.id),
+                using=using,
+        ):
+            # A concurrent request liked it between the two statements
+            return Response(status=status.HTTP_204_NO_CONTENT)
+        self.send_likes_changed(post.id, "post_add")
+        record_activity(
+            actor_id=user.id,
+            recipient_id=post.user_id,
+            verb=Verb.LIKE,
+            post_id=post.id,
+        )
+        return Response(status=status.HTTP_201_CREATED)
+
+    def likeable_posts(self):
+        """
+        Posts the current user can like, with the same
+        visibility as the feed, as a lazy queryset
+        """
+        user = self.request.user
+        return Post.objects.using(
+            sharding.shard_for_id(self.kwargs["pk"])
+        ).filter(
+            Q(user=user) | Q(user__in=self.followed_ids()),
+            Q(is_published=True) | Q(user=user),
+            is_deleted=False,
+            user__is_deleted=False,
+        )
 
-        if has_liked:
-            post.likes.remove(user)
+    def send_likes_changed(self, post_id, action):
+        """
+        Raw through table writes skip m2m_changed, send it so
+        live updates and cached fragments follow the change
+        """
+        m2m_changed.send(
+            sender=Post.likes.through,
+            instance=Post(pk=post_id),
+            action=action,
+            reverse=False,
+            model=get_user_model(),
+            pk_set={self.request.user.id},
+            using=sharding.shard_for_id(post_id),
+        )
+
+    @like_this_post.mapping.put
+    def like(self, request, pk=None):
+        """
+        Idempotent like: a single insert that leaves an
+        existing like alone, safe for clients to retry
+        """
+        post_id = int(pk)
+        posts = self.likeable_posts().filter(pk=post_id)
+        if not link(
+                Post.likes.through, "user", request.user.id, "post", posts,
+                using=posts.db,
+        ):
+            if not posts.exists():
+                raise Http404
             return Response(status=status.HTTP_204_NO_CONTENT)
-        else:
-            post.likes.add(user)
-            return Response(status=status.HTTP_201_CREATED)
+        self.send_likes_changed(post_id, "post_add")
+        record_activity(
+            actor_id=request.user.id,
+            recipient_id=Post.objects.using(posts.db).values_list(
+                "user_id", flat=True
+            ).get(pk=post_id),
+            verb=Verb.LIKE,
+            post_id=post_id,
+        )
+        return Response(status=status.HTTP_201_CREATED)
+
+    @like_this_post.mapping.delete
+    def unlike(self, request, pk=None):
+        """
+        Idempotent unlike: a single delete,
+        succeeds whether or not the post was liked
+        """
+        post_id = int(pk)
+        if unlink(
+                Post.likes.through, "user", request.user.id, "post", post_id,
+                using=sharding.shard_for_id(post_id),
+        ):
+            self.send_likes_changed(post_id, "post_remove")
+        return Response(status=status.HTTP_204_NO_CONTENT)
 
     def get_serializer_class(self):
         if self.action == "comments":
@@ -145,6 +563,27 @@ class PostViewSet(viewsets.ModelViewSet):
 
         return PostSerializer
 
+    def get_serializer(self, *args, **kwargs):
+        """
+        Resolve liked_by_me/following_author for every
+        serialized post at once and share it through the context
+        """
+        serializer_class = self.get_serializer_class()
+        if (
+                args
+                and issubclass(serializer_class, PostSerializer)
+                and serializer_class.selected_fields(self.request)
+                & {"liked_by_me", "following_author"}
+        ):
+            posts = args[0] if kwargs.get("many") else [args[0]]
+            context = kwargs.setdefault(
+                "context", self.get_serializer_context()
+            )
+            context["viewer_state"] = ViewerState.resolve(
+                self.request.user, posts
+            )
+        return super().get_serializer(*args, **kwargs)
+
     @action(
         methods=["GET"],
         detail=True,
@@ -160,8 +599,10 @@ class PostViewSet(viewsets.ModelViewSet):
         in url bar, you will be redirected to:
         /api/content/comments/?post_id=1
         """
-        post = self.get_object()
-        post_id = post.id
+        try:
+            post_id = self.get_object().id
+        except Http404:
+            post_id = self.get_archived_post(pk).id
         query_params = urlencode({"post_id": post_id})
         redirect_url = (
                 reverse(
@@ -178,7 +619,8 @@ class PostViewSet(viewsets.ModelViewSet):
     )
     def liked_posts(self, request):
         """
-        Returns all posts that you liked
+        Returns all posts that you liked,
+        including archived ones
         """
         queryset = self.get_queryset().filter(
             likes=self.request.user
@@ -186,19 +628,53 @@ class PostViewSet(viewsets.ModelViewSet):
         serializer = self.get_serializer(
             queryset, many=True
         )
+        archived_serializer = ArchivedPostSerializer(
+            [
+                archived_post
+                for using in sharding.post_databases()
+                for archived_post in self.get_archived_queryset(using)
+                .filter(likes=self.request.user)
+            ],
+            many=True,
+            context=self.get_serializer_context(),
+        )
         return Response(
-            serializer.data, status=status.HTTP_200_OK
+            serializer.data + archived_serializer.data,
+            status=status.HTTP_200_OK
         )
 
     def perform_destroy(self, instance):
-        if instance.user != self.request.user:
+        if instance.user_id != self.request.user.id:
             raise PermissionDenied(
                 "You do not have permission to delete this post."
             )
-        instance.delete()
+        instance.is_deleted = True
+        instance.save(update_fields=["is_deleted"])
+        transaction.on_commit(lambda: purge_post.delay(instance.id))
 
     def perform_create(self, serializer):
-        serializer.save(user=self.request.user)
+        serializer.save(
+            user=self.request.user,
+            is_published=is_due(
+                serializer.validated_data.get("publish_at")
+            ),
+        )
+        # A new post is not liked yet and the author does not
+        # follow themselves, its viewer state is known without queries
+        serializer.context["viewer_state"] = ViewerState()
+
+    def perform_update(self, serializer):
+        if (
+                not serializer.instance.is_published
+                and "publish_at" in serializer.validated_data
+        ):
+            serializer.save(
+                is_published=is_due(
+                    serializer.validated_data["publish_at"]
+                )
+            )
+        else:
+            serializer.save()
 
     @extend_schema(
         parameters=[
@@ -208,11 +684,183 @@ class PostViewSet(viewsets.ModelViewSet):
                 required=False,
                 type=Type[list[str]]
             ),
+            OpenApiParameter(
+                name="fields",
+                description=(
+                        "Comma-separated fields to return, "
+                        "example: ?fields=id,title,created"
+                ),
+                required=False,
+                type=str
+            ),
+            OpenApiParameter(
+                name="expand",
+                description=(
+                        "Comma-separated nested fields to include "
+                        "(likes, comments, tags), all by default"
+                ),
+                required=False,
+                type=str
+            ),
+            IDS_PARAMETER,
         ]
     )
     def list(self, request, *args, **kwargs):
         """
         Retrieve a list of posts with the
-        ability to filter them by tags.
+        ability to filter them by tags,
+        or the posts listed in ?ids=.
         """
+        if "ids" in request.query_params:
+            return self.batch_retrieve(request)
+        if (
+                not request.user.is_authenticated
+                and self.can_assemble_from_fragments(request)
+        ):
+            body = snapshots.get_page(request)
+            if body is not None:
+                return HttpResponse(body, content_type="application/json")
+        if self.can_assemble_from_fragments(request):
+            return self.list_from_fragments(request)
         return super().list(request, *args, **kwargs)
+
+    def can_assemble_from_fragments(self, request):
+        """
+        Cached fragments hold the full JSON representation,
+        sparse fieldsets and other renderers take the normal path,
+        as do sharded feeds (the page is merged from the shards)
+        """
+        return (
+                not sharding.is_sharded()
+                and type(request.accepted_renderer) is JSONRenderer
+                and "fields" not in request.query_params
+                and "expand" not in request.query_params
+        )
+
+    def list_from_fragments(self, request):
+        """
+        Fetch only (id, user_id, version) of the page and
+        concatenate the cached JSON of its posts, serializing
+        just the ones missing from the cache
+        """
+        rows = (
+            self.filter_queryset(self.get_queryset())
+            .select_related(None)
+            .prefetch_related(None)
+            .values_list("id", "user_id", "version", named=True)
+        )
+        page = self.paginate_queryset(rows)
+        body = fragments.assemble_page(
+            {
+                "count": self.paginator.page.paginator.count,
+                "next": self.paginator.get_next_link(),
+                "previous": self.paginator.get_previous_link(),
+            },
+            page,
+            ViewerState.resolve(request.user, page),
+        )
+        return HttpResponse(body, content_type="application/json")
+
+
+def _live_feed_subscriber(request):
+    """
+    Authenticate with a JWT from the Authorization header or, since
+    EventSource cannot set headers, from the ``token`` query parameter
+    and return (user, channels) to listen on
+    """
+    authentication = JWTAuthentication()
+    try:
+        token = request.GET.get("token")
+        if token:
+            user = authentication.get_user(
+                authentication.get_validated_token(token)
+            )
+        else:
+            user, _ = authentication.authenticate(request) or (None, None)
+    except (InvalidToken, AuthenticationFailed):
+        return None, None
+    if user is None:
+        return None, None
+
+    author_ids = list(user.following.values_list("id", flat=True))
+    author_ids.append(user.id)
+    channels = [live.author_channel(author_id) for author_id in author_ids]
+    channels += [
+        live.post_channel(post_id)
+        for post_id in _watchable_post_ids(
+            user, author_ids, request.GET.get("watch", "")
+        )
+    ]
+    return user, channels
+
+
+def _watchable_post_ids(user, author_ids, watch):
+    """
+    Ids in ``watch`` of posts the user can see in the feed,
+    LIVE_FEED_MAX_WATCHED_POSTS at most
+    """
+    post_ids = []
+    for value in watch.split(","):
+        try:
+            post_ids.append(int(value))
+        except ValueError:
+            continue
+    post_ids = post_ids[:settings.LIVE_FEED_MAX_WATCHED_POSTS]
+    visible = []
+    for using, ids in sharding.group_by_shard(post_ids).items():
+        visible += Post.objects.using(using).filter(
+            Q(is_published=True) | Q(user=user),
+            id__in=ids,
+            user_id__in=author_ids,
+            is_deleted=False,
+            user__is_deleted=False,
+        ).values_list("id", flat=True)
+    return sorted(visible)
+
+
+async def live_feed(request):
+    """
+    Server-Sent Events stream replacing feed polling. Pushes ids
+    of new posts from followed authors, new comments and like
+    count changes on posts listed in ``?watch=1,2,3``.
+    Requires the ASGI server (social_media_api.asgi).
+    """
+    user, channels = await sync_to_async(_live_feed_subscriber)(request)
+    if user is None:
+        return JsonResponse(
+            {"detail": "Authentication credentials were not provided."},
+            status=status.HTTP_401_UNAUTHORIZED,
+        )
+    try:
+        subscription = live.hub.subscribe(user.id, channels)
+    except live.ConnectionLimitExceeded as error:
+        return JsonResponse(
+            {"detail": str(error)},
+            status=status.HTTP_429_TOO_MANY_REQUESTS,
+        )
+
+    async def stream():
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + settings.LIVE_FEED_MAX_DURATION
+        try:
+            yield f"retry: {settings.LIVE_FEED_RETRY_MS}\n\n"
+            while loop.time() < deadline:
+                try:
+                    event = await subscription.get(
+                        settings.LIVE_FEED_KEEPALIVE
+                    )
+                except asyncio.TimeoutError:
+                    yield ": keepalive\n\n"
+                    continue
+                if event is live.CLOSED:
+                    break
+                yield live.format_event(event)
+        finally:
+            live.hub.unsubscribe(subscription)
+
+    response = StreamingHttpResponse(
+        stream(), content_type="text/event-stream"
+    )
+    response["Cache-Control"] = "no-cache"
+    response["X-Accel-Buffering"] = "no"
+    return response
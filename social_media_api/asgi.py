@@ -2,6 +2,8 @@
 ASGI config for social_media_api project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
+The live feed (Server-Sent Events at /api/content/posts/live/) keeps
+connections open and should be served through this entry point.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/4.2/howto/deployment/asgi/
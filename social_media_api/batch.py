@@ -0,0 +1,64 @@
+import re
+
+from django.conf import settings
+from drf_spectacular.utils import OpenApiParameter
+from rest_framework.exceptions import ValidationError
+from rest_framework.response import Response
+
+IDS_PARAMETER = OpenApiParameter(
+    name="ids",
+    description=(
+            "Comma-separated ids to fetch in one request, "
+            "example: ?ids=3,1,2 (results keep this order, "
+            "ids not found or not visible are listed in missing)"
+    ),
+    required=False,
+    type=str,
+)
+
+
+class BatchRetrieveMixin:
+    """
+    ``?ids=`` on the list endpoint of a viewset: the objects are
+    loaded with one query on the viewset's queryset (plus its
+    prefetches), whatever the number of ids
+    """
+
+    def requested_ids(self, request):
+        ids = []
+        for value in request.query_params["ids"].split(","):
+            value = value.strip()
+            if not value:
+                continue
+            # ASCII only: "²" passes str.isdigit() but not int()
+            if not re.fullmatch(r"\d+", value, re.ASCII):
+                raise ValidationError({"ids": f"Invalid id: {value!r}"})
+            ids.append(int(value))
+        # Duplicates are returned once, at their first position
+        ids = list(dict.fromkeys(ids))
+        if len(ids) > settings.BATCH_RETRIEVE_MAX_IDS:
+            raise ValidationError(
+                {
+                    "ids": (
+                        "Ensure there are at most "
+                        f"{settings.BATCH_RETRIEVE_MAX_IDS} ids."
+                    )
+                }
+            )
+        return ids
+
+    def batch_retrieve(self, request):
+        ids = self.requested_ids(request)
+        objects = {
+            instance.pk: instance
+            for instance in self.get_queryset().filter(pk__in=ids)
+        }
+        serializer = self.get_serializer(
+            [objects[pk] for pk in ids if pk in objects], many=True
+        )
+        return Response(
+            {
+                "results": serializer.data,
+                "missing": [pk for pk in ids if pk not in objects],
+            }
+        )
@@ -0,0 +1,559 @@
+import asyncio
+import contextlib
+import contextvars
+import http.client
+import io
+import json
+import math
+import random
+import sys
+import time
+from collections import Counter, defaultdict
+from urllib.parse import urlsplit
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.signals import got_request_exception
+from django.db import OperationalError
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from posts import sharding
+from posts.models import Post
+from posts.purge import BatchPurger
+
+LOADTEST_DOMAIN = "@loadtest.invalid"
+LOADTEST_EMAIL = "loadtest-{index}" + LOADTEST_DOMAIN
+LOCKED_MESSAGE = "database is locked"
+HOST = "localhost"
+
+OPERATIONS = ("feed", "like", "comment", "subscribe", "search", "live")
+DEFAULT_MIX = "feed=60,like=15,comment=10,subscribe=5,search=10"
+# Operations holding a streaming connection open instead of
+# sending one request
+STREAMING_OPERATIONS = {"live"}
+
+
+def parse_mix(value):
+    """``feed=60,like=15`` -> {"feed": 60, "like": 15}"""
+    mix = {}
+    for item in value.split(","):
+        name, _, weight = item.partition("=")
+        name = name.strip()
+        if name not in OPERATIONS:
+            raise ValueError(
+                f"Unknown operation {name!r}, "
+                f"expected one of {', '.join(OPERATIONS)}"
+            )
+        mix[name] = float(weight or 1)
+    if not any(mix.values()):
+        raise ValueError("The mix needs at least one positive weight")
+    return mix
+
+
+def percentile(sorted_values, percent):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    rank = math.ceil(percent / 100 * len(sorted_values))
+    return sorted_values[max(rank, 1) - 1]
+
+
+class EndpointStats:
+    def __init__(self):
+        self.latencies = []
+        self.statuses = Counter()
+        self.errors = 0
+        self.locked = 0
+        # Server-Sent Events received on streaming endpoints
+        self.events = 0
+
+    def record(self, latency, status, locked=False, events=0):
+        self.latencies.append(latency)
+        self.statuses[status] += 1
+        if status == 0 or status >= 500:
+            self.errors += 1
+        self.locked += locked
+        self.events += events
+
+    @property
+    def requests(self):
+        return len(self.latencies)
+
+    def summary(self, elapsed):
+        latencies = sorted(self.latencies)
+        return {
+            "requests": self.requests,
+            "throughput": self.requests / elapsed if elapsed else 0.0,
+            "p50_ms": percentile(latencies, 50) * 1000,
+            "p95_ms": percentile(latencies, 95) * 1000,
+            "p99_ms": percentile(latencies, 99) * 1000,
+            "error_rate": self.errors / self.requests if self.requests else 0,
+            "throttled": self.statuses[429],
+            "locked": self.locked,
+            "events": self.events,
+            "statuses": dict(sorted(self.statuses.items())),
+        }
+
+
+# Per request flag, set by the in-process exception hook
+_current_request = contextvars.ContextVar("loadtest_request")
+
+
+class LockDetector:
+    """
+    Flag requests failing with ``database is locked`` inside the
+    process, the client only sees a 500 for them. Against a
+    remote server the error is looked up in the response body.
+    """
+
+    def __enter__(self):
+        got_request_exception.connect(self.on_exception)
+        return self
+
+    def __exit__(self, *exc_info):
+        got_request_exception.disconnect(self.on_exception)
+
+    def on_exception(self, sender, request=None, **kwargs):
+        error = sys.exc_info()[1]
+        state = _current_request.get(None)
+        if (
+                state is not None
+                and isinstance(error, OperationalError)
+                and LOCKED_MESSAGE in str(error)
+        ):
+            state["locked"] = True
+
+
+class ASGITransport:
+    """Call ``social_media_api.asgi.application`` in the event loop."""
+
+    name = "asgi"
+
+    def __init__(self):
+        from social_media_api.asgi import application
+
+        self.application = application
+
+    def scope(self, method, path, query, headers, client):
+        return {
+            "type": "http",
+            "asgi": {"version": "3.0"},
+            "http_version": "1.1",
+            "method": method,
+            "scheme": "http",
+            "path": path,
+            "raw_path": path.encode(),
+            "query_string": query.encode(),
+            "root_path": "",
+            "headers": [
+                (name.lower().encode(), value.encode())
+                for name, value in {"Host": HOST, **headers}.items()
+            ],
+            "server": (HOST, 80),
+            "client": (client, 50000),
+        }
+
+    async def request(self, method, path, query, body, headers, client):
+        scope = self.scope(method, path, query, headers, client)
+        messages = [{"type": "http.request", "body": body, "more_body": False}]
+
+        async def receive():
+            if messages:
+                return messages.pop()
+            # Nothing more to send, the client never disconnects early
+            await asyncio.Event().wait()
+
+        response = {"status": 0, "body": []}
+
+        async def send(message):
+            if message["type"] == "http.response.start":
+                response["status"] = message["status"]
+            elif message["type"] == "http.response.body":
+                response["body"].append(message.get("body", b""))
+
+        await self.application(scope, receive, send)
+        return response["status"], b"".join(response["body"])
+
+    async def stream(self, path, query, headers, client, seconds):
+        """
+        GET a streaming response and read it for ``seconds``, returns
+        (status, body so far, seconds until the response started)
+        """
+        scope = self.scope("GET", path, query, headers, client)
+        messages = [{"type": "http.request", "body": b"", "more_body": False}]
+        started = time.perf_counter()
+        response = {"status": 0, "body": [], "latency": 0.0}
+
+        async def receive():
+            if messages:
+                return messages.pop()
+            await asyncio.Event().wait()
+
+        async def send(message):
+            if message["type"] == "http.response.start":
+                response["status"] = message["status"]
+                response["latency"] = time.perf_counter() - started
+            elif message["type"] == "http.response.body":
+                response["body"].append(message.get("body", b""))
+
+        # Django does not end a stream on http.disconnect, the
+        # client going away is the application being cancelled
+        task = asyncio.ensure_future(self.application(scope, receive, send))
+        await asyncio.wait([task], timeout=seconds)
+        task.cancel()
+        with contextlib.suppress(asyncio.CancelledError):
+            await task
+        return (
+            response["status"], b"".join(response["body"]), response["latency"]
+        )
+
+
+class WSGITransport:
+    """Call ``social_media_api.wsgi.application`` from worker threads."""
+
+    name = "wsgi"
+
+    def __init__(self):
+        from social_media_api.wsgi import application
+
+        self.application = application
+
+    def _call(self, method, path, query, body, headers, client):
+        environ = {
+            "REQUEST_METHOD": method,
+            "SCRIPT_NAME": "",
+            "PATH_INFO": path,
+            "QUERY_STRING": query,
+            "SERVER_NAME": HOST,
+            "SERVER_PORT": "80",
+            "SERVER_PROTOCOL": "HTTP/1.1",
+            "REMOTE_ADDR": client,
+            "CONTENT_LENGTH": str(len(body)),
+            "wsgi.version": (1, 0),
+            "wsgi.url_scheme": "http",
+            "wsgi.input": io.BytesIO(body),
+            "wsgi.errors": sys.stderr,
+            "wsgi.multithread": True,
+            "wsgi.multiprocess": False,
+            "wsgi.run_once": False,
+        }
+        for name, value in headers.items():
+            key = name.upper().replace("-", "_")
+            if key != "CONTENT_TYPE":
+                key = f"HTTP_{key}"
+            environ[key] = value
+        status = []
+
+        def start_response(status_line, response_headers, exc_info=None):
+            status.append(int(status_line.split(" ", 1)[0]))
+
+        result = self.application(environ, start_response)
+        try:
+            content = b"".join(result)
+        finally:
+            if hasattr(result, "close"):
+                result.close()
+        return status[0], content
+
+    async def request(self, *args):
+        return await asyncio.to_thread(self._call, *args)
+
+
+class HTTPTransport:
+    """Send real HTTP requests to a running server."""
+
+    name = "http"
+
+    def __init__(self, url):
+        parts = urlsplit(url)
+        self.host = parts.hostname
+        self.port = parts.port or 80
+
+    def _call(self, method, path, query, body, headers, client):
+        connection = http.client.HTTPConnection(
+            self.host, self.port, timeout=60
+        )
+        try:
+            connection.request(
+                method,
+                f"{path}?{query}" if query else path,
+                body=body or None,
+                headers=headers,
+            )
+            response = connection.getresponse()
+            return response.status, response.read()
+        finally:
+            connection.close()
+
+    async def request(self, *args):
+        return await asyncio.to_thread(self._call, *args)
+
+    def _stream(self, path, query, headers, client, seconds):
+        started = time.perf_counter()
+        deadline = started + seconds
+        connection = http.client.HTTPConnection(
+            self.host, self.port, timeout=seconds
+        )
+        try:
+            connection.request(
+                "GET", f"{path}?{query}" if query else path, headers=headers
+            )
+            response = connection.getresponse()
+            latency = time.perf_counter() - started
+            chunks = []
+            while (remaining := deadline - time.perf_counter()) > 0:
+                connection.sock.settimeout(remaining)
+                try:
+                    chunk = response.read1(65536)
+                except TimeoutError:
+                    break
+                if not chunk:
+                    break
+                chunks.append(chunk)
+            return response.status, b"".join(chunks), latency
+        finally:
+            connection.close()
+
+    async def stream(self, *args):
+        return await asyncio.to_thread(self._stream, *args)
+
+
+def delete_users():
+    """
+    Delete every load test user with their posts, comments, likes,
+    follows and notifications, on the post shards too
+    """
+    users = get_user_model().objects.filter(email__endswith=LOADTEST_DOMAIN)
+    # The collector would look for the default-only tables on the shards
+    purger = BatchPurger(pause=0)
+    for using in settings.POST_SHARDS:
+        purger.purge(users.using(using))
+    users.delete()
+
+
+class LoadTestUser:
+    def __init__(self, user, visible_post_ids, subscribe_ids):
+        self.id = user.id
+        self.token = str(RefreshToken.for_user(user).access_token)
+        self.visible_post_ids = visible_post_ids
+        self.subscribe_ids = subscribe_ids
+
+
+def prepare_users(count, follows, posts_per_user, seed):
+    """
+    Create (or reuse) ``count`` load test users that follow
+    ``follows`` of each other and own ``posts_per_user`` posts.
+    Subscribe toggles only target users outside this follow
+    graph, so they never change which posts are visible.
+    """
+    rng = random.Random(seed)
+    user_model = get_user_model()
+    emails = [LOADTEST_EMAIL.format(index=index) for index in range(count)]
+    password = make_password(None)
+    user_model.objects.bulk_create(
+        [
+            user_model(
+                email=email, username=f"loadtest{index}", password=password
+            )
+            for index, email in enumerate(emails)
+        ],
+        ignore_conflicts=True,
+    )
+    users = list(
+        user_model.objects.filter(email__in=emails, is_deleted=False)
+        .order_by("id")
+    )
+    user_ids = [user.id for user in users]
+    if sharding.is_sharded():
+        # bulk_create sends no post_save to replicate them
+        sharding.replicate_users(users)
+
+    authors_by_shard = sharding.group_by_shard(
+        user_ids, sharding.shard_for_user
+    )
+    for using, author_ids in authors_by_shard.items():
+        existing_posts = Counter(
+            Post.objects.using(using).filter(user_id__in=author_ids)
+            .values_list("user_id", flat=True)
+        )
+        Post.objects.using(using).bulk_create(
+            [
+                Post(
+                    title=f"Load test post {index}",
+                    text="Load test post body #loadtest",
+                    user_id=user_id,
+                )
+                for user_id in author_ids
+                for index in range(existing_posts[user_id], posts_per_user)
+            ]
+        )
+
+    through = user_model.following.through
+    through.objects.filter(
+        from_user_id__in=user_ids, to_user_id__in=user_ids
+    ).delete()
+    following = {
+        user_id: rng.sample(
+            [other for other in user_ids if other != user_id],
+            min(follows, len(user_ids) - 1),
+        )
+        for user_id in user_ids
+    }
+    through.objects.bulk_create(
+        [
+            through(from_user_id=user_id, to_user_id=followed_id)
+            for user_id, followed_ids in following.items()
+            for followed_id in followed_ids
+        ]
+    )
+
+    posts_by_author = defaultdict(list)
+    for using, author_ids in authors_by_shard.items():
+        for post_id, user_id in Post.objects.using(using).filter(
+                user_id__in=author_ids, is_deleted=False, is_published=True
+        ).values_list("id", "user_id"):
+            posts_by_author[user_id].append(post_id)
+    return [
+        LoadTestUser(
+            user,
+            visible_post_ids=[
+                post_id
+                for author_id in [user.id, *following[user.id]]
+                for post_id in posts_by_author[author_id]
+            ],
+            subscribe_ids=[
+                other for other in user_ids
+                if other != user.id and other not in following[user.id]
+            ],
+        )
+        for user in users
+    ]
+
+
+def build_request(operation, user, rng):
+    """(endpoint label, method, path, query, json body) of one operation"""
+    if operation == "live":
+        watch = rng.sample(
+            user.visible_post_ids, min(len(user.visible_post_ids), 10)
+        )
+        return (
+            "GET /posts/live/ (stream)",
+            "GET",
+            "/api/content/posts/live/",
+            f"watch={','.join(map(str, watch))}",
+            None,
+        )
+    if operation == "feed":
+        return "GET /posts/", "GET", "/api/content/posts/", "page_size=20", None
+    if operation == "search":
+        return (
+            "GET /users/?username=",
+            "GET",
+            "/api/users/users/",
+            f"username=loadtest{rng.randint(0, 9)}",
+            None,
+        )
+    if operation == "subscribe" and user.subscribe_ids:
+        return (
+            "POST /users/{id}/subscribe/",
+            "POST",
+            f"/api/users/users/{rng.choice(user.subscribe_ids)}/subscribe/",
+            "",
+            None,
+        )
+    if not user.visible_post_ids:
+        return build_request("feed", user, rng)
+    post_id = rng.choice(user.visible_post_ids)
+    if operation == "comment":
+        return (
+            "POST /comments/",
+            "POST",
+            "/api/content/comments/",
+            f"post_id={post_id}",
+            {"text": "Load test comment"},
+        )
+    return (
+        "PATCH /posts/{id}/like/",
+        "PATCH",
+        f"/api/content/posts/{post_id}/like/",
+        "",
+        None,
+    )
+
+
+async def run_load(
+        transport, users, mix, concurrency, duration=None,
+        total_requests=None, seed=0, stream_seconds=5.0
+):
+    """
+    Run ``concurrency`` asyncio workers until ``duration`` seconds
+    have passed or ``total_requests`` were sent, returns
+    ({endpoint: EndpointStats}, elapsed seconds). A streaming
+    operation keeps its worker on one connection for
+    ``stream_seconds``, the latency is the time to its headers.
+    """
+    stats = defaultdict(EndpointStats)
+    operations, weights = zip(*mix.items())
+    remaining = [total_requests]
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + duration if duration else None
+
+    def more():
+        if deadline is not None and loop.time() >= deadline:
+            return False
+        if remaining[0] is not None:
+            if remaining[0] <= 0:
+                return False
+            remaining[0] -= 1
+        return True
+
+    async def worker(index):
+        rng = random.Random(f"{seed}:{index}")
+        client = f"10.{index // 65536 % 256}.{index // 256 % 256}.{index % 256}"
+        while more():
+            user = users[rng.randrange(len(users))]
+            operation = rng.choices(operations, weights)[0]
+            endpoint, method, path, query, payload = build_request(
+                operation, user, rng
+            )
+            headers = {"Authorization": f"Bearer {user.token}"}
+            body = b""
+            if payload is not None:
+                body = json.dumps(payload).encode()
+                headers["Content-Type"] = "application/json"
+            state = {"locked": False}
+            _current_request.set(state)
+            started = time.perf_counter()
+            try:
+                if operation in STREAMING_OPERATIONS:
+                    status, content, latency = await transport.stream(
+                        path, query, headers, client, stream_seconds
+                    )
+                else:
+                    status, content = await transport.request(
+                        method, path, query, body, headers, client
+                    )
+                    latency = time.perf_counter() - started
+            except Exception as error:
+                status, content = 0, str(error).encode()
+                latency = time.perf_counter() - started
+            stats[endpoint].record(
+                latency,
+                status,
+                locked=state["locked"] or (
+                        (status == 0 or status >= 500)
+                        and LOCKED_MESSAGE.encode() in content
+                ),
+                events=(
+                    content.count(b"\nevent: ")
+                    if operation in STREAMING_OPERATIONS else 0
+                ),
+            )
+
+    started = time.perf_counter()
+    with LockDetector():
+        await asyncio.gather(
+            *(worker(index) for index in range(concurrency))
+        )
+    return stats, time.perf_counter() - started
@@ -0,0 +1,67 @@
+import time
+
+from django.contrib.auth.models import AnonymousUser
+from django.core.management.base import BaseCommand
+from rest_framework.test import APIRequestFactory
+from rest_framework.views import APIView
+
+from social_media_api.throttling import (
+    IPRateThrottle,
+    ScopedRateThrottle,
+    UserRateThrottle,
+)
+
+
+class BenchmarkView(APIView):
+    throttle_scope = "benchmark"
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure the per-request overhead of the throttle classes "
+        "against the configured throttle cache"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--requests", type=int, default=20000)
+        parser.add_argument(
+            "--clients",
+            type=int,
+            default=100,
+            help="Distinct client IPs the requests are spread over",
+        )
+
+    def handle(self, *args, **options):
+        total = options["requests"]
+        factory = APIRequestFactory()
+        requests = []
+        for index in range(options["clients"]):
+            request = factory.get(
+                "/", REMOTE_ADDR=f"10.0.{index // 256}.{index % 256}"
+            )
+            request.user = AnonymousUser()
+            requests.append(request)
+        view = BenchmarkView()
+
+        # A limit nobody reaches, so only the bookkeeping is measured
+        rates = {
+            "user": "1000000000/hour",
+            "ip": "1000000000/hour",
+            "benchmark": "1000000000/hour",
+        }
+        for throttle_class in (
+                UserRateThrottle, IPRateThrottle, ScopedRateThrottle
+        ):
+            throttle = type(
+                throttle_class.__name__,
+                (throttle_class,),
+                {"THROTTLE_RATES": rates},
+            )()
+            started = time.perf_counter()
+            for index in range(total):
+                throttle.allow_request(requests[index % len(requests)], view)
+            elapsed = time.perf_counter() - started
+            self.stdout.write(
+                f"{throttle_class.__name__:<20} "
+                f"{elapsed / total * 1e6:8.2f} us/request"
+            )
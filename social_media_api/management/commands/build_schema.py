@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+
+from social_media_api.schema import (
+    RENDERERS,
+    artifact_path,
+    generate_schema,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Generate the OpenAPI schema artifacts (YAML and JSON) "
+        "served by /api/schema/"
+    )
+
+    def handle(self, *args, **options):
+        for schema_format in RENDERERS:
+            path = artifact_path(schema_format)
+            path.parent.mkdir(parents=True, exist_ok=True)
+            # Artifacts of other code are never served again
+            for stale in path.parent.glob(f"schema-*.{schema_format}"):
+                if stale != path:
+                    stale.unlink()
+            path.write_bytes(generate_schema(schema_format))
+            self.stdout.write(self.style.SUCCESS(f"Wrote {path}"))
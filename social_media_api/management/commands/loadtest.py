@@ -0,0 +1,174 @@
+import asyncio
+import json
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import override_settings
+
+from social_media_api.loadtest import (
+    DEFAULT_MIX,
+    STREAMING_OPERATIONS,
+    ASGITransport,
+    HTTPTransport,
+    WSGITransport,
+    delete_users,
+    parse_mix,
+    prepare_users,
+    run_load,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Replay a mix of feed reads, like toggles, comments, "
+        "subscribes, user searches and live feed streams with "
+        "concurrent JWT-authenticated clients, in-process (ASGI/WSGI) "
+        "or against a running server. The load test users and "
+        "everything they wrote are deleted afterwards."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--target", choices=("asgi", "wsgi", "http"), default="asgi",
+        )
+        parser.add_argument(
+            "--url", default="http://127.0.0.1:8000",
+            help="Server address for --target http",
+        )
+        parser.add_argument("--concurrency", type=int, default=20)
+        parser.add_argument(
+            "--duration", type=float, default=None,
+            help="Seconds to run for (default: until --requests are sent)",
+        )
+        parser.add_argument("--requests", type=int, default=2000)
+        parser.add_argument(
+            "--mix", default=DEFAULT_MIX,
+            help=f"Operation weights, default: {DEFAULT_MIX}",
+        )
+        parser.add_argument("--users", type=int, default=50)
+        parser.add_argument(
+            "--follows", type=int, default=10,
+            help="Load test users each one follows",
+        )
+        parser.add_argument("--posts-per-user", type=int, default=5)
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument(
+            "--stream-seconds", type=float, default=5.0,
+            help="How long each live operation keeps its stream open",
+        )
+        parser.add_argument(
+            "--keep-users", action="store_true",
+            help=(
+                "Keep the load test users, their posts and follows "
+                "for the next run instead of deleting them"
+            ),
+        )
+        parser.add_argument(
+            "--no-throttle", action="store_true",
+            help="Disable DRF throttling for in-process targets",
+        )
+        parser.add_argument(
+            "--json", action="store_true",
+            help="Print the report as JSON",
+        )
+
+    def handle(self, *args, **options):
+        try:
+            mix = parse_mix(options["mix"])
+        except ValueError as error:
+            raise CommandError(error)
+        if options["target"] == "wsgi" and STREAMING_OPERATIONS & set(mix):
+            raise CommandError(
+                "The live feed is served over ASGI only, "
+                "use --target asgi or http"
+            )
+
+        if options["target"] == "http":
+            transport = HTTPTransport(options["url"])
+        elif options["target"] == "wsgi":
+            transport = WSGITransport()
+        else:
+            transport = ASGITransport()
+
+        try:
+            users = prepare_users(
+                options["users"],
+                options["follows"],
+                options["posts_per_user"],
+                options["seed"],
+            )
+            if not users:
+                raise CommandError("No load test users could be created")
+
+            rest_framework = dict(settings.REST_FRAMEWORK)
+            if options["no_throttle"]:
+                rest_framework["DEFAULT_THROTTLE_CLASSES"] = []
+            with override_settings(REST_FRAMEWORK=rest_framework):
+                stats, elapsed = asyncio.run(
+                    self.run(transport, users, mix, options)
+                )
+        finally:
+            if not options["keep_users"]:
+                delete_users()
+
+        report = {
+            endpoint: endpoint_stats.summary(elapsed)
+            for endpoint, endpoint_stats in sorted(stats.items())
+        }
+        if options["json"]:
+            self.stdout.write(json.dumps(
+                {"target": transport.name, "elapsed": elapsed, "endpoints": report},
+                indent=2,
+            ))
+        else:
+            self.write_report(transport.name, elapsed, report)
+
+    async def run(self, transport, users, mix, options):
+        # One thread per worker, so WSGI/HTTP requests really overlap
+        asyncio.get_running_loop().set_default_executor(
+            ThreadPoolExecutor(max_workers=options["concurrency"])
+        )
+        return await run_load(
+            transport,
+            users,
+            mix,
+            options["concurrency"],
+            duration=options["duration"],
+            total_requests=None if options["duration"] else options["requests"],
+            seed=options["seed"],
+            stream_seconds=options["stream_seconds"],
+        )
+
+    def write_report(self, target, elapsed, report):
+        total = sum(summary["requests"] for summary in report.values())
+        self.stdout.write(
+            f"target {target}, {total} requests in {elapsed:.2f}s "
+            f"({total / elapsed if elapsed else 0:.1f} req/s)\n"
+        )
+        self.stdout.write(
+            f"{'endpoint':<30} {'reqs':>6} {'req/s':>8} {'p50 ms':>8} "
+            f"{'p95 ms':>8} {'p99 ms':>8} {'errors':>7} {'429':>5} "
+            f"{'locked':>6}"
+        )
+        for endpoint, summary in report.items():
+            self.stdout.write(
+                f"{endpoint:<30} {summary['requests']:>6} "
+                f"{summary['throughput']:>8.1f} {summary['p50_ms']:>8.1f} "
+                f"{summary['p95_ms']:>8.1f} {summary['p99_ms']:>8.1f} "
+                f"{summary['error_rate']:>7.1%} {summary['throttled']:>5} "
+                f"{summary['locked']:>6}"
+            )
+        for endpoint, summary in report.items():
+            if summary["events"]:
+                self.stdout.write(
+                    f"{endpoint}: {summary['events']} events pushed "
+                    f"over {summary['requests']} streams"
+                )
+        locked = sum(summary["locked"] for summary in report.values())
+        if locked:
+            self.stdout.write(self.style.WARNING(
+                f"{locked} requests failed with 'database is locked': "
+                "SQLite serializes writers, lower --concurrency or "
+                "use a server database for this load"
+            ))
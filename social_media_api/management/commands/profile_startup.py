@@ -0,0 +1,147 @@
+import json
+import os
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+APP_READY_PROBE = """
+import time
+started = time.perf_counter()
+import django
+django.setup()
+print(time.perf_counter() - started)
+"""
+
+COLD_START_PROBES = {
+    "wsgi": "import social_media_api.wsgi",
+    "celery": (
+        "from social_media_api.celery import app\n"
+        "app.loader.import_default_modules()"
+    ),
+}
+
+
+def run_python(code, *flags):
+    return subprocess.run(
+        [sys.executable, *flags, "-c", code],
+        cwd=settings.BASE_DIR,
+        env={
+            **os.environ,
+            "DJANGO_SETTINGS_MODULE": os.environ.get(
+                "DJANGO_SETTINGS_MODULE", "social_media_api.settings"
+            ),
+        },
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+
+
+def parse_importtime(stderr):
+    """(module, self us, cumulative us) from ``-X importtime`` output"""
+    modules = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        self_us, cumulative_us, module = line[len("import time:"):].split("|")
+        modules.append((module.strip(), int(self_us), int(cumulative_us)))
+    return modules
+
+
+class Command(BaseCommand):
+    help = (
+        "Report import time per module and app-ready time of a fresh "
+        "process, or benchmark WSGI and Celery worker cold starts"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--top", type=int, default=25,
+            help="Number of slowest modules to show",
+        )
+        parser.add_argument(
+            "--benchmark", action="store_true",
+            help="Measure cold-start time of the WSGI app and Celery worker",
+        )
+        parser.add_argument("--runs", type=int, default=5)
+        parser.add_argument(
+            "--baseline",
+            help="JSON file with previous cold-start medians to compare to",
+        )
+        parser.add_argument(
+            "--save-baseline", action="store_true",
+            help="Write the measured medians to --baseline",
+        )
+        parser.add_argument(
+            "--tolerance", type=float, default=0.2,
+            help="Allowed slowdown over the baseline (0.2 = 20%%)",
+        )
+
+    def handle(self, *args, **options):
+        if options["benchmark"]:
+            self.benchmark(options)
+        else:
+            self.profile(options["top"])
+
+    def profile(self, top):
+        result = run_python(APP_READY_PROBE, "-X", "importtime")
+        modules = parse_importtime(result.stderr)
+        self.stdout.write(
+            f"{'self ms':>9} {'cumulative ms':>14}  module"
+        )
+        for module, self_us, cumulative_us in sorted(
+                modules, key=lambda item: item[1], reverse=True
+        )[:top]:
+            self.stdout.write(
+                f"{self_us / 1000:9.1f} {cumulative_us / 1000:14.1f}  {module}"
+            )
+        self.stdout.write(
+            f"\n{len(modules)} modules imported, "
+            f"{sum(item[1] for item in modules) / 1000:.1f} ms in imports"
+        )
+        self.stdout.write(
+            f"App registry ready in {float(result.stdout) * 1000:.1f} ms"
+        )
+
+    def benchmark(self, options):
+        medians = {}
+        for name, code in COLD_START_PROBES.items():
+            timings = []
+            for _ in range(options["runs"]):
+                timed = (
+                    "import time\nstarted = time.perf_counter()\n"
+                    f"{code}\nprint(time.perf_counter() - started)"
+                )
+                timings.append(float(run_python(timed).stdout))
+            medians[name] = statistics.median(timings)
+            self.stdout.write(
+                f"{name:<7} median {medians[name] * 1000:8.1f} ms "
+                f"(min {min(timings) * 1000:.1f}, "
+                f"max {max(timings) * 1000:.1f})"
+            )
+
+        if not options["baseline"]:
+            return
+        baseline_path = Path(options["baseline"])
+        if options["save_baseline"]:
+            baseline_path.write_text(json.dumps(medians, indent=2))
+            self.stdout.write(self.style.SUCCESS(f"Saved {baseline_path}"))
+            return
+
+        baseline = json.loads(baseline_path.read_text())
+        regressions = [
+            f"{name}: {medians[name] * 1000:.1f} ms "
+            f"vs {baseline[name] * 1000:.1f} ms"
+            for name in medians
+            if name in baseline
+            and medians[name] > baseline[name] * (1 + options["tolerance"])
+        ]
+        if regressions:
+            raise CommandError(
+                "Cold start regressed: " + "; ".join(regressions)
+            )
+        self.stdout.write(self.style.SUCCESS("No cold start regression"))
@@ -0,0 +1,80 @@
+from collections import defaultdict
+
+from django.core.management.base import BaseCommand, CommandError
+
+from social_media_api.slow_queries import read_records
+
+
+class Command(BaseCommand):
+    help = (
+        "Summarize the slow query log: top fingerprints by total "
+        "time and the N+1 suspects, with the views they came from"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--top", type=int, default=10)
+        parser.add_argument(
+            "--log", help="Log file (default: SLOW_QUERY_LOG_FILE)",
+        )
+        parser.add_argument(
+            "--plans", action="store_true",
+            help="Print the captured EXPLAIN plan of each query",
+        )
+
+    def handle(self, *args, **options):
+        slow = defaultdict(
+            lambda: {"count": 0, "total_ms": 0.0, "max_ms": 0.0,
+                     "views": set(), "plan": None, "sql": None}
+        )
+        suspects = defaultdict(
+            lambda: {"requests": 0, "max_count": 0, "views": set(), "sql": None}
+        )
+        try:
+            records = list(read_records(options["log"]))
+        except FileNotFoundError as error:
+            raise CommandError(
+                f"No slow query log: {error.filename} "
+                "(logging needs SLOW_QUERY_LOG=1)"
+            )
+
+        for record in records:
+            view = f"{record['view']}.{record['action'] or record['method']}"
+            if record["type"] == "slow":
+                entry = slow[record["fingerprint"]]
+                entry["count"] += 1
+                entry["total_ms"] += record["duration_ms"]
+                entry["max_ms"] = max(entry["max_ms"], record["duration_ms"])
+                entry["plan"] = entry["plan"] or record["plan"]
+            else:
+                entry = suspects[record["fingerprint"]]
+                entry["requests"] += 1
+                entry["max_count"] = max(entry["max_count"], record["count"])
+            entry["views"].add(view)
+            entry["sql"] = record["sql"]
+
+        self.stdout.write(self.style.MIGRATE_HEADING("Slowest queries"))
+        for fingerprint, entry in sorted(
+                slow.items(), key=lambda item: -item[1]["total_ms"]
+        )[:options["top"]]:
+            self.stdout.write(
+                f"{fingerprint} {entry['count']:>6}x "
+                f"total {entry['total_ms']:10.1f} ms "
+                f"avg {entry['total_ms'] / entry['count']:8.1f} ms "
+                f"max {entry['max_ms']:8.1f} ms  "
+                f"{', '.join(sorted(entry['views']))}"
+            )
+            self.stdout.write(f"    {entry['sql'][:300]}")
+            if options["plans"] and entry["plan"]:
+                for line in entry["plan"].splitlines():
+                    self.stdout.write(f"    | {line}")
+
+        self.stdout.write(self.style.MIGRATE_HEADING("N+1 suspects"))
+        for fingerprint, entry in sorted(
+                suspects.items(), key=lambda item: -item[1]["requests"]
+        )[:options["top"]]:
+            self.stdout.write(
+                f"{fingerprint} in {entry['requests']:>6} requests, "
+                f"up to {entry['max_count']} times  "
+                f"{', '.join(sorted(entry['views']))}"
+            )
+            self.stdout.write(f"    {entry['sql'][:300]}")
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from social_media_api.throttling import rejected_counts
+
+
+class Command(BaseCommand):
+    help = "Show the number of throttled (rejected) requests per scope"
+
+    def handle(self, *args, **options):
+        for scope, count in rejected_counts().items():
+            self.stdout.write(f"{scope:<10} {count}")
@@ -0,0 +1,71 @@
+import mimetypes
+import posixpath
+
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.http import (
+    FileResponse,
+    Http404,
+    HttpResponse,
+    HttpResponseNotModified,
+)
+from django.utils._os import safe_join
+from django.views.decorators.http import require_safe
+
+from social_media_api.storage import CONTENT_ADDRESSED_PREFIX
+
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+# Account exports written under MEDIA_ROOT before they moved to
+# PRIVATE_MEDIA_ROOT, never served publicly
+PRIVATE_PREFIXES = ("exports/",)
+
+
+@require_safe
+def serve_media(request, path):
+    """
+    Serve uploaded media. The file transfer itself is handed to
+    the front server with X-Accel-Redirect (nginx) or X-Sendfile
+    (Apache, lighttpd) when configured, Django only streams it as a
+    fallback. Content-addressed blobs never change, so they get
+    immutable long-lived cache headers and their hash as ETag.
+    """
+    path = posixpath.normpath(path).lstrip("/")
+    if path.startswith(PRIVATE_PREFIXES):
+        raise Http404("Media file not found")
+    try:
+        full_path = safe_join(settings.MEDIA_ROOT, path)
+    except SuspiciousFileOperation:
+        raise Http404("Media file not found")
+
+    immutable = path.startswith(CONTENT_ADDRESSED_PREFIX + "/")
+    etag = None
+    if immutable:
+        etag = f'"{posixpath.splitext(posixpath.basename(path))[0]}"'
+        if request.headers.get("If-None-Match") == etag:
+            response = HttpResponseNotModified()
+            response["ETag"] = etag
+            response["Cache-Control"] = IMMUTABLE_CACHE_CONTROL
+            return response
+
+    content_type, _ = mimetypes.guess_type(path)
+    content_type = content_type or "application/octet-stream"
+    if settings.MEDIA_ACCEL_REDIRECT_PREFIX:
+        response = HttpResponse(content_type=content_type)
+        response["X-Accel-Redirect"] = (
+            settings.MEDIA_ACCEL_REDIRECT_PREFIX.rstrip("/") + "/" + path
+        )
+    elif settings.MEDIA_USE_X_SENDFILE:
+        response = HttpResponse(content_type=content_type)
+        response["X-Sendfile"] = full_path
+    else:
+        try:
+            response = FileResponse(
+                open(full_path, "rb"), content_type=content_type
+            )
+        except (FileNotFoundError, IsADirectoryError):
+            raise Http404("Media file not found")
+
+    if immutable:
+        response["ETag"] = etag
+        response["Cache-Control"] = IMMUTABLE_CACHE_CONTROL
+    return response
@@ -0,0 +1,48 @@
+from django.db import connections, router
+from django.db.models import Value
+from django.db.models.constants import OnConflict
+
+
+def link(through, source_field, source_id, target_field, targets,
+         using=None):
+    """
+    Insert a ``through`` row from ``source_id`` to every object of
+    the ``targets`` queryset in a single INSERT ... SELECT, rows
+    that already exist are skipped. The targets are never loaded,
+    so their visibility rules live in the queryset, which must be
+    on the ``using`` database. Returns the number of rows inserted.
+    """
+    using = using or router.db_for_write(through)
+    connection = connections[using]
+    quote_name = connection.ops.quote_name
+    meta = through._meta
+    fields = [meta.get_field(target_field), meta.get_field(source_field)]
+
+    select_sql, params = (
+        targets.order_by()
+        .annotate(link_source=Value(source_id))
+        .values_list("pk", "link_source")
+        .query.get_compiler(using)
+        .as_sql()
+    )
+    sql = "%s %s (%s) %s %s" % (
+        connection.ops.insert_statement(on_conflict=OnConflict.IGNORE),
+        quote_name(meta.db_table),
+        ", ".join(quote_name(field.column) for field in fields),
+        select_sql,
+        connection.ops.on_conflict_suffix_sql(
+            fields, OnConflict.IGNORE, None, None
+        ),
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return cursor.rowcount
+
+
+def unlink(through, source_field, source_id, target_field, target_id,
+           using=None):
+    """Delete one ``through`` row, returns whether it existed"""
+    deleted = through.objects.filter(
+        **{f"{source_field}_id": source_id, f"{target_field}_id": target_id}
+    )._raw_delete(using or router.db_for_write(through))
+    return bool(deleted)
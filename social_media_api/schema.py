@@ -0,0 +1,125 @@
+import functools
+import gzip
+import hashlib
+import threading
+from pathlib import Path
+
+from django.apps import apps
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseNotModified
+from django.views.decorators.http import require_safe
+from drf_spectacular.generators import SchemaGenerator
+from drf_spectacular.renderers import (
+    OpenApiJsonRenderer,
+    OpenApiYamlRenderer,
+)
+
+RENDERERS = {
+    "yaml": OpenApiYamlRenderer,
+    "json": OpenApiJsonRenderer,
+}
+
+
+class SchemaArtifact:
+    """One rendered schema format, kept in memory with its gzip variant."""
+
+    def __init__(self, schema_format, body):
+        self.content_type = RENDERERS[schema_format].media_type
+        self.body = body
+        self.gzip_body = gzip.compress(body, mtime=0)
+        self.etag = f'"{hashlib.sha256(body).hexdigest()[:32]}"'
+
+
+def generate_schema(schema_format):
+    """Render the schema from the live viewsets and serializers."""
+    schema = SchemaGenerator().get_schema(request=None, public=True)
+    renderer = RENDERERS[schema_format]()
+    return renderer.render(schema, renderer_context={})
+
+
+@functools.cache
+def source_fingerprint():
+    """
+    Hash of the Python sources of the project apps, the schema
+    version string does not change with every API change
+    """
+    digest = hashlib.sha256()
+    base_dir = Path(settings.BASE_DIR).resolve()
+    for app_config in apps.get_app_configs():
+        app_path = Path(app_config.path).resolve()
+        if not app_path.is_relative_to(base_dir):
+            continue
+        for path in sorted(app_path.rglob("*.py")):
+            digest.update(str(path.relative_to(base_dir)).encode())
+            digest.update(path.read_bytes())
+    return digest.hexdigest()[:16]
+
+
+def artifact_path(schema_format):
+    """
+    Artifacts are keyed by the code they were built from, one
+    built from other code is never served
+    """
+    version = settings.SPECTACULAR_SETTINGS["VERSION"]
+    return Path(settings.SCHEMA_ARTIFACT_DIR) / (
+        f"schema-{version}-{source_fingerprint()}.{schema_format}"
+    )
+
+
+_artifacts = {}
+_lock = threading.Lock()
+
+
+def get_artifact(schema_format):
+    """
+    Load the artifact written by ``manage.py build_schema``, or
+    generate it once per process when there is none
+    """
+    artifact = _artifacts.get(schema_format)
+    if artifact is None:
+        with _lock:
+            artifact = _artifacts.get(schema_format)
+            if artifact is None:
+                path = artifact_path(schema_format)
+                if path.exists():
+                    body = path.read_bytes()
+                else:
+                    body = generate_schema(schema_format)
+                artifact = SchemaArtifact(schema_format, body)
+                _artifacts[schema_format] = artifact
+    return artifact
+
+
+def negotiate_format(request):
+    requested = request.GET.get("format")
+    if requested in RENDERERS:
+        return requested
+    if "json" in request.headers.get("Accept", ""):
+        return "json"
+    return "yaml"
+
+
+@require_safe
+def schema_view(request):
+    """
+    OpenApi3 schema served from memory. Format is chosen with
+    ``?format=json|yaml`` or the Accept header (YAML by default).
+    """
+    artifact = get_artifact(negotiate_format(request))
+    if request.headers.get("If-None-Match") == artifact.etag:
+        response = HttpResponseNotModified()
+    elif "gzip" in request.headers.get("Accept-Encoding", ""):
+        response = HttpResponse(
+            artifact.gzip_body, content_type=artifact.content_type
+        )
+        response["Content-Encoding"] = "gzip"
+    else:
+        response = HttpResponse(
+            artifact.body, content_type=artifact.content_type
+        )
+    response["ETag"] = artifact.etag
+    response["Vary"] = "Accept, Accept-Encoding"
+    response["Cache-Control"] = (
+        f"public, max-age={settings.SCHEMA_CACHE_MAX_AGE}"
+    )
+    return response
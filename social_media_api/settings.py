@@ -12,6 +12,8 @@ https://docs.djangoproject.com/en/4.2/ref/settings/
 import os
 from datetime import timedelta
 from pathlib import Path
+
+from celery.schedules import crontab
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -46,8 +48,10 @@ INSTALLED_APPS = [
     "debug_toolbar",
     "rest_framework_simplejwt.token_blacklist",
     "drf_spectacular",
+    "social_media_api",
     "posts",
     "user",
+    "notifications",
 ]
 
 MIDDLEWARE = [
@@ -59,6 +63,7 @@ MIDDLEWARE = [
     "django.contrib.auth.middleware.AuthenticationMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
+    "social_media_api.slow_queries.SlowQueryMiddleware",
 ]
 
 ROOT_URLCONF = "social_media_api.urls"
@@ -89,9 +94,49 @@ DATABASES = {
     "default": {
         "ENGINE": "django.db.backends.sqlite3",
         "NAME": BASE_DIR / "db.sqlite3",
+        # Test databases are files rather than shared-cache memory,
+        # where concurrent requests fail at once on a locked table
+        # instead of waiting out the busy timeout
+        "TEST": {"NAME": BASE_DIR / "test_db.sqlite3"},
     }
 }
 
+# Posts, comments, likes and tags partitioned by author across
+# POST_SHARD_COUNT databases (posts.sharding), off by default.
+# Create them with `manage.py setup_shards` after `migrate`.
+POST_SHARD_COUNT = int(os.getenv("POST_SHARD_COUNT", 0))
+POST_SHARDS = [f"posts_{index}" for index in range(POST_SHARD_COUNT)]
+# Two shard databases are declared with sharding off too, unused
+# but for the sharded tests (posts.tests.ShardedPostTests)
+for index in range(max(POST_SHARD_COUNT, 2)):
+    DATABASES[f"posts_{index}"] = {
+        "ENGINE": "django.db.backends.sqlite3",
+        "NAME": BASE_DIR / f"db_posts_{index}.sqlite3",
+        "TEST": {"NAME": BASE_DIR / f"test_db_posts_{index}.sqlite3"},
+    }
+if POST_SHARDS:
+    DATABASE_ROUTERS = ["posts.sharding.PostShardRouter"]
+
+
+# Cache
+# Throttling counters must be shared between worker processes,
+# set CACHE_REDIS_URL to use Redis instead of the per-process cache
+# (development only, settings_production refuses to start without).
+
+if os.getenv("CACHE_REDIS_URL"):
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": os.getenv("CACHE_REDIS_URL"),
+        }
+    }
+else:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        }
+    }
+
 
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
@@ -132,6 +177,14 @@ STATIC_URL = "static/"
 
 MEDIA_ROOT = BASE_DIR / "media"
 MEDIA_URL = "/media/"
+# Files only handed out by authenticated views (account exports)
+PRIVATE_MEDIA_ROOT = BASE_DIR / "private_media"
+
+# Hand media transfers to the front server: set the internal nginx
+# location (e.g. "/protected-media/") for X-Accel-Redirect, or enable
+# X-Sendfile for Apache/lighttpd. Django streams files itself otherwise.
+MEDIA_ACCEL_REDIRECT_PREFIX = os.getenv("MEDIA_ACCEL_REDIRECT_PREFIX", "")
+MEDIA_USE_X_SENDFILE = os.getenv("MEDIA_USE_X_SENDFILE") == "1"
 
 # Default primary key field type
 # https://docs.djangoproject.com/en/4.2/ref/settings/#default-auto-field
@@ -143,8 +196,23 @@ REST_FRAMEWORK = {
         "rest_framework_simplejwt.authentication.JWTAuthentication",
     ),
     "DEFAULT_SCHEMA_CLASS": "drf_spectacular.openapi.AutoSchema",
+    "DEFAULT_THROTTLE_CLASSES": (
+        "social_media_api.throttling.UserRateThrottle",
+        "social_media_api.throttling.IPRateThrottle",
+        "social_media_api.throttling.ScopedRateThrottle",
+    ),
+    "DEFAULT_THROTTLE_RATES": {
+        "user": "3000/hour",
+        "ip": "6000/hour",
+        "likes": "60/min",
+        "follows": "30/min",
+        "login": "10/min",
+        "search": "60/min",
+    },
 }
 
+THROTTLE_CACHE_ALIAS = "default"
+
 SIMPLE_JWT = {
     "ACCESS_TOKEN_LIFETIME": timedelta(days=99999),
     "REFRESH_TOKEN_LIFETIME": timedelta(days=999999),
@@ -162,9 +230,111 @@ SPECTACULAR_SETTINGS = {
     "SORT_OPERATION_PARAMETERS": False,
 }
 
+# Written by `manage.py build_schema`, served from memory by /api/schema/
+SCHEMA_ARTIFACT_DIR = BASE_DIR / "schema"
+SCHEMA_CACHE_MAX_AGE = 300
+
 # Celery Configuration Options
 CELERY_BROKER_URL = os.getenv("CELERY_BROKER_URL")
 CELERY_RESULT_BACKEND = os.getenv("CELERY_RESULT_BACKEND")
 CELERY_TIMEZONE = "Europe/Kyiv"
 CELERY_TASK_TRACK_STARTED = True
 CELERY_TASK_TIME_LIMIT = 30 * 60
+
+CELERY_BEAT_SCHEDULE = {
+    "compute-follow-suggestions": {
+        "task": "user.tasks.compute_follow_suggestions",
+        "schedule": crontab(hour=3, minute=0),
+    },
+    "aggregate-activities": {
+        "task": "notifications.tasks.aggregate_activities",
+        "schedule": timedelta(seconds=15),
+    },
+    "publish-scheduled-posts": {
+        "task": "posts.tasks.publish_scheduled_posts",
+        "schedule": timedelta(seconds=30),
+    },
+    "archive-posts": {
+        "task": "posts.tasks.archive_posts",
+        "schedule": crontab(hour=4, minute=0),
+    },
+    "refresh-public-feed-snapshot": {
+        "task": "posts.tasks.refresh_public_feed_snapshot",
+        "schedule": timedelta(seconds=60),
+    },
+    "collect-media-blobs": {
+        "task": "social_media_api.tasks.collect_media_blobs",
+        "schedule": crontab(hour=5, minute=0),
+    },
+}
+
+# Friends-of-friends follow suggestions
+FOLLOW_SUGGESTIONS_TOP_K = 20
+FOLLOW_SUGGESTIONS_BATCH_SIZE = 500
+FOLLOW_SUGGESTIONS_CHUNK_SIZE = 10000
+FOLLOW_SUGGESTIONS_MAX_FANOUT = 500
+
+# Activity notifications
+NOTIFICATIONS_BATCH_SIZE = 1000
+
+# Scheduled post publishing
+POST_PUBLISH_BATCH_SIZE = 500
+
+# Live feed (Server-Sent Events, ASGI only). Dropped clients are not
+# noticed, their slot is kept until LIVE_FEED_MAX_DURATION runs out or
+# the same user connects again; EventSource reconnects by itself.
+LIVE_FEED_BROKER = "posts.live.LocalBroker"
+LIVE_FEED_MAX_CONNECTIONS = 1000
+LIVE_FEED_MAX_CONNECTIONS_PER_USER = 3
+LIVE_FEED_MAX_WATCHED_POSTS = 50
+LIVE_FEED_QUEUE_SIZE = 100
+LIVE_FEED_KEEPALIVE = 15
+LIVE_FEED_MAX_DURATION = 60
+LIVE_FEED_RETRY_MS = 3000
+
+# Account data export
+ACCOUNT_EXPORT_CHUNK_SIZE = 2000
+
+# NDJSON bulk import
+IMPORT_BATCH_SIZE = 1000
+IMPORT_MAX_REPORTED_ERRORS = 100
+
+# Hot/cold post storage
+POST_ARCHIVE_AFTER_DAYS = 365
+POST_ARCHIVE_BATCH_SIZE = 500
+
+# Batched purge of soft-deleted accounts and posts
+PURGE_BATCH_SIZE = 500
+PURGE_BATCH_PAUSE = 0.05
+
+# Cached JSON fragments of serialized posts (posts.fragments)
+POST_FRAGMENT_CACHE_ALIAS = "default"
+POST_FRAGMENT_CACHE_TIMEOUT = 24 * 60 * 60
+# Hit/miss counters for `manage.py fragment_cache_stats`, two more
+# cache writes per list request
+POST_FRAGMENT_CACHE_STATS = os.getenv("POST_FRAGMENT_CACHE_STATS") == "1"
+
+# Public feed snapshot served to anonymous users (posts.snapshots),
+# refreshed every minute by Celery beat, kept in the fragment cache;
+# until the first refresh they are served from the database
+PUBLIC_FEED_SNAPSHOT_PAGES = 5
+PUBLIC_FEED_SNAPSHOT_TAGS = 20
+PUBLIC_FEED_SNAPSHOT_TIMEOUT = 5 * 60
+
+# Threaded comments (posts.threads): the deepest reply level, how
+# much of every thread a page of top-level comments previews and
+# the most replies one thread request returns
+COMMENT_MAX_DEPTH = 16
+COMMENT_THREAD_PREVIEW_DEPTH = 2
+COMMENT_THREAD_PREVIEW_REPLIES = 5
+COMMENT_THREAD_MAX_REPLIES = 200
+
+# ?ids= batch retrieval on the post and user lists
+BATCH_RETRIEVE_MAX_IDS = 100
+
+# Slow query log (social_media_api.slow_queries), JSON lines, off
+# unless SLOW_QUERY_LOG=1: every query of a request is timed
+SLOW_QUERY_LOG_ENABLED = os.getenv("SLOW_QUERY_LOG") == "1"
+SLOW_QUERY_THRESHOLD_MS = 100
+SLOW_QUERY_N_PLUS_ONE_THRESHOLD = 10
+SLOW_QUERY_LOG_FILE = BASE_DIR / "slow_queries.log"
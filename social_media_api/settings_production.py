@@ -0,0 +1,54 @@
+"""
+Production settings for social_media_api project.
+
+Use with DJANGO_SETTINGS_MODULE=social_media_api.settings_production.
+Drops the debug toolbar and the browsable API, turns DEBUG off (which
+otherwise keeps every executed SQL query in memory) and reuses
+database connections between requests.
+"""
+import os
+
+from django.core.exceptions import ImproperlyConfigured
+
+from social_media_api.settings import *  # noqa: F401,F403
+from social_media_api.settings import (
+    DATABASES,
+    INSTALLED_APPS,
+    MIDDLEWARE,
+    REST_FRAMEWORK,
+)
+
+DEBUG = False
+
+# Throttling counters kept in a per-process cache would multiply
+# every limit by the number of workers
+if not os.getenv("CACHE_REDIS_URL"):
+    raise ImproperlyConfigured(
+        "Set CACHE_REDIS_URL, rate limits need a cache shared by "
+        "every worker process"
+    )
+
+ALLOWED_HOSTS = [
+    host for host in os.getenv("ALLOWED_HOSTS", "").split(",") if host
+]
+
+INSTALLED_APPS = [
+    app for app in INSTALLED_APPS if app != "debug_toolbar"
+]
+
+MIDDLEWARE = [
+    middleware for middleware in MIDDLEWARE
+    if not middleware.startswith("debug_toolbar.")
+]
+
+DATABASES = {
+    alias: {**database, "CONN_MAX_AGE": int(os.getenv("CONN_MAX_AGE", 60))}
+    for alias, database in DATABASES.items()
+}
+
+REST_FRAMEWORK = {
+    **REST_FRAMEWORK,
+    "DEFAULT_RENDERER_CLASSES": (
+        "rest_framework.renderers.JSONRenderer",
+    ),
+}
@@ -0,0 +1,191 @@
+import hashlib
+import json
+import logging
+import re
+import threading
+import time
+from collections import Counter
+from contextlib import ExitStack
+from functools import lru_cache
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+_STRING_PATTERN = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_PATTERN = re.compile(r"\b\d+(?:\.\d+)?\b")
+_IN_LIST_PATTERN = re.compile(r"\bIN\s*\((?:\s*(?:%s|\?)\s*,?)+\)", re.IGNORECASE)
+_WHITESPACE_PATTERN = re.compile(r"\s+")
+
+_log_lock = threading.Lock()
+_explained = set()
+_explained_lock = threading.Lock()
+
+
+@lru_cache(maxsize=2048)
+def fingerprint(sql):
+    """
+    SQL with literals replaced by ``?`` and IN lists of any
+    length collapsed, so queries differing only by their
+    parameters share one fingerprint
+    """
+    sql = _STRING_PATTERN.sub("?", sql)
+    sql = _NUMBER_PATTERN.sub("?", sql)
+    sql = _IN_LIST_PATTERN.sub("IN (...)", sql)
+    return _WHITESPACE_PATTERN.sub(" ", sql).strip()
+
+
+def fingerprint_id(normalized_sql):
+    return hashlib.sha1(normalized_sql.encode()).hexdigest()[:12]
+
+
+def write_record(record):
+    """Append one JSON line to SLOW_QUERY_LOG_FILE."""
+    line = json.dumps(record, default=str)
+    with _log_lock:
+        with open(settings.SLOW_QUERY_LOG_FILE, "a") as log_file:
+            log_file.write(line + "\n")
+
+
+def read_records(path=None):
+    with open(path or settings.SLOW_QUERY_LOG_FILE) as log_file:
+        for line in log_file:
+            if line.strip():
+                yield json.loads(line)
+
+
+def _first_occurrence(normalized_sql):
+    with _explained_lock:
+        if normalized_sql in _explained:
+            return False
+        _explained.add(normalized_sql)
+        return True
+
+
+def _view_and_action(request):
+    match = getattr(request, "resolver_match", None)
+    if match is None:
+        return None, None
+    view = getattr(match.func, "cls", None) or match.func
+    actions = getattr(match.func, "actions", None) or {}
+    return (
+        f"{view.__module__}.{view.__qualname__}",
+        actions.get(request.method.lower()),
+    )
+
+
+class QueryRecorder:
+    """
+    ``execute_wrapper`` of every database for one request: times
+    every query, logs the ones over the threshold (explaining each
+    fingerprint once per process) and counts repeats for N+1
+    detection
+    """
+
+    def __init__(self, request):
+        self.request = request
+        self.counts = Counter()
+        self.examples = {}
+        self.explaining = False
+
+    def __call__(self, execute, sql, params, many, context):
+        if self.explaining:
+            return execute(sql, params, many, context)
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duration = time.perf_counter() - started
+            normalized_sql = fingerprint(sql)
+            self.counts[normalized_sql] += 1
+            self.examples.setdefault(normalized_sql, sql)
+            if duration * 1000 >= settings.SLOW_QUERY_THRESHOLD_MS:
+                self.log_slow_query(
+                    sql, params, many, normalized_sql, duration, context
+                )
+
+    def explain(self, sql, params, context):
+        database = context["connection"]
+        self.explaining = True
+        try:
+            with database.cursor() as cursor:
+                cursor.execute(
+                    f"{database.ops.explain_query_prefix()} {sql}", params
+                )
+                return "\n".join(str(row[-1]) for row in cursor.fetchall())
+        except Exception as error:
+            return f"EXPLAIN failed: {error}"
+        finally:
+            self.explaining = False
+
+    def record(self, record_type, normalized_sql, **fields):
+        view, action = _view_and_action(self.request)
+        return {
+            "type": record_type,
+            "time": timezone.now().isoformat(),
+            "method": self.request.method,
+            "path": self.request.path,
+            "view": view,
+            "action": action,
+            "fingerprint": fingerprint_id(normalized_sql),
+            "sql": normalized_sql,
+            **fields,
+        }
+
+    def log_slow_query(self, sql, params, many, normalized_sql, duration, context):
+        plan = None
+        if (
+                not many
+                and sql.lstrip()[:6].upper() in ("SELECT", "WITH")
+                and _first_occurrence(normalized_sql)
+        ):
+            plan = self.explain(sql, params, context)
+        record = self.record(
+            "slow", normalized_sql, duration_ms=round(duration * 1000, 3),
+            database=context["connection"].alias, plan=plan,
+        )
+        logger.warning(
+            "Slow query (%.1f ms) in %s %s: %s",
+            record["duration_ms"], record["view"], record["action"],
+            normalized_sql,
+        )
+        write_record(record)
+
+    def finish(self):
+        """Log the fingerprints repeated often enough to be N+1 suspects"""
+        for normalized_sql, count in self.counts.items():
+            if count < settings.SLOW_QUERY_N_PLUS_ONE_THRESHOLD:
+                continue
+            record = self.record(
+                "n_plus_one", normalized_sql, count=count,
+                example=self.examples[normalized_sql],
+            )
+            logger.warning(
+                "N+1 suspect: %d identical queries in %s %s: %s",
+                count, record["view"], record["action"], normalized_sql,
+            )
+            write_record(record)
+
+
+class SlowQueryMiddleware:
+    """
+    Install a QueryRecorder on every database (post shards
+    included) around every request, with SLOW_QUERY_LOG_ENABLED
+    """
+
+    def __init__(self, get_response):
+        if not settings.SLOW_QUERY_LOG_ENABLED:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        recorder = QueryRecorder(request)
+        with ExitStack() as stack:
+            for database in connections.all():
+                stack.enter_context(database.execute_wrapper(recorder))
+            response = self.get_response(request)
+        recorder.finish()
+        return response
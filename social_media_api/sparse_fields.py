@@ -0,0 +1,52 @@
+from rest_framework import serializers
+from rest_framework.permissions import SAFE_METHODS
+
+
+def _list_param(request, name):
+    value = request.query_params.get(name)
+    if value is None:
+        return None
+    return {item.strip() for item in value.split(",") if item.strip()}
+
+
+class SparseFieldsetsMixin:
+    """
+    Prune the fields of a top-level serializer on read requests:
+
+    - ``?fields=id,title`` keeps only the listed fields
+    - ``?expand=likes`` keeps only the listed ``Meta.expandable_fields``
+      (the heavy nested ones), a field named in ``fields`` is kept too
+
+    Views call ``selected_fields`` with the same request to skip
+    the joins, prefetches and annotations of pruned fields.
+    """
+
+    @classmethod
+    def selected_fields(cls, request):
+        field_names = set(cls.Meta.fields)
+        if request is None or request.method not in SAFE_METHODS:
+            return field_names
+        fields = _list_param(request, "fields")
+        expand = _list_param(request, "expand")
+        if fields is not None:
+            field_names &= fields
+        if expand is not None:
+            field_names -= (
+                set(getattr(cls.Meta, "expandable_fields", ()))
+                - expand
+                - (fields or set())
+            )
+        return field_names
+
+    def get_fields(self):
+        fields = super().get_fields()
+        root = self.parent
+        if isinstance(root, serializers.ListSerializer):
+            root = root.parent
+        if root is not None:
+            return fields
+        selected = self.selected_fields(self.context.get("request"))
+        return {
+            name: field for name, field in fields.items()
+            if name in selected
+        }
@@ -0,0 +1,119 @@
+import hashlib
+import os
+import posixpath
+from datetime import timedelta
+
+from django.apps import apps
+from django.conf import settings
+from django.core.files.storage import FileSystemStorage
+from django.db import models
+from django.utils import timezone
+from django.utils.deconstruct import deconstructible
+from django.utils.functional import cached_property
+
+CONTENT_ADDRESSED_PREFIX = "cas"
+
+
+@deconstructible
+class ContentAddressedStorage(FileSystemStorage):
+    """
+    Store files under the SHA-256 of their content, so identical
+    uploads share one blob and a stored name never changes meaning
+    (which is what makes immutable cache headers safe). The name
+    passed by ``upload_to`` only contributes its extension.
+    """
+
+    def blob_name(self, digest, extension):
+        return posixpath.join(
+            CONTENT_ADDRESSED_PREFIX,
+            digest[:2],
+            digest[2:4],
+            f"{digest}{extension.lower()}",
+        )
+
+    def _save(self, name, content):
+        digest = hashlib.sha256()
+        for chunk in content.chunks():
+            digest.update(chunk)
+        name = self.blob_name(
+            digest.hexdigest(), os.path.splitext(name)[1]
+        )
+        if self.exists(name):
+            return name
+        content.seek(0)
+        return super()._save(name, content)
+
+
+@deconstructible
+class PrivateStorage(FileSystemStorage):
+    """
+    Files under PRIVATE_MEDIA_ROOT, outside of MEDIA_ROOT, so
+    the public media URL never serves them. They are handed out
+    by views that check who asks for them.
+    """
+
+    @cached_property
+    def base_location(self):
+        return self._value_or_setting(
+            self._location, settings.PRIVATE_MEDIA_ROOT
+        )
+
+    def _clear_cached_properties(self, setting, **kwargs):
+        super()._clear_cached_properties(setting, **kwargs)
+        if setting == "PRIVATE_MEDIA_ROOT":
+            self.__dict__.pop("base_location", None)
+            self.__dict__.pop("location", None)
+
+
+def content_addressed_fields():
+    """Every file field across installed models stored by hash."""
+    return [
+        (model, field)
+        for model in apps.get_models()
+        for field in model._meta.fields
+        if isinstance(field, models.FileField)
+        and isinstance(field.storage, ContentAddressedStorage)
+    ]
+
+
+def referenced_blobs():
+    names = set()
+    for model, field in content_addressed_fields():
+        names.update(
+            model._base_manager.exclude(**{field.name: ""})
+            .exclude(**{f"{field.name}__isnull": True})
+            .values_list(field.name, flat=True)
+            .iterator()
+        )
+    return names
+
+
+def _walk(storage, directory):
+    directories, files = storage.listdir(directory)
+    for file_name in files:
+        yield posixpath.join(directory, file_name)
+    for name in directories:
+        yield from _walk(storage, posixpath.join(directory, name))
+
+
+def collect_unreferenced_blobs(storage, grace_period=timedelta(hours=1)):
+    """
+    Delete blobs no model field points to anymore. Blobs younger
+    than ``grace_period`` are kept, their row may not be saved yet.
+    Returns the deleted names.
+    """
+    if not storage.exists(CONTENT_ADDRESSED_PREFIX):
+        return []
+    referenced = referenced_blobs()
+    cutoff = timezone.now() - grace_period
+    deleted = []
+    for name in _walk(storage, CONTENT_ADDRESSED_PREFIX):
+        if name in referenced or storage.get_modified_time(name) > cutoff:
+            continue
+        storage.delete(name)
+        deleted.append(name)
+    return deleted
+
+
+content_addressed_storage = ContentAddressedStorage()
+private_storage = PrivateStorage()
@@ -0,0 +1,12 @@
+from celery import shared_task
+
+from social_media_api.storage import (
+    collect_unreferenced_blobs,
+    content_addressed_storage,
+)
+
+
+@shared_task
+def collect_media_blobs() -> int:
+    """Garbage-collect content-addressed blobs nothing refers to."""
+    return len(collect_unreferenced_blobs(content_addressed_storage))
@@ -0,0 +1,247 @@
+import asyncio
+import gzip
+import io
+import json
+import tempfile
+import threading
+from pathlib import Path
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+
+from posts.models import Comment, Post
+from posts.tests import unsharded
+from social_media_api import schema
+from social_media_api.slow_queries import read_records
+from social_media_api.loadtest import (
+    ASGITransport,
+    delete_users,
+    prepare_users,
+    run_load,
+)
+from social_media_api.throttling import SlidingWindowRateThrottle
+
+
+class PrecomputedSchemaTests(TestCase):
+    def setUp(self):
+        schema._artifacts.clear()
+        artifact_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(artifact_dir.cleanup)
+        override = override_settings(SCHEMA_ARTIFACT_DIR=artifact_dir.name)
+        override.enable()
+        self.addCleanup(override.disable)
+        call_command("build_schema", stdout=io.StringIO())
+
+    def test_served_schema_matches_live_generation(self):
+        response = self.client.get(reverse("schema"), {"format": "json"})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            response.content, schema.artifact_path("json").read_bytes()
+        )
+        self.assertEqual(
+            json.loads(response.content),
+            json.loads(schema.generate_schema("json")),
+        )
+
+    def test_artifact_built_from_other_code_is_not_served(self):
+        with mock.patch.object(
+                schema, "source_fingerprint", return_value="0" * 16
+        ):
+            schema.artifact_path("json").write_text('{"stale": true}')
+        stale = Path(settings.SCHEMA_ARTIFACT_DIR) / "schema-1.0.0.json"
+        stale.write_text('{"stale": true}')
+        schema.artifact_path("json").unlink()
+
+        response = self.client.get(reverse("schema"), {"format": "json"})
+
+        self.assertEqual(
+            json.loads(response.content),
+            json.loads(schema.generate_schema("json")),
+        )
+
+    def test_not_modified_when_etag_matches(self):
+        response = self.client.get(reverse("schema"))
+
+        response = self.client.get(
+            reverse("schema"), HTTP_IF_NONE_MATCH=response["ETag"]
+        )
+
+        self.assertEqual(response.status_code, 304)
+
+    def test_gzip_variant(self):
+        response = self.client.get(
+            reverse("schema"), HTTP_ACCEPT_ENCODING="gzip"
+        )
+
+        self.assertEqual(response["Content-Encoding"], "gzip")
+        self.assertEqual(
+            gzip.decompress(response.content),
+            schema.get_artifact("yaml").body,
+        )
+
+
+class FixedKeyThrottle(SlidingWindowRateThrottle):
+    scope = "test"
+    rate = "5/min"
+
+    def get_cache_key(self, request, view):
+        return "throttle:test:client"
+
+
+class SlidingWindowRateThrottleTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.now = 600.0
+
+    def allow(self):
+        throttle = FixedKeyThrottle()
+        throttle.timer = lambda: self.now
+        return throttle.allow_request(None, None)
+
+    def test_rejected_requests_are_not_counted(self):
+        self.assertEqual(
+            [self.allow() for _ in range(7)], [True] * 5 + [False] * 2
+        )
+
+        # Half of the previous window still counts: 5 * 0.5 + 0
+        self.now += 90
+        self.assertEqual(
+            [self.allow() for _ in range(3)], [True, True, False]
+        )
+
+    def test_concurrent_requests_cannot_exceed_the_limit(self):
+        barrier = threading.Barrier(20)
+        allowed = []
+
+        def request():
+            barrier.wait()
+            allowed.append(self.allow())
+
+        threads = [threading.Thread(target=request) for _ in range(20)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(allowed.count(True), 5)
+
+
+class ServeMediaTests(TestCase):
+    def setUp(self):
+        media_root = tempfile.TemporaryDirectory()
+        self.addCleanup(media_root.cleanup)
+        settings_override = override_settings(
+            MEDIA_ROOT=media_root.name,
+            MEDIA_ACCEL_REDIRECT_PREFIX="",
+            MEDIA_USE_X_SENDFILE=False,
+        )
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        root = Path(media_root.name)
+        (root / "cas" / "ab" / "cd").mkdir(parents=True)
+        (root / "cas" / "ab" / "cd" / "abcd.png").write_bytes(b"blob")
+        (root / "exports" / "1").mkdir(parents=True)
+        (root / "exports" / "1" / "export.ndjson.gz").write_bytes(b"private")
+
+    def get(self, path, **headers):
+        return self.client.get(f"/media/{path}", **headers)
+
+    def test_blobs_are_served_immutable(self):
+        response = self.get("cas/ab/cd/abcd.png")
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b"".join(response.streaming_content), b"blob")
+        self.assertIn("immutable", response["Cache-Control"])
+        response = self.get(
+            "cas/ab/cd/abcd.png", HTTP_IF_NONE_MATCH=response["ETag"]
+        )
+        self.assertEqual(response.status_code, 304)
+
+    def test_paths_outside_media_root_are_not_found(self):
+        self.assertEqual(self.get("../settings.py").status_code, 404)
+        self.assertEqual(self.get("cas/../../x").status_code, 404)
+
+    def test_exports_are_not_served(self):
+        self.assertEqual(
+            self.get("exports/1/export.ndjson.gz").status_code, 404
+        )
+        self.assertEqual(
+            self.get("cas/../exports/1/export.ndjson.gz").status_code, 404
+        )
+
+
+@unsharded
+class LoadTestTests(TransactionTestCase):
+    def test_users_are_deleted_with_their_content(self):
+        users = prepare_users(3, follows=1, posts_per_user=2, seed=0)
+        post = Post.objects.get(id=users[0].visible_post_ids[0])
+        Comment.objects.create(post=post, user_id=users[1].id, text="Hi")
+        post.likes.add(users[1].id)
+        other = get_user_model().objects.create_user(
+            "other@example.com", "pass12345"
+        )
+
+        delete_users()
+
+        self.assertEqual(list(get_user_model().objects.all()), [other])
+        self.assertFalse(Post.objects.exists())
+        self.assertFalse(Comment.objects.exists())
+
+    @override_settings(ALLOWED_HOSTS=["localhost"])
+    def test_live_streams_are_held_and_measured(self):
+        cache.clear()
+        users = prepare_users(2, follows=1, posts_per_user=1, seed=0)
+
+        stats, _ = asyncio.run(
+            run_load(
+                ASGITransport(),
+                users,
+                {"live": 1},
+                concurrency=2,
+                total_requests=2,
+                stream_seconds=0.2,
+            )
+        )
+
+        self.assertEqual(
+            dict(stats["GET /posts/live/ (stream)"].statuses), {200: 2}
+        )
+
+
+@unsharded
+class SlowQueryLogTests(TestCase):
+    def setUp(self):
+        log_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(log_dir.cleanup)
+        self.log_file = Path(log_dir.name) / "slow_queries.log"
+        get_user_model().objects.create_user("user@example.com", "pass12345")
+
+    def test_off_by_default(self):
+        with override_settings(SLOW_QUERY_LOG_FILE=self.log_file):
+            self.client.get("/api/users/users/")
+
+        self.assertFalse(self.log_file.exists())
+
+    def test_slow_queries_and_repeats_are_logged(self):
+        with override_settings(
+                SLOW_QUERY_LOG_ENABLED=True,
+                SLOW_QUERY_LOG_FILE=self.log_file,
+                SLOW_QUERY_THRESHOLD_MS=0,
+                SLOW_QUERY_N_PLUS_ONE_THRESHOLD=1,
+        ), self.assertLogs("social_media_api.slow_queries", "WARNING"):
+            self.client.get("/api/users/users/")
+
+        records = list(read_records(self.log_file))
+        slow = [record for record in records if record["type"] == "slow"]
+        self.assertTrue(slow)
+        self.assertEqual({record["database"] for record in slow}, {"default"})
+        self.assertTrue(slow[0]["plan"])
+        self.assertIn(
+            "n_plus_one", {record["type"] for record in records}
+        )
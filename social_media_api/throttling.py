@@ -0,0 +1,160 @@
+import logging
+
+from django.conf import settings
+from django.core.cache import caches
+from rest_framework.throttling import SimpleRateThrottle
+
+logger = logging.getLogger(__name__)
+
+REJECTED_KEY = "throttle:rejected:{scope}"
+
+
+def throttle_cache():
+    return caches[settings.THROTTLE_CACHE_ALIAS]
+
+
+def record_rejection(scope):
+    key = REJECTED_KEY.format(scope=scope)
+    cache = throttle_cache()
+    if not cache.add(key, 1, timeout=None):
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.set(key, 1, timeout=None)
+    logger.info("Throttled request for scope %s", scope)
+
+
+def rejected_counts():
+    """Number of rejected requests per throttle scope."""
+    scopes = list(settings.REST_FRAMEWORK["DEFAULT_THROTTLE_RATES"])
+    counts = throttle_cache().get_many(
+        [REJECTED_KEY.format(scope=scope) for scope in scopes]
+    )
+    return {
+        scope: counts.get(REJECTED_KEY.format(scope=scope), 0)
+        for scope in scopes
+    }
+
+
+class SlidingWindowRateThrottle(SimpleRateThrottle):
+    """
+    Sliding window counter: the previous fixed window is weighted
+    by how much of it still overlaps the sliding window. Unlike
+    DRF's request history list this costs one add/incr and one get
+    per request, whatever the rate, and the counters live in a
+    shared cache so limits hold across worker processes. The
+    request is counted first with the atomic incr and taken back
+    when rejected, so concurrent requests cannot all slip through
+    under the limit.
+    """
+
+    cache_format = "throttle:%(scope)s:%(ident)s"
+
+    def __init__(self):
+        self.cache = throttle_cache()
+        super().__init__()
+
+    def allow_request(self, request, view):
+        if self.rate is None:
+            return True
+
+        self.key = self.get_cache_key(request, view)
+        if self.key is None:
+            return True
+
+        now = self.timer()
+        window = int(now // self.duration)
+        current_key = f"{self.key}:{window}"
+        previous_key = f"{self.key}:{window - 1}"
+        # Including this request
+        current = self._count(current_key)
+        previous = self.cache.get(previous_key, 0)
+        elapsed = now - window * self.duration
+        estimate = previous * (1 - elapsed / self.duration) + current
+
+        if estimate > self.num_requests:
+            try:
+                self.cache.decr(current_key)
+            except ValueError:
+                pass
+            self.wait_seconds = self._wait(previous, current - 1, elapsed)
+            record_rejection(self.scope)
+            return False
+        return True
+
+    def _count(self, key):
+        """Count a request in the window ``key``, returns the new count"""
+        if self.cache.add(key, 1, 2 * self.duration):
+            return 1
+        try:
+            return self.cache.incr(key)
+        except ValueError:
+            # Expired between add and incr
+            self.cache.set(key, 1, 2 * self.duration)
+            return 1
+
+    def _wait(self, previous, current, elapsed):
+        if current >= self.num_requests or not previous:
+            return self.duration - elapsed
+        # Solve previous * (1 - (elapsed + t) / duration) + current < limit
+        wait = (
+            self.duration * (1 - (self.num_requests - current) / previous)
+            - elapsed
+        )
+        return max(wait, 0)
+
+    def wait(self):
+        return getattr(self, "wait_seconds", None)
+
+
+class UserRateThrottle(SlidingWindowRateThrottle):
+    """Limit per authenticated user, anonymous requests by IP."""
+
+    scope = "user"
+
+    def get_cache_key(self, request, view):
+        if request.user and request.user.is_authenticated:
+            ident = request.user.pk
+        else:
+            ident = self.get_ident(request)
+        return self.cache_format % {"scope": self.scope, "ident": ident}
+
+
+class IPRateThrottle(SlidingWindowRateThrottle):
+    """Limit per client IP, whoever is logged in."""
+
+    scope = "ip"
+
+    def get_cache_key(self, request, view):
+        return self.cache_format % {
+            "scope": self.scope,
+            "ident": self.get_ident(request),
+        }
+
+
+class ScopedRateThrottle(SlidingWindowRateThrottle):
+    """
+    Limit per endpoint class, set ``throttle_scope`` on the view
+    (or pass it to ``@action``/``as_view``). Keyed by user or IP.
+    """
+
+    scope_attr = "throttle_scope"
+
+    def __init__(self):
+        # The rate depends on the view, so it is resolved in allow_request
+        self.cache = throttle_cache()
+
+    def allow_request(self, request, view):
+        self.scope = getattr(view, self.scope_attr, None)
+        if not self.scope:
+            return True
+        self.rate = self.get_rate()
+        self.num_requests, self.duration = self.parse_rate(self.rate)
+        return super().allow_request(request, view)
+
+    def get_cache_key(self, request, view):
+        if request.user and request.user.is_authenticated:
+            ident = request.user.pk
+        else:
+            ident = self.get_ident(request)
+        return self.cache_format % {"scope": self.scope, "ident": ident}
@@ -1,13 +1,14 @@
 from django.conf import settings
-from django.conf.urls.static import static
 from django.contrib import admin
-from django.urls import path, include
+from django.urls import path, include, re_path
 from drf_spectacular.views import (
-    SpectacularAPIView,
     SpectacularSwaggerView,
     SpectacularRedocView
 )
 
+from social_media_api.media import serve_media
+from social_media_api.schema import schema_view
+
 urlpatterns = [
     path("admin/", admin.site.urls),
     path(
@@ -24,9 +25,16 @@ urlpatterns = [
             namespace="user"
         )
     ),
+    path(
+        "api/",
+        include(
+            "notifications.urls",
+            namespace="notifications"
+        )
+    ),
     path(
         "api/schema/",
-        SpectacularAPIView.as_view(),
+        schema_view,
         name="schema"
     ),
     # Optional UI:
@@ -44,11 +52,17 @@ urlpatterns = [
         ),
         name="redoc"
     ),
-    path(
-        "__debug__/",
-        include("debug_toolbar.urls")
+    re_path(
+        rf"^{settings.MEDIA_URL.lstrip('/')}(?P<path>.*)$",
+        serve_media,
+        name="media"
     ),
-] + static(
-    settings.MEDIA_URL,
-    document_root=settings.MEDIA_ROOT
-)
+]
+
+if "debug_toolbar" in settings.INSTALLED_APPS:
+    urlpatterns += [
+        path(
+            "__debug__/",
+            include("debug_toolbar.urls")
+        ),
+    ]
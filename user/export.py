@@ -0,0 +1,141 @@
+import gzip
+import json
+import tempfile
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.files import File
+from django.db.models import F
+from django.utils import timezone
+
+from posts.models import ArchivedComment, ArchivedPost, Comment, Post
+from posts.sharding import post_databases, shard_for_user
+from user.models import AccountExport
+
+
+def _sections(user):
+    """
+    (record type, queryset of plain values) for everything
+    that belongs to the account
+    """
+    user_model = get_user_model()
+    return (
+        (
+            "profile",
+            user_model.objects.filter(id=user.id).values(
+                "id",
+                "email",
+                "username",
+                "first_name",
+                "last_name",
+                "birth_date",
+                "place_of_birth",
+                "user_information",
+                "date_joined",
+            ),
+        ),
+        (
+            "post",
+            Post.objects.using(shard_for_user(user.id))
+            .filter(user=user).order_by("id").values(
+                "id", "title", "text", "created", "publish_at"
+            ),
+        ),
+        # Comments and likes live with the posts, on any shard
+        *(
+            (
+                "comment",
+                Comment.objects.using(using).filter(user=user)
+                .order_by("id").values("id", "post_id", "text"),
+            )
+            for using in post_databases()
+        ),
+        *(
+            (
+                "like",
+                Post.likes.through.objects.using(using).filter(user=user)
+                .order_by("id").values("post_id"),
+            )
+            for using in post_databases()
+        ),
+        # Posts moved to the archive tables (posts.archive)
+        (
+            "archived_post",
+            ArchivedPost.objects.using(shard_for_user(user.id))
+            .filter(user=user).order_by("id").values(
+                "id", "title", "text", "created"
+            ),
+        ),
+        *(
+            (
+                "archived_comment",
+                ArchivedComment.objects.using(using).filter(user=user)
+                .order_by("id").values("id", "post_id", "text"),
+            )
+            for using in post_databases()
+        ),
+        *(
+            (
+                "archived_like",
+                ArchivedPost.likes.through.objects.using(using)
+                .filter(user=user).order_by("id")
+                .values(post_id=F("archivedpost_id")),
+            )
+            for using in post_databases()
+        ),
+        (
+            "following",
+            user_model.following.through.objects.filter(from_user=user)
+            .order_by("id").values("to_user_id"),
+        ),
+        (
+            "follower",
+            user_model.following.through.objects.filter(to_user=user)
+            .order_by("id").values("from_user_id"),
+        ),
+    )
+
+
+def export_account(export_id, chunk_size=None):
+    """
+    Write the account data as gzip-compressed NDJSON, one record per
+    line. Rows are streamed with server-side chunked iterators into a
+    temporary file, so memory stays flat regardless of account size.
+    """
+    chunk_size = chunk_size or settings.ACCOUNT_EXPORT_CHUNK_SIZE
+    export = AccountExport.objects.select_related("user").get(id=export_id)
+    sections = _sections(export.user)
+
+    export.status = AccountExport.Status.RUNNING
+    export.total_rows = sum(queryset.count() for _, queryset in sections)
+    export.save(update_fields=["status", "total_rows"])
+
+    rows_written = 0
+    try:
+        with tempfile.TemporaryFile() as tmp:
+            with gzip.GzipFile(fileobj=tmp, mode="wb") as archive:
+                for record_type, queryset in sections:
+                    for row in queryset.iterator(chunk_size=chunk_size):
+                        record = {"type": record_type, **row}
+                        archive.write(
+                            json.dumps(record, default=str).encode()
+                            + b"\n"
+                        )
+                        rows_written += 1
+                        if rows_written % chunk_size == 0:
+                            AccountExport.objects.filter(
+                                id=export_id
+                            ).update(rows_written=rows_written)
+            tmp.seek(0)
+            export.file.save("export.ndjson.gz", File(tmp), save=False)
+    except Exception:
+        export.status = AccountExport.Status.FAILED
+        export.rows_written = rows_written
+        export.save(update_fields=["status", "rows_written"])
+        raise
+
+    export.status = AccountExport.Status.DONE
+    export.rows_written = rows_written
+    export.finished = timezone.now()
+    export.save(update_fields=["status", "rows_written", "file", "finished"])
+    return rows_written
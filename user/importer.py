@@ -0,0 +1,350 @@
+import json
+import os
+from collections import Counter
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import identify_hasher, make_password
+from django.contrib.auth.models import BaseUserManager
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.utils.dateparse import parse_date, parse_datetime
+
+from posts.models import Post, Tag
+from posts.sharding import (
+    group_by_shard,
+    is_sharded,
+    post_databases,
+    replicate_users,
+    shard_for_user,
+)
+from user.models import ImportCheckpoint
+
+USER_FIELDS = (
+    "username",
+    "first_name",
+    "last_name",
+    "place_of_birth",
+    "user_information",
+)
+# SQLite limits the number of variables in a single statement
+LOOKUP_CHUNK_SIZE = 500
+
+
+class RowError(ValueError):
+    pass
+
+
+def _normalized(value):
+    if isinstance(value, str):
+        return BaseUserManager.normalize_email(value)
+    return None
+
+
+def _email(value):
+    if not value or not isinstance(value, str) or "@" not in value:
+        raise RowError(f"Invalid email: {value!r}")
+    return BaseUserManager.normalize_email(value)
+
+
+def _password(value):
+    """
+    Only pre-hashed passwords are accepted, hashing plain text
+    with PBKDF2 per row is exactly what the import avoids
+    """
+    if value is None:
+        return make_password(None)
+    if not isinstance(value, str):
+        raise RowError("Password must be pre-hashed or omitted")
+    try:
+        identify_hasher(value)
+    except ValueError:
+        raise RowError("Password must be pre-hashed or omitted")
+    return value
+
+
+def _is_date(value):
+    try:
+        return isinstance(value, str) and parse_date(value) is not None
+    except ValueError:
+        # Well formed but out of range, e.g. 2023-02-30
+        return False
+
+
+def _text_fields(row):
+    user_model = get_user_model()
+    for field in USER_FIELDS:
+        value = row.get(field)
+        if value is None:
+            continue
+        max_length = user_model._meta.get_field(field).max_length
+        if not isinstance(value, str) or (
+                max_length and len(value) > max_length
+        ):
+            raise RowError(f"Invalid {field}: {value!r}")
+
+
+def _build_user(row):
+    _text_fields(row)
+    birth_date = row.get("birth_date")
+    if birth_date and not _is_date(birth_date):
+        raise RowError(f"Invalid birth_date: {birth_date!r}")
+    return get_user_model()(
+        email=_email(row.get("email")),
+        password=_password(row.get("password")),
+        birth_date=birth_date or None,
+        **{field: row.get(field) or "" for field in USER_FIELDS},
+    )
+
+
+def _post_row(row):
+    """Validate a post record, returns its parsed ``created``"""
+    if not isinstance(row.get("author"), str):
+        raise RowError("Post needs an author email")
+    if not row.get("title") or not isinstance(row.get("text"), str):
+        raise RowError("Post needs a title and text")
+    title = row["title"]
+    max_length = Post._meta.get_field("title").max_length
+    if not isinstance(title, str) or len(title) > max_length:
+        raise RowError(f"Invalid title: {title!r}")
+    for key, max_length in (("tags", 50), ("likes", 254)):
+        values = row.get(key, [])
+        if not isinstance(values, list) or not all(
+                isinstance(value, str) and 0 < len(value) <= max_length
+                for value in values
+        ):
+            raise RowError(f"{key} must be a list of strings")
+    created = row.get("created")
+    if created is None:
+        return None
+    parsed = parse_datetime(created) if isinstance(created, str) else None
+    if parsed is None:
+        raise RowError(f"Invalid created: {created!r}")
+    return parsed
+
+
+def _user_ids(emails):
+    emails = list({_normalized(email) for email in emails} - {None})
+    ids = {}
+    for start in range(0, len(emails), LOOKUP_CHUNK_SIZE):
+        ids.update(
+            get_user_model().objects.filter(
+                email__in=emails[start:start + LOOKUP_CHUNK_SIZE]
+            ).values_list("email", "id")
+        )
+    return ids
+
+
+def _tag_ids(names, using):
+    names = list(set(names))
+    tags = Tag.objects.using(using)
+    tags.bulk_create(
+        [Tag(name=name) for name in names], ignore_conflicts=True
+    )
+    ids = {}
+    for start in range(0, len(names), LOOKUP_CHUNK_SIZE):
+        ids.update(
+            tags.filter(
+                name__in=names[start:start + LOOKUP_CHUNK_SIZE]
+            ).values_list("name", "id")
+        )
+    return ids
+
+
+class NDJSONImporter:
+    """
+    Stream an NDJSON file of ``user``, ``post`` and ``follow``
+    records and insert it in batches with bulk_create.
+
+    {"type": "user", "email": "...", "password": "<hash>", ...}
+    {"type": "post", "author": "<email>", "title": "...", "text": "...",
+     "created": "...", "tags": ["..."], "likes": ["<email>", ...]}
+    {"type": "follow", "follower": "<email>", "followee": "<email>"}
+
+    Each batch is committed together with its checkpoint,
+    so a failed import resumes after the last committed batch.
+    Posts go to the shard of their author, in one transaction
+    per database that commits with the batch.
+    """
+
+    def __init__(self, path, batch_size=None, restart=False):
+        self.path = path
+        self.source = os.path.abspath(path)
+        self.batch_size = batch_size or settings.IMPORT_BATCH_SIZE
+        self.restart = restart
+        self.stats = Counter()
+        self.errors = []
+
+    def run(self):
+        checkpoint, _ = ImportCheckpoint.objects.get_or_create(
+            source=self.source
+        )
+        if self.restart:
+            checkpoint.offset = checkpoint.line = 0
+            checkpoint.save()
+
+        with open(self.path, "rb") as source:
+            source.seek(checkpoint.offset)
+            line_number = checkpoint.line
+            batch = []
+            for raw_line in source:
+                line_number += 1
+                if raw_line.strip():
+                    batch.append((line_number, raw_line))
+                if len(batch) >= self.batch_size:
+                    self._commit(checkpoint, batch, source.tell(), line_number)
+                    batch = []
+            self._commit(checkpoint, batch, source.tell(), line_number)
+        return self.stats
+
+    def _commit(self, checkpoint, batch, offset, line_number):
+        with ExitStack() as stack:
+            for using in dict.fromkeys([DEFAULT_DB_ALIAS, *post_databases()]):
+                stack.enter_context(transaction.atomic(using=using))
+            self._import_batch(batch)
+            checkpoint.offset = offset
+            checkpoint.line = line_number
+            checkpoint.save(update_fields=["offset", "line", "updated"])
+        self.stats["batches"] += 1
+
+    def _parse(self, batch):
+        records = {"user": [], "post": [], "follow": []}
+        for line_number, raw_line in batch:
+            try:
+                row = json.loads(raw_line)
+                if not isinstance(row, dict):
+                    raise RowError("Record must be a JSON object")
+                if row.get("type") not in records:
+                    raise RowError(f"Unknown record type: {row.get('type')!r}")
+            except ValueError as error:
+                self._error(line_number, error)
+                continue
+            records[row["type"]].append((line_number, row))
+        return records
+
+    def _error(self, line_number, error):
+        self.stats["errors"] += 1
+        if len(self.errors) < settings.IMPORT_MAX_REPORTED_ERRORS:
+            self.errors.append((line_number, str(error)))
+
+    def _import_batch(self, batch):
+        records = self._parse(batch)
+        self._import_users(records["user"])
+        self._import_posts(records["post"])
+        self._import_follows(records["follow"])
+
+    def _import_users(self, rows):
+        users = []
+        for line_number, row in rows:
+            try:
+                users.append(_build_user(row))
+            except RowError as error:
+                self._error(line_number, error)
+        # Already existing emails are skipped, so replays are harmless
+        new_emails = {user.email for user in users} - set(
+            _user_ids(user.email for user in users)
+        )
+        get_user_model().objects.bulk_create(users, ignore_conflicts=True)
+        if is_sharded() and new_emails:
+            # bulk_create sends no post_save to replicate them
+            new_emails = list(new_emails)
+            for start in range(0, len(new_emails), LOOKUP_CHUNK_SIZE):
+                replicate_users(
+                    get_user_model().objects.filter(
+                        email__in=new_emails[start:start + LOOKUP_CHUNK_SIZE]
+                    )
+                )
+        self.stats["users"] += len(new_emails)
+        self.stats["existing_users"] += len(users) - len(new_emails)
+
+    def _import_posts(self, rows):
+        valid_rows = []
+        for line_number, row in rows:
+            try:
+                valid_rows.append((line_number, row, _post_row(row)))
+            except RowError as error:
+                self._error(line_number, error)
+
+        user_ids = _user_ids(
+            email
+            for _, row, _ in valid_rows
+            for email in [row["author"], *row.get("likes", [])]
+        )
+        posts, relations = [], []
+        for line_number, row, created in valid_rows:
+            author_id = user_ids.get(_normalized(row["author"]))
+            if author_id is None:
+                self._error(line_number, f"Unknown author {row['author']!r}")
+                continue
+            posts.append(
+                Post(
+                    user_id=author_id,
+                    title=row["title"],
+                    text=row["text"],
+                )
+            )
+            relations.append((created, row))
+
+        shards = group_by_shard(
+            zip(posts, relations), lambda pair: shard_for_user(pair[0].user_id)
+        )
+        for using, shard_posts in shards.items():
+            self._insert_posts(using, shard_posts, user_ids)
+
+    def _insert_posts(self, using, posts, user_ids):
+        """Insert (post, (created, row)) pairs into their database"""
+        Post.objects.using(using).bulk_create([post for post, _ in posts])
+        tag_ids = _tag_ids(
+            (name for _, (_, row) in posts for name in row.get("tags", [])),
+            using,
+        )
+
+        dated, tag_rows, like_rows = [], [], []
+        for post, (created, row) in posts:
+            if created:
+                post.created = created
+                dated.append(post)
+            tag_rows += [
+                Post.tags.through(post_id=post.id, tag_id=tag_ids[name])
+                for name in set(row.get("tags", []))
+            ]
+            like_rows += [
+                Post.likes.through(post_id=post.id, user_id=user_id)
+                for user_id in {
+                    user_ids.get(_normalized(email))
+                    for email in row.get("likes", [])
+                } - {None}
+            ]
+        # created is auto_now_add, original timestamps are restored after insert
+        Post.objects.using(using).bulk_update(dated, ["created"])
+        Post.tags.through.objects.using(using).bulk_create(
+            tag_rows, ignore_conflicts=True
+        )
+        Post.likes.through.objects.using(using).bulk_create(
+            like_rows, ignore_conflicts=True
+        )
+        self.stats["posts"] += len(posts)
+        self.stats["likes"] += len(like_rows)
+
+    def _import_follows(self, rows):
+        user_ids = _user_ids(
+            email
+            for _, row in rows
+            for email in (row.get("follower"), row.get("followee"))
+        )
+        through = get_user_model().following.through
+        follow_rows = []
+        for line_number, row in rows:
+            follower_id = user_ids.get(_normalized(row.get("follower")))
+            followee_id = user_ids.get(_normalized(row.get("followee")))
+            if follower_id is None or followee_id is None:
+                self._error(line_number, "Unknown follower or followee")
+                continue
+            if follower_id == followee_id:
+                self._error(line_number, "Users cannot follow themselves")
+                continue
+            follow_rows.append(
+                through(from_user_id=follower_id, to_user_id=followee_id)
+            )
+        through.objects.bulk_create(follow_rows, ignore_conflicts=True)
+        self.stats["follows"] += len(follow_rows)
@@ -0,0 +1,41 @@
+from django.core.management.base import BaseCommand
+
+from user.importer import NDJSONImporter
+
+
+class Command(BaseCommand):
+    help = (
+        "Import users, posts (with tags and likes) and follows "
+        "from an NDJSON file, resuming from the last checkpoint"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="Path to the NDJSON file")
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=None,
+            help="Rows per transaction (IMPORT_BATCH_SIZE by default)",
+        )
+        parser.add_argument(
+            "--restart",
+            action="store_true",
+            help="Ignore the saved checkpoint and start from the beginning",
+        )
+
+    def handle(self, *args, **options):
+        importer = NDJSONImporter(
+            options["path"],
+            batch_size=options["batch_size"],
+            restart=options["restart"],
+        )
+        stats = importer.run()
+        for line_number, error in importer.errors:
+            self.stderr.write(f"line {line_number}: {error}")
+        self.stdout.write(
+            self.style.SUCCESS(
+                ", ".join(
+                    f"{key}: {value}" for key, value in sorted(stats.items())
+                )
+            )
+        )
@@ -0,0 +1,60 @@
+# Generated by Django 4.2.3 on 2026-10-19 08:32
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("user", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="FollowSuggestion",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("mutual_count", models.PositiveIntegerField()),
+                (
+                    "suggested_user",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="+",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+                (
+                    "user",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="follow_suggestions",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+            ],
+            options={
+                "ordering": ["-mutual_count", "suggested_user_id"],
+                "indexes": [
+                    models.Index(
+                        fields=["user", "-mutual_count"],
+                        name="follow_suggestion_rank_idx",
+                    )
+                ],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name="followsuggestion",
+            constraint=models.UniqueConstraint(
+                fields=("user", "suggested_user"), name="unique_follow_suggestion"
+            ),
+        ),
+    ]
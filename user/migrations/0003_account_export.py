@@ -0,0 +1,65 @@
+# Generated by Django 4.2.3 on 2026-10-19 08:36
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import user.models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("user", "0002_follow_suggestion"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="AccountExport",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "status",
+                    models.CharField(
+                        choices=[
+                            ("pending", "Pending"),
+                            ("running", "Running"),
+                            ("done", "Done"),
+                            ("failed", "Failed"),
+                        ],
+                        default="pending",
+                        max_length=16,
+                    ),
+                ),
+                ("rows_written", models.PositiveBigIntegerField(default=0)),
+                ("total_rows", models.PositiveBigIntegerField(default=0)),
+                (
+                    "file",
+                    models.FileField(
+                        blank=True,
+                        null=True,
+                        upload_to=user.models.account_export_file_path,
+                    ),
+                ),
+                ("created", models.DateTimeField(auto_now_add=True)),
+                ("finished", models.DateTimeField(blank=True, null=True)),
+                (
+                    "user",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="exports",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+            ],
+            options={
+                "ordering": ["-created"],
+            },
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 4.2.3 on 2026-10-19 08:42
+
+from django.db import migrations, models
+import social_media_api.storage
+import user.models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("user", "0005_user_is_deleted"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="user",
+            name="profile_photo",
+            field=models.ImageField(
+                null=True,
+                storage=social_media_api.storage.ContentAddressedStorage(),
+                upload_to=user.models.profile_picture_file_path,
+            ),
+        ),
+    ]
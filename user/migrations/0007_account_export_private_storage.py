@@ -0,0 +1,24 @@
+# Generated by Django 4.2.3 on 2026-10-19 09:24
+
+from django.db import migrations, models
+import social_media_api.storage
+import user.models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("user", "0006_profile_photo_content_addressed"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="accountexport",
+            name="file",
+            field=models.FileField(
+                blank=True,
+                null=True,
+                storage=social_media_api.storage.PrivateStorage(),
+                upload_to=user.models.account_export_file_path,
+            ),
+        ),
+    ]
@@ -10,6 +10,11 @@ from django.db import models
 from django.utils.text import slugify
 from django.utils.translation import gettext as _
 
+from social_media_api.storage import (
+    content_addressed_storage,
+    private_storage,
+)
+
 
 class UserManager(BaseUserManager):
     """Define a model manager for User model with no username field."""
@@ -68,6 +73,88 @@ class User(AbstractUser):
         settings.AUTH_USER_MODEL,
         related_name="followers",
     )
-    profile_photo = models.ImageField(null=True, upload_to=profile_picture_file_path)
+    profile_photo = models.ImageField(
+        null=True,
+        upload_to=profile_picture_file_path,
+        storage=content_addressed_storage,
+    )
+    # Soft-deleted accounts are hidden at once and purged by a task
+    is_deleted = models.BooleanField(default=False)
 
     objects = UserManager()
+
+
+class FollowSuggestion(models.Model):
+    """Precomputed "people you may know" entry for a user."""
+
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name="follow_suggestions",
+    )
+    suggested_user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name="+",
+    )
+    mutual_count = models.PositiveIntegerField()
+
+    class Meta:
+        ordering = ["-mutual_count", "suggested_user_id"]
+        constraints = [
+            models.UniqueConstraint(
+                fields=["user", "suggested_user"],
+                name="unique_follow_suggestion",
+            )
+        ]
+        indexes = [
+            models.Index(
+                fields=["user", "-mutual_count"],
+                name="follow_suggestion_rank_idx",
+            )
+        ]
+
+
+def account_export_file_path(instance, file_name):
+    return os.path.join(
+        "exports/", str(instance.user_id), f"{uuid.uuid4()}.ndjson.gz"
+    )
+
+
+class AccountExport(models.Model):
+    class Status(models.TextChoices):
+        PENDING = "pending"
+        RUNNING = "running"
+        DONE = "done"
+        FAILED = "failed"
+
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name="exports",
+    )
+    status = models.CharField(
+        max_length=16, choices=Status.choices, default=Status.PENDING
+    )
+    rows_written = models.PositiveBigIntegerField(default=0)
+    total_rows = models.PositiveBigIntegerField(default=0)
+    file = models.FileField(
+        null=True,
+        blank=True,
+        upload_to=account_export_file_path,
+        storage=private_storage,
+    )
+    created = models.DateTimeField(auto_now_add=True)
+    finished = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ["-created"]
+
+
+class ImportCheckpoint(models.Model):
+    """Byte offset of the last committed batch of an NDJSON import."""
+
+    source = models.CharField(max_length=255, unique=True)
+    offset = models.PositiveBigIntegerField(default=0)
+    line = models.PositiveBigIntegerField(default=0)
+    updated = models.DateTimeField(auto_now=True)
@@ -1,8 +1,12 @@
 from django.contrib.auth import get_user_model
 from rest_framework import serializers
+from rest_framework.reverse import reverse
 from rest_framework_simplejwt.exceptions import TokenError
 from rest_framework_simplejwt.tokens import RefreshToken
 
+from social_media_api.sparse_fields import SparseFieldsetsMixin
+from user.models import AccountExport, FollowSuggestion
+
 
 class UserDetailSerializer(serializers.ModelSerializer):
     class Meta:
@@ -12,7 +16,9 @@ class UserDetailSerializer(serializers.ModelSerializer):
         extra_kwargs = {"password": {"write_only": True, "min_length": 5}}
 
 
-class CreateUserSerializer(serializers.ModelSerializer):
+class CreateUserSerializer(
+    SparseFieldsetsMixin, serializers.ModelSerializer
+):
     followers = serializers.SlugRelatedField(
         many=True, read_only=True, slug_field="username"
     )
@@ -36,6 +42,7 @@ class CreateUserSerializer(serializers.ModelSerializer):
         )
         read_only_fields = ("is_staff",)
         extra_kwargs = {"password": {"write_only": True, "min_length": 5}}
+        expandable_fields = ("followers",)
 
     def create(self, validated_data):
         """Create a new user with encrypted password and return it"""
@@ -77,3 +84,48 @@ class ProfileImageSerializer(serializers.ModelSerializer):
     class Meta:
         model = get_user_model()
         fields = ("id", "profile_photo")
+
+
+class FollowSuggestionSerializer(serializers.ModelSerializer):
+    id = serializers.IntegerField(source="suggested_user_id", read_only=True)
+    email = serializers.EmailField(source="suggested_user.email", read_only=True)
+    username = serializers.CharField(
+        source="suggested_user.username", read_only=True
+    )
+
+    class Meta:
+        model = FollowSuggestion
+        fields = ("id", "email", "username", "mutual_count")
+
+
+class AccountExportSerializer(serializers.ModelSerializer):
+    progress = serializers.SerializerMethodField()
+    download_url = serializers.SerializerMethodField()
+
+    class Meta:
+        model = AccountExport
+        fields = (
+            "id",
+            "status",
+            "rows_written",
+            "total_rows",
+            "progress",
+            "download_url",
+            "created",
+            "finished",
+        )
+        read_only_fields = fields
+
+    def get_progress(self, obj) -> int:
+        if obj.status == AccountExport.Status.DONE:
+            return 100
+        if not obj.total_rows:
+            return 0
+        return min(99, obj.rows_written * 100 // obj.total_rows)
+
+    def get_download_url(self, obj) -> str | None:
+        if obj.status != AccountExport.Status.DONE or not obj.file:
+            return None
+        return reverse(
+            "user:export-download", request=self.context.get("request")
+        )
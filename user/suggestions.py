@@ -0,0 +1,148 @@
+import heapq
+import random
+from array import array
+from bisect import bisect_left
+from collections import Counter
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import transaction
+
+from user.models import FollowSuggestion
+
+
+class FollowGraph:
+    """
+    Compact CSR (compressed sparse row) snapshot of the follow graph.
+    Users are mapped to dense positions, so the whole graph costs
+    8 bytes per user for ``user_ids``, 8 bytes per user for ``indptr``
+    and 4 bytes per follow edge for ``indices``.
+    """
+
+    def __init__(self, user_ids, indptr, indices):
+        self.user_ids = user_ids
+        self.indptr = indptr
+        self.indices = indices
+
+    def __len__(self):
+        return len(self.user_ids)
+
+    def position(self, user_id):
+        index = bisect_left(self.user_ids, user_id)
+        if index < len(self.user_ids) and self.user_ids[index] == user_id:
+            return index
+        return None
+
+    def following(self, position):
+        return self.indices[
+            self.indptr[position]:self.indptr[position + 1]
+        ]
+
+    @classmethod
+    def load(cls, chunk_size):
+        """
+        Stream users and follow edges with server-side chunked
+        iterators, never materializing model instances. Soft-deleted
+        users are left out, so are the edges to and from them.
+        """
+        user_model = get_user_model()
+        through = user_model.following.through
+
+        user_ids = array(
+            "q",
+            user_model.objects.filter(is_deleted=False).order_by("id")
+            .values_list("id", flat=True)
+            .iterator(chunk_size=chunk_size),
+        )
+        graph = cls(user_ids, array("q", [0]), array("i"))
+
+        edges = (
+            through.objects.order_by("from_user_id", "to_user_id")
+            .values_list("from_user_id", "to_user_id")
+            .iterator(chunk_size=chunk_size)
+        )
+        row = 0
+        for from_user_id, to_user_id in edges:
+            from_position = graph.position(from_user_id)
+            to_position = graph.position(to_user_id)
+            if from_position is None or to_position is None:
+                continue
+            while row < from_position:
+                graph.indptr.append(len(graph.indices))
+                row += 1
+            graph.indices.append(to_position)
+        while row < len(user_ids):
+            graph.indptr.append(len(graph.indices))
+            row += 1
+        return graph
+
+    def suggestions_for(self, position, top_k, max_fanout, rng=random):
+        """
+        Return the ``top_k`` (position, mutual_count) pairs of users
+        followed by the people ``position`` follows, excluding
+        ``position`` itself and users it already follows. Past
+        ``max_fanout`` follows a random sample is walked, the first
+        ones by id would always favour the oldest accounts.
+        """
+        following = self.following(position)
+        already_following = set(following)
+        mutual_counts = Counter()
+        for followed in _sample(following, max_fanout, rng):
+            for candidate in _sample(
+                    self.following(followed), max_fanout, rng
+            ):
+                if (
+                        candidate != position
+                        and candidate not in already_following
+                ):
+                    mutual_counts[candidate] += 1
+        return heapq.nlargest(
+            top_k,
+            mutual_counts.items(),
+            key=lambda item: (item[1], -item[0]),
+        )
+
+
+def _sample(positions, limit, rng):
+    if len(positions) <= limit:
+        return positions
+    return rng.sample(positions, limit)
+
+
+def rebuild_follow_suggestions(
+        top_k=None, batch_size=None, chunk_size=None, max_fanout=None
+):
+    """
+    Recompute friends-of-friends suggestions for every user in
+    batches and replace the stored top-K rows batch by batch.
+    Returns the number of suggestions written.
+    """
+    top_k = top_k or settings.FOLLOW_SUGGESTIONS_TOP_K
+    batch_size = batch_size or settings.FOLLOW_SUGGESTIONS_BATCH_SIZE
+    chunk_size = chunk_size or settings.FOLLOW_SUGGESTIONS_CHUNK_SIZE
+    max_fanout = max_fanout or settings.FOLLOW_SUGGESTIONS_MAX_FANOUT
+
+    graph = FollowGraph.load(chunk_size)
+    written = 0
+    for start in range(0, len(graph), batch_size):
+        positions = range(start, min(start + batch_size, len(graph)))
+        suggestions = [
+            FollowSuggestion(
+                user_id=graph.user_ids[position],
+                suggested_user_id=graph.user_ids[candidate],
+                mutual_count=mutual_count,
+            )
+            for position in positions
+            for candidate, mutual_count in graph.suggestions_for(
+                position, top_k, max_fanout
+            )
+        ]
+        with transaction.atomic():
+            FollowSuggestion.objects.filter(
+                user_id__in=[graph.user_ids[p] for p in positions]
+            ).delete()
+            FollowSuggestion.objects.bulk_create(
+                suggestions, batch_size=chunk_size
+            )
+        written += len(suggestions)
+    return written
@@ -0,0 +1,48 @@
+from celery import shared_task
+from django.conf import settings
+from django.contrib.auth import get_user_model
+
+from posts.fragments import bump_versions
+from posts.purge import BatchPurger, posts_touched_by
+from posts.tasks import report_progress
+
+from user.export import export_account
+from user.importer import NDJSONImporter
+from user.suggestions import rebuild_follow_suggestions
+
+
+@shared_task
+def compute_follow_suggestions() -> int:
+    return rebuild_follow_suggestions()
+
+
+@shared_task
+def export_account_data(export_id: int) -> int:
+    return export_account(export_id)
+
+
+@shared_task
+def import_ndjson(path: str, batch_size: int = None) -> dict:
+    """Import an NDJSON file, a retried task resumes from its checkpoint."""
+    importer = NDJSONImporter(path, batch_size=batch_size)
+    stats = importer.run()
+    return {**stats, "errors_sample": importer.errors}
+
+
+@shared_task(bind=True)
+def purge_user(self, user_id: int) -> int:
+    """
+    Remove a soft-deleted account and everything it owns in batches,
+    then invalidate the cached posts it had liked or commented on
+    (raw deletes send no signals)
+    """
+    post_ids = posts_touched_by(user_id)
+    purger = BatchPurger(on_progress=report_progress(self))
+    users = get_user_model().objects.filter(id=user_id, is_deleted=True)
+    # The replicas and the posts on the shards first, default last
+    for using in settings.POST_SHARDS:
+        purger.purge(users.using(using))
+    rows = purger.purge(users)
+    for start in range(0, len(post_ids), purger.batch_size):
+        bump_versions(post_ids[start:start + purger.batch_size])
+    return rows
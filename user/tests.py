@@ -1,3 +1,242 @@
-from django.test import TestCase
+import gzip
+import json
+import random
+import tempfile
+from array import array
+from pathlib import Path
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from posts.models import ArchivedComment, ArchivedPost, Post
+from posts.tests import hammer, unsharded
+from user.export import export_account
+from user.importer import NDJSONImporter
+from user.models import AccountExport, FollowSuggestion
+from user.suggestions import FollowGraph, rebuild_follow_suggestions
+
+SUBSCRIBE_URL = "/api/users/users/{}/subscribe/"
+
+
+class FollowFixtureMixin:
+    def setUp(self):
+        user_model = get_user_model()
+        self.author = user_model.objects.create_user(
+            "author@example.com", "pass12345"
+        )
+        self.reader = user_model.objects.create_user(
+            "reader@example.com", "pass12345"
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.reader)
+
+
+@unsharded
+class IdempotentFollowTests(FollowFixtureMixin, TestCase):
+    def test_put_and_delete_follow_are_idempotent(self):
+        statuses = [
+            self.client.put(SUBSCRIBE_URL.format(self.author.id)).status_code
+            for _ in range(2)
+        ]
+        self.assertEqual(
+            statuses,
+            [status.HTTP_201_CREATED, status.HTTP_204_NO_CONTENT],
+        )
+        self.assertTrue(
+            self.reader.following.filter(id=self.author.id).exists()
+        )
+
+        for _ in range(2):
+            response = self.client.delete(SUBSCRIBE_URL.format(self.author.id))
+            self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertFalse(self.reader.following.exists())
+
+    def test_put_follow_yourself_is_rejected(self):
+        response = self.client.put(SUBSCRIBE_URL.format(self.reader.id))
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_non_numeric_user_ids_are_not_found(self):
+        for method in ("put", "delete", "post"):
+            with self.subTest(method=method):
+                response = getattr(self.client, method)(
+                    SUBSCRIBE_URL.format("abc")
+                )
+
+                self.assertEqual(
+                    response.status_code, status.HTTP_404_NOT_FOUND
+                )
+
+
+@unsharded
+class ConcurrentFollowTests(FollowFixtureMixin, TransactionTestCase):
+    def test_concurrent_put_follow_creates_one_follow(self):
+        statuses = hammer(
+            "put", SUBSCRIBE_URL.format(self.author.id), self.reader
+        )
+
+        self.assertEqual(statuses.count(status.HTTP_201_CREATED), 1)
+        self.assertEqual(
+            statuses.count(status.HTTP_204_NO_CONTENT), len(statuses) - 1
+        )
+        self.assertEqual(
+            self.reader.following.filter(id=self.author.id).count(), 1
+        )
+
+
+@unsharded
+class FollowSuggestionTests(TestCase):
+    def setUp(self):
+        user_model = get_user_model()
+        self.me, self.friend, self.candidate, self.deleted = (
+            user_model.objects.create_user(f"user{index}@example.com")
+            for index in range(4)
+        )
+        self.me.following.add(self.friend)
+        self.friend.following.add(self.candidate, self.deleted)
+
+    def test_soft_deleted_users_are_not_suggested(self):
+        self.deleted.is_deleted = True
+        self.deleted.save(update_fields=["is_deleted"])
+
+        rebuild_follow_suggestions()
+
+        self.assertEqual(
+            list(
+                FollowSuggestion.objects.filter(user=self.me)
+                .values_list("suggested_user_id", flat=True)
+            ),
+            [self.candidate.id],
+        )
+
+    def test_fanout_is_sampled_not_truncated_by_id(self):
+        # Position 0 follows 1..10, each of which follows 10 + itself
+        indptr = array("q", [0, 10])
+        indices = array("i", range(1, 11))
+        for followed in range(1, 11):
+            indices.append(10 + followed)
+            indptr.append(len(indices))
+        for _ in range(10, 21):
+            indptr.append(len(indices))
+        graph = FollowGraph(array("q", range(21)), indptr, indices)
+
+        reached = set()
+        for seed in range(20):
+            reached.update(
+                candidate for candidate, _ in graph.suggestions_for(
+                    0, top_k=10, max_fanout=2, rng=random.Random(seed)
+                )
+            )
+
+        # Truncating would only ever reach 11 and 12
+        self.assertGreater(len(reached), 2)
+
+
+@unsharded
+class AccountExportTests(TestCase):
+    def setUp(self):
+        media_root = tempfile.TemporaryDirectory()
+        private_root = tempfile.TemporaryDirectory()
+        self.addCleanup(media_root.cleanup)
+        self.addCleanup(private_root.cleanup)
+        settings_override = override_settings(
+            MEDIA_ROOT=media_root.name, PRIVATE_MEDIA_ROOT=private_root.name
+        )
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.media_root = Path(media_root.name)
+
+        user_model = get_user_model()
+        self.user = user_model.objects.create_user("owner@example.com")
+        self.other = user_model.objects.create_user("other@example.com")
+        Post.objects.create(title="Hot", text="Text", user=self.user)
+        archived = ArchivedPost.objects.create(
+            id=1000, title="Cold", text="Text", created="2020-01-01T00:00Z",
+            user=self.user,
+        )
+        archived.likes.add(self.user)
+        ArchivedComment.objects.create(
+            id=1000, text="Old comment", post=archived, user=self.user
+        )
+        self.export = AccountExport.objects.create(user=self.user)
+        export_account(self.export.id)
+
+    def download(self, user):
+        client = APIClient()
+        client.force_authenticate(user)
+        return client.get(reverse("user:export-download"))
+
+    def test_export_includes_archived_content(self):
+        response = self.download(self.user)
+
+        self.assertEqual(response.status_code, 200)
+        records = [
+            json.loads(line)
+            for line in gzip.decompress(b"".join(response.streaming_content))
+            .splitlines()
+        ]
+        types = {record["type"] for record in records}
+        self.assertTrue(
+            {"post", "archived_post", "archived_comment", "archived_like"}
+            <= types
+        )
+
+    def test_export_is_kept_out_of_public_media(self):
+        self.assertEqual(list(self.media_root.rglob("*")), [])
+        self.assertEqual(self.download(self.other).status_code, 404)
+
+
+@unsharded
+class NDJSONImporterTests(TestCase):
+    def run_import(self, *records):
+        with tempfile.NamedTemporaryFile("w", suffix=".ndjson") as source:
+            for record in records:
+                source.write(json.dumps(record) + "\n")
+            source.flush()
+            importer = NDJSONImporter(source.name)
+            return importer.run(), importer.errors
+
+    def test_badly_typed_user_fields_are_row_errors(self):
+        stats, errors = self.run_import(
+            {"type": "user", "email": "date@example.com", "birth_date": 1990},
+            {"type": "user", "email": "day@example.com",
+             "birth_date": "1990-02-30"},
+            {"type": "user", "email": "name@example.com",
+             "first_name": {"first": "Ann"}},
+            {"type": "user", "email": "hash@example.com", "password": 1},
+            {"type": "user", "email": "ok@example.com",
+             "birth_date": "1990-02-03"},
+        )
+
+        self.assertEqual(stats["errors"], 4)
+        self.assertEqual([line for line, _ in errors], [1, 2, 3, 4])
+        self.assertEqual(stats["users"], 1)
+
+    def test_badly_typed_post_titles_are_row_errors(self):
+        stats, errors = self.run_import(
+            {"type": "user", "email": "author@example.com"},
+            {"type": "post", "author": "author@example.com",
+             "title": 5, "text": "Text"},
+            {"type": "post", "author": "author@example.com",
+             "title": "x" * 101, "text": "Text"},
+            {"type": "post", "author": "author@example.com",
+             "title": "x" * 100, "text": "Text"},
+        )
+
+        self.assertEqual([line for line, _ in errors], [2, 3])
+        self.assertEqual(stats["posts"], 1)
+        self.assertEqual(Post.objects.get().title, "x" * 100)
+
+    def test_existing_users_are_not_counted_as_imported(self):
+        get_user_model().objects.create_user("known@example.com")
+
+        stats, _ = self.run_import(
+            {"type": "user", "email": "known@example.com"},
+            {"type": "user", "email": "new@example.com"},
+        )
+
+        self.assertEqual(stats["users"], 1)
+        self.assertEqual(stats["existing_users"], 1)
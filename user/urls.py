@@ -1,16 +1,18 @@
 from django.urls import path, include
 from rest_framework import routers
 from rest_framework_simplejwt.views import (
-    TokenObtainPairView,
     TokenRefreshView,
     TokenVerifyView,
 )
 from user.views import (
+    AccountExportDownloadView,
+    AccountExportView,
     UserViewSet,
     CreateUserView,
     ManageUserView,
     LogoutAPIView,
     UploadProfilePictureView,
+    ThrottledTokenObtainPairView,
 )
 
 router = routers.DefaultRouter()
@@ -19,7 +21,11 @@ router.register("users", UserViewSet)
 
 urlpatterns = [
     path("register/", CreateUserView.as_view(), name="create"),
-    path("token/", TokenObtainPairView.as_view(), name="token_obtain_pair"),
+    path(
+        "token/",
+        ThrottledTokenObtainPairView.as_view(),
+        name="token_obtain_pair",
+    ),
     path("token/refresh/", TokenRefreshView.as_view(), name="token_refresh"),
     path("token/verify/", TokenVerifyView.as_view(), name="token_verify"),
     path("logout/", LogoutAPIView.as_view(), name="auth_logout"),
@@ -29,6 +35,12 @@ urlpatterns = [
         UploadProfilePictureView.as_view(),
         name="profile_picture",
     ),
+    path("me/export/", AccountExportView.as_view(), name="export"),
+    path(
+        "me/export/download/",
+        AccountExportDownloadView.as_view(),
+        name="export-download",
+    ),
 ] + router.urls
 
 
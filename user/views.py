@@ -1,6 +1,10 @@
 from django.contrib.auth import get_user_model
+from django.db import router, transaction
 from django.db.models import Count
+from django.db.models.signals import m2m_changed
+from django.http import FileResponse, Http404
 from django.shortcuts import redirect
+from drf_spectacular.types import OpenApiTypes
 from drf_spectacular.utils import extend_schema, OpenApiParameter
 from rest_framework import generics, status, mixins
 from rest_framework.decorators import action
@@ -12,30 +16,50 @@ from rest_framework.response import Response
 from rest_framework.reverse import reverse
 from rest_framework.views import APIView
 from rest_framework.viewsets import GenericViewSet
-
+from rest_framework_simplejwt.views import TokenObtainPairView
+
+from notifications.activity import record_activity
+from notifications.models import Verb
+from posts.fragments import bump_versions
+from posts.purge import posts_touched_by
+from social_media_api.batch import IDS_PARAMETER, BatchRetrieveMixin
+from social_media_api.relations import link, unlink
+from user.models import AccountExport, FollowSuggestion
 from user.pagination import UserPagination
 from user.serializers import (
+    AccountExportSerializer,
     CreateUserSerializer,
+    FollowSuggestionSerializer,
     ReadOnlyUserFollowersSerializer,
     LogoutSerializer,
     ProfileImageSerializer,
 )
+from user.tasks import export_account_data, purge_user
+
+SEARCH_QUERY_PARAMS = ("username", "place_of_birth", "start_date", "end_date")
 
 
 class UserViewSet(
+    BatchRetrieveMixin,
     mixins.ListModelMixin,
     mixins.RetrieveModelMixin,
     GenericViewSet,
 ):
-    queryset = (
-        get_user_model().objects.all()
-        .annotate(
-            followings=Count("following")
-        )
-    )
+    queryset = get_user_model().objects.filter(is_deleted=False)
     serializer_class = CreateUserSerializer
     pagination_class = UserPagination
     permission_classes = [IsAuthenticatedOrReadOnly]
+    throttle_scope = None
+    # Ids only, anything else is a 404 from the URL resolver
+    lookup_value_regex = "[0-9]+"
+
+    def initial(self, request, *args, **kwargs):
+        if self.action == "list" and any(
+                param in request.query_params
+                for param in SEARCH_QUERY_PARAMS
+        ):
+            self.throttle_scope = "search"
+        super().initial(request, *args, **kwargs)
 
     def get_queryset(self):
         """
@@ -73,11 +97,25 @@ class UserViewSet(
                 ]
             )
 
-        return queryset.distinct()
+        return self.with_requested_relations(queryset.distinct())
+
+    def with_requested_relations(self, queryset):
+        """
+        Count followings and prefetch followers only when
+        the requested fields (?fields=, ?expand=) include them
+        """
+        selected = CreateUserSerializer.selected_fields(self.request)
+        if "followings" in selected:
+            queryset = queryset.annotate(followings=Count("following"))
+        if "followers" in selected:
+            queryset = queryset.prefetch_related("followers")
+        return queryset
 
     def get_serializer_class(self):
         if self.action == "subscribe":
             return ReadOnlyUserFollowersSerializer
+        if self.action == "suggestions":
+            return FollowSuggestionSerializer
 
         return CreateUserSerializer
 
@@ -121,16 +159,37 @@ class UserViewSet(
         serializer = self.get_serializer(my_followers, many=True)
         return Response(serializer.data)
 
+    @action(
+        methods=["GET"],
+        detail=False,
+        url_path="suggestions",
+        permission_classes=[IsAuthenticated],
+    )
+    def suggestions(self, request):
+        """
+        The endpoint to see people you may know: users followed
+        by the people you follow, ranked by mutual follows
+        (precomputed by a periodic Celery task)
+        """
+        suggestions = FollowSuggestion.objects.filter(
+            user=self.request.user, suggested_user__is_deleted=False
+        ).select_related("suggested_user")
+        serializer = self.get_serializer(suggestions, many=True)
+        return Response(serializer.data)
+
     @action(
         methods=["GET", "POST"],
         detail=True,
         url_path="subscribe",
         permission_classes=[IsAuthenticated],
+        throttle_scope="follows",
     )
     def subscribe(self, request, pk=None):
         """
         The endpoint to subscribe or, if already subscribed,
-        unsubscribe current user from other users
+        unsubscribe current user from other users.
+        Prefer PUT to subscribe and DELETE to unsubscribe,
+        which can be retried
         """
         user_you_want_subscribe = self.get_object()
         me = self.request.user
@@ -148,8 +207,68 @@ class UserViewSet(
                 return Response(status=status.HTTP_204_NO_CONTENT)
             else:
                 me.following.add(user_you_want_subscribe)
+                record_activity(
+                    actor_id=me.id,
+                    recipient_id=user_you_want_subscribe.id,
+                    verb=Verb.FOLLOW,
+                )
                 return Response(status=status.HTTP_201_CREATED)
 
+    def send_following_changed(self, user_id, action):
+        """Raw through table writes skip m2m_changed, send it"""
+        through = get_user_model().following.through
+        m2m_changed.send(
+            sender=through,
+            instance=self.request.user,
+            action=action,
+            reverse=False,
+            model=get_user_model(),
+            pk_set={user_id},
+            using=router.db_for_write(through),
+        )
+
+    @subscribe.mapping.put
+    def follow(self, request, pk=None):
+        """
+        Idempotent subscribe: a single insert that leaves an
+        existing subscription alone, safe for clients to retry
+        """
+        user_id = int(pk)
+        if request.user.id == user_id:
+            return Response(
+                {"detail": "You cannot subscribe to yourself."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        users = get_user_model().objects.filter(pk=user_id, is_deleted=False)
+        if not link(
+                get_user_model().following.through,
+                "from_user", request.user.id, "to_user", users
+        ):
+            if not users.exists():
+                raise Http404
+            return Response(status=status.HTTP_204_NO_CONTENT)
+        self.send_following_changed(user_id, "post_add")
+        record_activity(
+            actor_id=request.user.id,
+            recipient_id=user_id,
+            verb=Verb.FOLLOW,
+        )
+        return Response(status=status.HTTP_201_CREATED)
+
+    @subscribe.mapping.delete
+    def unfollow(self, request, pk=None):
+        """
+        Idempotent unsubscribe: a single delete,
+        succeeds whether or not you were subscribed
+        """
+        user_id = int(pk)
+        if unlink(
+                get_user_model().following.through,
+                "from_user", request.user.id, "to_user", user_id
+        ):
+            self.send_following_changed(user_id, "post_remove")
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
     def retrieve(self, request, *args, **kwargs):
         instance = self.get_object()
         if instance == self.request.user:
@@ -196,17 +315,25 @@ class UserViewSet(
                 required=False,
                 type=str
             ),
+            IDS_PARAMETER,
         ]
     )
     def list(self, request, *args, **kwargs):
         """
         Retrieve a list of users with the
         ability to filter them by username,
-        date of birth and place of birth.
+        date of birth and place of birth,
+        or the users listed in ?ids=.
         """
+        if "ids" in request.query_params:
+            return self.batch_retrieve(request)
         return super().list(request, *args, **kwargs)
 
 
+class ThrottledTokenObtainPairView(TokenObtainPairView):
+    throttle_scope = "login"
+
+
 class CreateUserView(generics.CreateAPIView):
     serializer_class = CreateUserSerializer
 
@@ -218,6 +345,76 @@ class ManageUserView(generics.RetrieveUpdateDestroyAPIView):
     def get_object(self):
         return self.request.user
 
+    def perform_destroy(self, instance):
+        """
+        Hide the account at once (inactive users cannot authenticate),
+        with its likes and comments in the cached posts, a background
+        task removes its data in batches
+        """
+        instance.is_deleted = True
+        instance.is_active = False
+        instance.save(update_fields=["is_deleted", "is_active"])
+        transaction.on_commit(
+            lambda: bump_versions(posts_touched_by(instance.id))
+        )
+        transaction.on_commit(lambda: purge_user.delay(instance.id))
+
+
+class AccountExportView(APIView):
+    serializer_class = AccountExportSerializer
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, *args, **kwargs):
+        """
+        Method to check the progress of your latest
+        data export and get its download link
+        """
+        export = AccountExport.objects.filter(
+            user=self.request.user
+        ).first()
+        if export is None:
+            return Response(status=status.HTTP_404_NOT_FOUND)
+        serializer = AccountExportSerializer(
+            export, context={"request": request}
+        )
+        return Response(serializer.data, status.HTTP_200_OK)
+
+    def post(self, request, *args, **kwargs):
+        """
+        Method to start exporting your posts, comments,
+        likes and follow lists as compressed NDJSON
+        """
+        export = AccountExport.objects.create(user=self.request.user)
+        transaction.on_commit(
+            lambda: export_account_data.delay(export.id)
+        )
+        serializer = AccountExportSerializer(
+            export, context={"request": request}
+        )
+        return Response(serializer.data, status.HTTP_202_ACCEPTED)
+
+
+class AccountExportDownloadView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    @extend_schema(responses={(200, "application/gzip"): OpenApiTypes.BINARY})
+    def get(self, request, *args, **kwargs):
+        """
+        Method to download your latest finished data export,
+        only you can fetch it
+        """
+        export = AccountExport.objects.filter(
+            user=self.request.user, status=AccountExport.Status.DONE
+        ).exclude(file="").first()
+        if export is None:
+            return Response(status=status.HTTP_404_NOT_FOUND)
+        return FileResponse(
+            export.file.open("rb"),
+            as_attachment=True,
+            filename="export.ndjson.gz",
+            content_type="application/gzip",
+        )
+
 
 class UploadProfilePictureView(APIView):
     serializer_class = ProfileImageSerializer